@@ -1,10 +1,12 @@
 import pandas as pd
 import numpy as np
 from datetime import timedelta
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Tuple
 from decimal import Decimal
 from sklearn.linear_model import LinearRegression
 
+from .candles import CandleSeries, isoformat_ms
+
 
 def _parse_interval_to_timedelta(interval: str) -> timedelta:
     """Convert Binance-style interval to timedelta (approximate)."""
@@ -21,41 +23,9 @@ def _parse_interval_to_timedelta(interval: str) -> timedelta:
     return timedelta(days=1)
 
 
-def run_backtest(candles: List[Dict[str, Any]], short_window: int = 10, long_window: int = 50,
-                 initial_capital: float = 10000.0, commission_pct: float = 0.001,
-                 slippage: float = 0.0005, forecast_days: int = 5, interval: str = '1d') -> Dict[str, Any]:
-    """Run a simple SMA crossover backtest and linear-regression prediction.
-
-    Args:
-        candles: list of dicts with keys: timestamp (datetime), open, high, low, close, volume
-    Returns:
-        dict with candles, trades, equity, metrics, forecast_points
-    """
-    if not candles:
-        return {
-            'candles': [],
-            'trades': [],
-            'equity': [],
-            'metrics': {},
-            'forecast_points': [],
-        }
-
-    # Build DataFrame
-    df = pd.DataFrame([{
-        'timestamp': c['timestamp'],
-        'open': float(c['open']),
-        'high': float(c['high']),
-        'low': float(c['low']),
-        'close': float(c['close']),
-        'volume': float(c.get('volume', 0)),
-    } for c in candles])
-
-    df = df.sort_values('timestamp').reset_index(drop=True)
-
-    # Indicators
-    df['SMA_Short'] = df['close'].rolling(window=short_window, min_periods=1).mean()
-    df['SMA_Long'] = df['close'].rolling(window=long_window, min_periods=1).mean()
-
+def _simulate_loop(df: pd.DataFrame, initial_capital: float, commission_pct: float,
+                   slippage: float) -> Tuple[List[Dict[str, Any]], np.ndarray]:
+    """Reference row-by-row simulation (the original engine)."""
     balance = float(initial_capital)
     position = 0.0
     position_price = None
@@ -92,40 +62,112 @@ def run_backtest(candles: List[Dict[str, Any]], short_window: int = 10, long_win
         current_val = balance + (position * price)
         equity[i] = current_val
 
-    # Finalize: if position still open, mark as value at last price
-    final_equity = equity[-1]
+    return trades, np.array(equity, dtype=float)
+
+
+def crossover_events(sma_short: np.ndarray, sma_long: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Indices and sides (+1 cross above, -1 cross below) of every SMA crossover."""
+    up = (sma_short[1:] > sma_long[1:]) & (sma_short[:-1] <= sma_long[:-1])
+    down = (sma_short[1:] < sma_long[1:]) & (sma_short[:-1] >= sma_long[:-1])
+    idx = np.flatnonzero(up | down)
+    return idx + 1, np.where(up[idx], 1, -1)
 
-    # Metrics
-    total_return = ((final_equity - initial_capital) / initial_capital) * 100
-    num_trades = sum(1 for t in trades if t['type'] == 'SELL')
+
+def simulate_crossover(close: np.ndarray, sma_short: np.ndarray, sma_long: np.ndarray,
+                       initial_capital: float, commission_pct: float, slippage: float,
+                       events: Optional[Tuple[np.ndarray, np.ndarray]] = None
+                       ) -> Tuple[np.ndarray, np.ndarray, Dict[str, np.ndarray], np.ndarray]:
+    """Vectorized SMA-crossover simulation.
+
+    Crossovers are found with array comparisons; the position state machine
+    then only visits those candles (not every row), using the same order of
+    operations as the loop engine so results are bit-for-bit identical.
+    The equity curve is filled in from the per-trade state with array ops.
+
+    ``events`` may pass a precomputed ``crossover_events`` result so several
+    cost settings can share one crossover pass.
+
+    Returns ``(trade_idx, sides, fills, equity)`` for the executed trades,
+    where ``fills`` holds their fill price, size and pnl (nan for buys).
+    """
+    event_idx, event_sides = events if events is not None else crossover_events(sma_short, sma_long)
+    trade_idx, sides, fill_price, fill_size, pnl, cash_after, held_after = [], [], [], [], [], [], []
+
+    balance = float(initial_capital)
+    position = 0.0
+    position_price = 0.0
+    for i, side in zip(event_idx.tolist(), event_sides.tolist()):
+        price = close[i]
+        if side > 0 and position == 0:
+            position = (balance * (1 - commission_pct)) / (price * (1 + slippage))
+            position_price = price
+            balance = 0.0
+            fill_price.append(price)
+            fill_size.append(position)
+            pnl.append(np.nan)
+        elif side < 0 and position > 0:
+            sell_price = price * (1 - slippage)
+            proceeds = position * sell_price * (1 - commission_pct)
+            pnl.append(proceeds - position * position_price)
+            fill_price.append(sell_price)
+            fill_size.append(position)
+            balance = proceeds
+            position = 0.0
+        else:
+            continue
+        trade_idx.append(i)
+        sides.append(side)
+        cash_after.append(balance)
+        held_after.append(position)
+
+    trade_idx = np.array(trade_idx, dtype=np.int64)
+    sides = np.array(sides, dtype=np.int64)
+    cash_after = np.array(cash_after, dtype=float)
+    held_after = np.array(held_after, dtype=float)
+
+    # Carry each trade's cash/position state forward to every later candle:
+    # flat candles are worth the cash balance, long candles position * close.
+    equity = np.full(len(close), float(initial_capital))
+    if len(trade_idx):
+        state = np.searchsorted(trade_idx, np.arange(len(close)), side='right') - 1
+        active = state >= 0
+        j = state[active]
+        equity[active] = np.where(sides[j] > 0, held_after[j] * close[active], cash_after[j])
+
+    fills = {'price': np.array(fill_price, dtype=float), 'size': np.array(fill_size, dtype=float),
+             'pnl': np.array(pnl, dtype=float)}
+    return trade_idx, sides, fills, equity
+
+
+def equity_metrics(equity: np.ndarray, initial_capital: float, num_trades: int) -> Dict[str, Any]:
+    total_return = ((equity[-1] - initial_capital) / initial_capital) * 100
 
     # Compute simple max drawdown
-    equity_series = pd.Series(equity)
-    roll_max = equity_series.cummax()
-    drawdown = (equity_series - roll_max) / roll_max
-    max_drawdown = float(drawdown.min() if not drawdown.empty else 0.0) * 100
+    roll_max = np.maximum.accumulate(equity)
+    drawdown = (equity - roll_max) / roll_max
+    max_drawdown = float(drawdown.min() if len(drawdown) else 0.0) * 100
 
-    metrics = {
+    return {
         'total_return_pct': float(total_return),
         'num_trades': int(num_trades),
         'max_drawdown_pct': float(max_drawdown),
     }
 
-    # Forecast using linear regression on recent closes
-    lookback = min(50, len(df))
-    subset = df.tail(lookback).copy()
-    subset['idx'] = np.arange(len(subset))
-    X = subset[['idx']].values
-    y = subset['close'].values
+
+def _linear_forecast(series: CandleSeries, forecast_days: int, interval: str) -> List[Dict[str, Any]]:
+    """Forecast using linear regression on recent closes"""
+    lookback = min(50, len(series))
+    X = np.arange(lookback).reshape(-1, 1)
+    y = series.close[-lookback:]
     lr = LinearRegression()
     lr.fit(X, y)
 
-    future_idx = np.arange(len(subset), len(subset) + forecast_days).reshape(-1, 1)
+    future_idx = np.arange(lookback, lookback + forecast_days).reshape(-1, 1)
     future_prices = lr.predict(future_idx)
 
     # construct future timestamps
     delta = _parse_interval_to_timedelta(interval)
-    last_time = df['timestamp'].iloc[-1]
+    last_time = pd.Timestamp(int(series.timestamp[-1]), unit='ms', tz='UTC')
     forecast_points = []
     for i in range(forecast_days):
         ft = last_time + delta * (i + 1)
@@ -133,14 +175,69 @@ def run_backtest(candles: List[Dict[str, Any]], short_window: int = 10, long_win
         upper = price * 1.02
         lower = price * 0.98
         forecast_points.append({'date': ft.isoformat(), 'price': price, 'confidence_upper': upper, 'confidence_lower': lower})
+    return forecast_points
+
+
+def run_backtest(candles, short_window: int = 10, long_window: int = 50,
+                 initial_capital: float = 10000.0, commission_pct: float = 0.001,
+                 slippage: float = 0.0005, forecast_days: int = 5, interval: str = '1d',
+                 engine: str = 'vectorized') -> Dict[str, Any]:
+    """Run a simple SMA crossover backtest and linear-regression prediction.
+
+    Args:
+        candles: a CandleSeries, or a list of dicts with keys: timestamp (datetime), open, high, low, close, volume
+        engine: 'vectorized' (default) or 'loop', the original row-by-row
+            engine kept as a reference; both produce identical results.
+    Returns:
+        dict with candles, trades, equity, metrics, forecast_points
+    """
+    series = CandleSeries.coerce(candles)
+    if not len(series):
+        return {
+            'candles': [],
+            'trades': [],
+            'equity': [],
+            'metrics': {},
+            'forecast_points': [],
+        }
+
+    # Build DataFrame (shares the series' arrays; CandleSeries is already time-sorted)
+    df = series.to_frame()
+
+    # Indicators
+    df['SMA_Short'] = df['close'].rolling(window=short_window, min_periods=1).mean()
+    df['SMA_Long'] = df['close'].rolling(window=long_window, min_periods=1).mean()
+
+    if engine == 'loop':
+        trades, equity = _simulate_loop(df, initial_capital, commission_pct, slippage)
+        num_trades = sum(1 for t in trades if t['type'] == 'SELL')
+        stamps = [ts.isoformat() for ts in df['timestamp']]
+    elif engine == 'vectorized':
+        event_idx, sides, fills, equity = simulate_crossover(
+            series.close, df['SMA_Short'].to_numpy(), df['SMA_Long'].to_numpy(),
+            initial_capital, commission_pct, slippage)
+        stamps = isoformat_ms(series.timestamp)
+        trades = []
+        for j, i in enumerate(event_idx.tolist()):
+            trade = {'type': 'BUY' if sides[j] > 0 else 'SELL', 'timestamp': stamps[i],
+                     'price': fills['price'][j], 'size': fills['size'][j]}
+            if sides[j] < 0:
+                trade['pnl'] = fills['pnl'][j]
+            trades.append(trade)
+        num_trades = int(np.count_nonzero(sides < 0))
+    else:
+        raise ValueError(f"Unknown backtest engine: {engine}")
+
+    metrics = equity_metrics(equity, initial_capital, num_trades)
+    forecast_points = _linear_forecast(series, forecast_days, interval)
 
     # Prepare output structures
     out_candles = [{
-        'timestamp': r['timestamp'].isoformat(),
-        'open': r['open'], 'high': r['high'], 'low': r['low'], 'close': r['close'], 'volume': r['volume']
-    } for _, r in df.iterrows()]
+        'timestamp': ts, 'open': o, 'high': h, 'low': lo, 'close': c, 'volume': v
+    } for ts, o, h, lo, c, v in zip(stamps, series.open.tolist(), series.high.tolist(), series.low.tolist(),
+                                   series.close.tolist(), series.volume.tolist())]
 
-    out_equity = [{'timestamp': df.at[i, 'timestamp'].isoformat(), 'equity': float(e)} for i, e in enumerate(equity)]
+    out_equity = [{'timestamp': ts, 'equity': e} for ts, e in zip(stamps, equity.tolist())]
 
     return {
         'candles': out_candles,
@@ -7,74 +7,190 @@ lightweight `MLForecastBaseline`.
 """
 from datetime import datetime, timedelta
 from decimal import Decimal
-from typing import List, Dict, Optional
+import weakref
+from typing import List, Dict, Optional, Sequence
 
 SKLEARN_AVAILABLE = True
 try:
     import numpy as np
     from sklearn.ensemble import RandomForestRegressor
+
+    from .candles import closed_length
+    from .features import EXTRA_FEATURES, feature_matrix, feature_row, lag_matrix
+    from .model_registry import data_fingerprint, get_model_registry
 except Exception:
     SKLEARN_AVAILABLE = False
 
 
+# Packed node arrays per fitted forest, built on first use and dropped with the model.
+_packed_forests = weakref.WeakKeyDictionary()
+
+
+def _pack_forest(forest) -> Dict[str, "np.ndarray"]:
+    """Stack every tree's node arrays into ``(n_trees, max_nodes)`` tables (leaves point to themselves)."""
+    packed = _packed_forests.get(forest)
+    if packed is None:
+        trees = [est.tree_ for est in forest.estimators_]
+        shape = (len(trees), max(t.node_count for t in trees))
+        nodes = np.arange(shape[1])
+        packed = {
+            'left': np.tile(nodes, (shape[0], 1)),
+            'right': np.tile(nodes, (shape[0], 1)),
+            'feature': np.zeros(shape, dtype=np.intp),
+            'threshold': np.zeros(shape),
+            'value': np.zeros(shape + (trees[0].n_outputs,)),
+            'depth': max(est.get_depth() for est in forest.estimators_),
+        }
+        for k, tree in enumerate(trees):
+            count = tree.node_count
+            split = tree.children_left >= 0
+            packed['left'][k, :count][split] = tree.children_left[split]
+            packed['right'][k, :count][split] = tree.children_right[split]
+            packed['feature'][k, :count][split] = tree.feature[split]
+            packed['threshold'][k, :count] = tree.threshold
+            packed['value'][k, :count] = tree.value[:, :, 0]
+        _packed_forests[forest] = packed
+    return packed
+
+
+def tree_predictions(forest, X) -> "np.ndarray":
+    """Predictions of every tree in ``forest`` for every row of ``X``.
+
+    All trees are walked together, one depth level per numpy step, instead
+    of calling ``predict`` once per estimator. Returns ``(n_samples,
+    n_trees, n_outputs)``; the mean over trees is the forest's prediction.
+    """
+    packed = _pack_forest(forest)
+    # Trees compare float32 features against float64 thresholds, as sklearn does.
+    X = np.asarray(X, dtype=np.float32).astype(float)
+    n_trees = packed['left'].shape[0]
+    rows = np.arange(len(X))[:, None]
+    trees = np.arange(n_trees)[None, :]
+    node = np.zeros((len(X), n_trees), dtype=np.intp)
+    for _ in range(packed['depth']):
+        go_left = X[rows, packed['feature'][trees, node]] <= packed['threshold'][trees, node]
+        node = np.where(go_left, packed['left'][trees, node], packed['right'][trees, node])
+    return packed['value'][trees, node]
+
+
 class BetterMLForecast:
-    """Train a RandomForest on lag features and forecast recursively.
+    """Train a RandomForest on lag features and forecast the next prices.
+
+    ``mode='recursive'`` (default) fits a one-step model and feeds each
+    prediction back in as the newest lag. ``mode='direct'`` fits a single
+    multi-output forest that predicts the next ``max_horizon`` prices at
+    once, so forecasting costs one forest evaluation for any horizon.
+
+    ``features`` picks the inputs: ``'lags'`` (always used) plus any of
+    ``core.features.EXTRA_FEATURES`` (``'returns'``, ``'stats'``,
+    ``'indicators'``), built with ``feature_matrix``. Extra features need
+    some history to warm up, so they leave fewer training rows.
 
     Notes:
-    - Trains on in-memory historical price series; no external persistence.
+    - When ``asset`` is given the fitted forest is kept in the model
+      registry, keyed by the training data, so repeat forecasts on the same
+      candles skip training. Without it the model is trained in memory.
     - If scikit-learn isn't installed, raises ImportError on instantiation.
     """
 
-    def __init__(self, prices: List[float], timestamps: Optional[List[datetime]] = None, window: int = 10):
+    MODEL_PARAMS = {'n_estimators': 100, 'random_state': 42}
+    MODES = ('recursive', 'direct')
+
+    def __init__(self, prices: List[float], timestamps: Optional[List[datetime]] = None, window: int = 10,
+                 asset: Optional[str] = None, registry=None, mode: str = 'recursive', max_horizon: int = 30,
+                 features: Sequence[str] = ('lags',)):
         if not SKLEARN_AVAILABLE:
             raise ImportError("scikit-learn and numpy are required for BetterMLForecast")
+        if mode not in self.MODES:
+            raise ValueError(f"Unknown BetterMLForecast mode: {mode}")
+        self.extra = tuple(name for name in EXTRA_FEATURES if name in features)
+        unknown = sorted(set(features) - set(self.extra) - {'lags'})
+        if unknown:
+            raise ValueError(f"Unknown BetterMLForecast features: {', '.join(unknown)}")
 
         self.prices = list(prices or [])
         self.timestamps = timestamps or []
+        # Train on closed candles only; a trailing live tick is still used as the latest price.
+        self.train_prices = self.prices[:closed_length(self.timestamps)] if self.timestamps else self.prices
         self.window = max(3, int(window))
+        self.mode = mode
+        # Steps each training row looks ahead: 1 for recursive, up to max_horizon for direct.
+        self.horizon = 1 if mode == 'recursive' else max(1, min(int(max_horizon), len(self.train_prices) - self.window - 1))
         self.model = None
-        if len(self.prices) >= self.window + 1:
-            self._train()
-
-    def _train(self):
-        X = []
-        y = []
-        arr = np.array(self.prices, dtype=float)
-        for i in range(self.window, len(arr)):
-            X.append(arr[i - self.window:i])
-            y.append(arr[i])
-
-        X = np.array(X)
-        y = np.array(y)
-
-        self.model = RandomForestRegressor(n_estimators=100, random_state=42)
-        self.model.fit(X, y)
+        if len(self.train_prices) >= self.window + self.horizon:
+            if asset:
+                registry = registry or get_model_registry()
+                params = dict(self.MODEL_PARAMS, mode=mode, horizon=self.horizon)
+                if self.extra:
+                    params['features'] = self.extra
+                self.model = registry.get_or_train(
+                    asset, self.window, data_fingerprint(self.prices, self.timestamps), params, self._fit)
+            else:
+                self.model = self._fit()
+
+    def _fit(self):
+        if self.extra:
+            X, y, _ = feature_matrix(self.train_prices, self.window, self.horizon, extra=self.extra)
+            if not len(X):
+                raise ValueError("Not enough history to warm up the extra features")
+        else:
+            X, y = lag_matrix(self.train_prices, self.window, self.horizon)
+
+        model = RandomForestRegressor(**self.MODEL_PARAMS)
+        model.fit(X, y)
+        return model
+
+    def _inputs(self, prices) -> "np.ndarray":
+        """Model input row for predicting the price after ``prices``."""
+        if self.extra:
+            return feature_row(prices, self.window, extra=self.extra)
+        return np.asarray(prices[-self.window:], dtype=float)
+
+    def _forecast_steps(self, horizon_days: int):
+        """Mean and across-tree std of the forecast for each step ahead."""
+        if self.mode == 'direct':
+            if horizon_days > self.horizon:
+                raise ValueError(f"Direct model was trained for {self.horizon} steps, not {horizon_days}")
+            per_tree = tree_predictions(self.model, self._inputs(self.prices).reshape(1, -1))[0, :, :horizon_days]
+            return per_tree.mean(axis=0), per_tree.std(axis=0)
+
+        if self.extra:
+            # Extra features are recomputed over the whole path as predictions are appended.
+            path = list(self.prices)
+            preds = np.empty(horizon_days)
+            stds = np.empty(horizon_days)
+            for step in range(horizon_days):
+                per_tree = tree_predictions(self.model, self._inputs(path).reshape(1, -1))[0, :, 0]
+                preds[step] = per_tree.mean()
+                stds[step] = per_tree.std()
+                path.append(preds[step])
+            return preds, stds
+        last_window = self._inputs(self.prices)
+
+        # Recursive: one batched evaluation of all trees per step; each
+        # prediction becomes the newest lag for the next step.
+        path = np.empty(self.window + horizon_days)
+        path[:self.window] = last_window
+        preds = np.empty(horizon_days)
+        stds = np.empty(horizon_days)
+        for step in range(horizon_days):
+            per_tree = tree_predictions(self.model, path[step:step + self.window].reshape(1, -1))[0, :, 0]
+            preds[step] = per_tree.mean()
+            stds[step] = per_tree.std()
+            path[self.window + step] = preds[step]
+        return preds, stds
 
     def predict(self, horizon_days: int = 7) -> Dict:
         if not self.model:
             # Not enough data to train; raise to allow caller to fallback
             raise ValueError("Insufficient data to train BetterMLForecast")
 
-        import numpy as np
-
-        last_window = np.array(self.prices[-self.window:], dtype=float)
-        preds = []
-        upper = []
-        lower = []
-
-        for _ in range(horizon_days):
-            next_pred = float(self.model.predict(last_window.reshape(1, -1))[0])
-            # Use per-estimator predictions to estimate uncertainty
-            all_preds = np.array([est.predict(last_window.reshape(1, -1))[0] for est in self.model.estimators_])
-            std = float(np.std(all_preds))
-
-            preds.append(next_pred)
-            upper.append(next_pred + max(0.01 * next_pred, std))
-            lower.append(max(0.0, next_pred - max(0.01 * next_pred, std)))
-
-            # shift window
-            last_window = np.roll(last_window, -1)
-            last_window[-1] = next_pred
+        horizon_days = int(horizon_days)
+        preds, stds = self._forecast_steps(horizon_days)
+        band = np.maximum(0.01 * preds, stds)
+        upper = (preds + band).tolist()
+        lower = np.maximum(0.0, preds - band).tolist()
+        preds = preds.tolist()
 
         # Build forecast points
         base_date = (
@@ -95,7 +211,8 @@ class BetterMLForecast:
         predicted_high = predicted_price * 1.02
         predicted_low = predicted_price * 0.98
 
-        confidence = max(50, 90 - int(np.mean(np.abs(np.diff(preds))) * 100))
+        step_change = float(np.mean(np.abs(np.diff(preds)))) if len(preds) > 1 else 0.0
+        confidence = max(50, 90 - int(step_change * 100))
 
         return {
             "current_price": Decimal(str(self.prices[-1])),
@@ -0,0 +1,139 @@
+"""
+In-process result caches with TTL expiry, LRU eviction and single-flight.
+
+``ResultCache.get_or_compute`` returns a fresh cached value or computes
+it; concurrent callers asking for the same missing key wait for the one
+computation in progress instead of repeating it. Hits, misses, coalesced
+waits and evictions are counted for monitoring.
+
+Two process-wide caches are configured from ``settings.FORECAST_CACHE``:
+``get_forecast_cache()`` for model predictions and ``get_history_cache()``
+for the short-lived upstream price histories the predictions are made
+from.
+"""
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple
+
+
+class ResultCache:
+    """Thread-safe mapping of key -> value with a TTL and an entry limit."""
+
+    def __init__(self, name: str, max_entries: int = 256, ttl: Optional[float] = 60.0):
+        self.name = name
+        self.max_entries = max(1, int(max_entries))
+        self.ttl = ttl
+        self._entries: 'OrderedDict[Hashable, Tuple[Any, float]]' = OrderedDict()
+        self._lock = threading.Lock()
+        # One lock per key being computed, so each missing key is computed once.
+        self._flights: Dict[Hashable, threading.Lock] = {}
+        self.counters = {'hits': 0, 'misses': 0, 'coalesced': 0, 'evictions': 0, 'expired': 0}
+
+    def _lookup(self, key) -> Tuple[bool, Any]:
+        """(found, value) under the lock; expired entries are dropped."""
+        entry = self._entries.get(key)
+        if entry is None:
+            return False, None
+        if self.ttl is not None and time.monotonic() - entry[1] > self.ttl:
+            del self._entries[key]
+            self.counters['expired'] += 1
+            return False, None
+        self._entries.move_to_end(key)
+        return True, entry[0]
+
+    def get(self, key, default=None):
+        with self._lock:
+            found, value = self._lookup(key)
+            self.counters['hits' if found else 'misses'] += 1
+        return value if found else default
+
+    def set(self, key, value):
+        with self._lock:
+            self._entries[key] = (value, time.monotonic())
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.counters['evictions'] += 1
+
+    def get_or_compute(self, key, compute: Callable[[], Any]) -> Any:
+        """Return the cached value for ``key``, calling ``compute()`` once on a miss.
+
+        Exceptions from ``compute`` propagate and nothing is cached, so the
+        next caller retries.
+        """
+        with self._lock:
+            found, value = self._lookup(key)
+            if found:
+                self.counters['hits'] += 1
+                return value
+            flight = self._flights.setdefault(key, threading.Lock())
+
+        with flight:
+            with self._lock:
+                found, value = self._lookup(key)
+            if found:
+                # Computed by the caller we waited for.
+                with self._lock:
+                    self.counters['coalesced'] += 1
+                return value
+            with self._lock:
+                self.counters['misses'] += 1
+            try:
+                value = compute()
+                self.set(key, value)
+            finally:
+                with self._lock:
+                    if self._flights.get(key) is flight:
+                        del self._flights[key]
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            counters = dict(self.counters)
+            size = len(self._entries)
+        lookups = counters['hits'] + counters['misses'] + counters['coalesced']
+        return {
+            'name': self.name,
+            'size': size,
+            'max_entries': self.max_entries,
+            'ttl_seconds': self.ttl,
+            **counters,
+            'hit_rate': round((counters['hits'] + counters['coalesced']) / lookups, 4) if lookups else 0.0,
+        }
+
+
+_caches: Dict[str, ResultCache] = {}
+_caches_lock = threading.Lock()
+
+
+def _configured(name: str, entries_key: str, ttl_key: str, default_entries: int, default_ttl: float) -> ResultCache:
+    with _caches_lock:
+        cache = _caches.get(name)
+        if cache is None:
+            from django.conf import settings
+            config = getattr(settings, 'FORECAST_CACHE', {})
+            cache = _caches[name] = ResultCache(name, max_entries=config.get(entries_key, default_entries),
+                                                ttl=config.get(ttl_key, default_ttl))
+        return cache
+
+
+def get_forecast_cache() -> ResultCache:
+    """Process-wide cache of forecast predictions."""
+    return _configured('forecasts', 'MAX_ENTRIES', 'TTL_SECONDS', 256, 300.0)
+
+
+def get_history_cache() -> ResultCache:
+    """Process-wide cache of fetched price histories (short TTL)."""
+    return _configured('history', 'HISTORY_MAX_ENTRIES', 'HISTORY_TTL_SECONDS', 64, 60.0)
+
+
+def cache_stats() -> Dict[str, Dict[str, Any]]:
+    """Stats of every cache created so far, by name."""
+    with _caches_lock:
+        caches = list(_caches.values())
+    return {cache.name: cache.stats() for cache in caches}
@@ -0,0 +1,262 @@
+"""
+On-disk OHLCV candle store.
+
+Candles for every (symbol, interval) pair live in their own directory as
+append-only columnar segment files. A segment with ``n`` rows stores six
+contiguous columns back to back: int64 open time (epoch ms) followed by
+float64 open, high, low, close and volume. ``index.json`` records the
+time range of each segment so range reads only map the files they need.
+
+Only closed candles are written, so stored rows never change once
+appended and readers never need to lock. Compaction removes the files it
+merged, so a reader that loaded the index just before then reloads it
+and retries.
+"""
+import json
+import os
+import threading
+import uuid
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, Optional
+
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - Windows
+    fcntl = None
+
+
+COLUMNS = ('timestamp', 'open', 'high', 'low', 'close', 'volume')
+ROW_BYTES = 8 * len(COLUMNS)
+
+# Merge segments back into one file once a key accumulates this many.
+MAX_SEGMENTS = 32
+
+
+def interval_to_ms(interval: str) -> int:
+    """Convert a Binance-style interval ('1m', '4h', '1d', '1w') to milliseconds."""
+    units = {
+        'm': 60_000,
+        'h': 3_600_000,
+        'd': 86_400_000,
+        'w': 7 * 86_400_000,
+        # Calendar months vary; use the shortest so freshness checks stay conservative.
+        'M': 28 * 86_400_000,
+    }
+    unit = interval[-1:]
+    if unit not in units:
+        return units['d']
+    return int(interval[:-1] or 1) * units[unit]
+
+
+def empty_columns() -> Dict[str, np.ndarray]:
+    cols = {name: np.empty(0, dtype='<f8') for name in COLUMNS[1:]}
+    cols['timestamp'] = np.empty(0, dtype='<i8')
+    return cols
+
+
+class CandleStore:
+    """Append-only columnar candle storage keyed by (symbol, interval)."""
+
+    def __init__(self, root):
+        self.root = Path(root)
+        self._locks: Dict[str, threading.Lock] = {}
+        self._locks_guard = threading.Lock()
+
+    # -- paths and index -------------------------------------------------
+
+    def _key_dir(self, symbol: str, interval: str) -> Path:
+        safe_symbol = ''.join(ch for ch in symbol.upper() if ch.isalnum())
+        return self.root / safe_symbol / interval
+
+    def _load_index(self, key_dir: Path) -> Dict:
+        try:
+            with open(key_dir / 'index.json') as fh:
+                return json.load(fh)
+        except FileNotFoundError:
+            return {'segments': [], 'head_complete': False}
+
+    def _write_index(self, key_dir: Path, index: Dict):
+        tmp = key_dir / f'index.json.{uuid.uuid4().hex}.tmp'
+        with open(tmp, 'w') as fh:
+            json.dump(index, fh)
+        os.replace(tmp, key_dir / 'index.json')
+
+    @contextmanager
+    def _writer_lock(self, key_dir: Path):
+        """Serialise writers for one key across threads and processes."""
+        with self._locks_guard:
+            lock = self._locks.setdefault(str(key_dir), threading.Lock())
+        with lock:
+            key_dir.mkdir(parents=True, exist_ok=True)
+            with open(key_dir / '.lock', 'w') as fh:
+                if fcntl is not None:
+                    fcntl.flock(fh, fcntl.LOCK_EX)
+                try:
+                    yield
+                finally:
+                    if fcntl is not None:
+                        fcntl.flock(fh, fcntl.LOCK_UN)
+
+    # -- segments --------------------------------------------------------
+
+    @staticmethod
+    def _read_segment(path: Path, rows: int) -> Dict[str, np.ndarray]:
+        """Memory-map each column of a segment without copying it."""
+        cols = {}
+        for i, name in enumerate(COLUMNS):
+            dtype = '<i8' if name == 'timestamp' else '<f8'
+            cols[name] = np.memmap(path, dtype=dtype, mode='r', offset=i * 8 * rows, shape=(rows,))
+        return cols
+
+    @staticmethod
+    def _write_segment(key_dir: Path, cols: Dict[str, np.ndarray]) -> Dict:
+        ts = cols['timestamp']
+        name = f"{int(ts[0])}-{int(ts[-1])}-{uuid.uuid4().hex[:8]}.seg"
+        tmp = key_dir / (name + '.tmp')
+        with open(tmp, 'wb') as fh:
+            for col in COLUMNS:
+                dtype = '<i8' if col == 'timestamp' else '<f8'
+                fh.write(np.ascontiguousarray(cols[col], dtype=dtype).tobytes())
+        os.replace(tmp, key_dir / name)
+        return {'file': name, 'first': int(ts[0]), 'last': int(ts[-1]), 'rows': int(len(ts))}
+
+    # -- public API ------------------------------------------------------
+
+    def stats(self, symbol: str, interval: str) -> Dict:
+        """Return first/last open time, row count and head completeness for a key."""
+        index = self._load_index(self._key_dir(symbol, interval))
+        segments = index['segments']
+        if not segments:
+            return {'first': None, 'last': None, 'rows': 0, 'head_complete': index.get('head_complete', False)}
+        return {
+            'first': segments[0]['first'],
+            'last': segments[-1]['last'],
+            'rows': sum(s['rows'] for s in segments),
+            'head_complete': index.get('head_complete', False),
+        }
+
+    def read(self, symbol: str, interval: str, start: Optional[int] = None,
+             end: Optional[int] = None, limit: Optional[int] = None) -> Dict[str, np.ndarray]:
+        """Read candles with ``start <= timestamp <= end`` (epoch ms).
+
+        When ``limit`` is given only the most recent ``limit`` rows of the
+        range are returned. Columns come back as ordinary numpy arrays.
+        """
+        key_dir = self._key_dir(symbol, interval)
+        try:
+            return self._read(key_dir, start, end, limit)
+        except FileNotFoundError:
+            # A compaction replaced the segments listed in the index we loaded.
+            return self._read(key_dir, start, end, limit)
+
+    def _read(self, key_dir: Path, start: Optional[int], end: Optional[int],
+              limit: Optional[int]) -> Dict[str, np.ndarray]:
+        segments = self._load_index(key_dir)['segments']
+        if start is not None:
+            segments = [s for s in segments if s['last'] >= start]
+        if end is not None:
+            segments = [s for s in segments if s['first'] <= end]
+        if limit is not None:
+            # Walk back from the newest segment until we have enough rows.
+            needed, picked = limit, []
+            for seg in reversed(segments):
+                picked.append(seg)
+                needed -= seg['rows']
+                if needed <= 0:
+                    break
+            segments = picked[::-1]
+        if not segments:
+            return empty_columns()
+
+        parts = [self._read_segment(key_dir / s['file'], s['rows']) for s in segments]
+        cols = {name: np.concatenate([p[name] for p in parts]) for name in COLUMNS}
+
+        ts = cols['timestamp']
+        lo = 0 if start is None else int(np.searchsorted(ts, start, side='left'))
+        hi = len(ts) if end is None else int(np.searchsorted(ts, end, side='right'))
+        if limit is not None:
+            lo = max(lo, hi - limit)
+        return {name: arr[lo:hi] for name, arr in cols.items()}
+
+    def append(self, symbol: str, interval: str, cols: Dict[str, np.ndarray],
+               head_complete: Optional[bool] = None) -> int:
+        """Append candles that fall outside the stored time range.
+
+        Rows must be sorted by timestamp. Rows overlapping the existing
+        range are dropped, so re-appending a fetch is harmless. Returns the
+        number of rows written.
+        """
+        key_dir = self._key_dir(symbol, interval)
+        with self._writer_lock(key_dir):
+            index = self._load_index(key_dir)
+            segments = index['segments']
+            ts = np.asarray(cols['timestamp'], dtype='<i8')
+
+            if segments:
+                first, last = segments[0]['first'], segments[-1]['last']
+                keep = (ts < first) | (ts > last)
+            else:
+                keep = np.ones(len(ts), dtype=bool)
+            # Drop duplicate timestamps within the batch itself.
+            if len(ts) > 1:
+                keep[1:] &= ts[1:] != ts[:-1]
+
+            written = 0
+            for mask in (keep & (ts < (segments[0]['first'] if segments else 0)),
+                         keep & (ts > (segments[-1]['last'] if segments else -1))):
+                if not mask.any():
+                    continue
+                seg = self._write_segment(key_dir, {name: np.asarray(cols[name])[mask] for name in COLUMNS})
+                segments.append(seg)
+                written += seg['rows']
+
+            segments.sort(key=lambda s: s['first'])
+            if head_complete is not None:
+                index['head_complete'] = head_complete
+            if len(segments) > MAX_SEGMENTS:
+                self._compact(key_dir, index)
+            self._write_index(key_dir, index)
+            return written
+
+    def compact(self, symbol: str, interval: str):
+        """Merge all segments of a key into a single file."""
+        key_dir = self._key_dir(symbol, interval)
+        with self._writer_lock(key_dir):
+            index = self._load_index(key_dir)
+            if len(index['segments']) > 1:
+                self._compact(key_dir, index)
+                self._write_index(key_dir, index)
+
+    def _compact(self, key_dir: Path, index: Dict):
+        old = index['segments']
+        parts = [self._read_segment(key_dir / s['file'], s['rows']) for s in old]
+        merged = {name: np.concatenate([p[name] for p in parts]) for name in COLUMNS}
+        del parts
+        index['segments'] = [self._write_segment(key_dir, merged)]
+        # The index still points at the old files until it is rewritten, so
+        # remove them only after the caller has persisted the new index.
+        self._write_index(key_dir, index)
+        for seg in old:
+            try:
+                os.remove(key_dir / seg['file'])
+            except OSError:
+                pass
+
+
+_default_store = None
+
+
+def get_candle_store() -> CandleStore:
+    """Return the process-wide store rooted at ``settings.CANDLE_STORE_DIR``."""
+    global _default_store
+    if _default_store is None:
+        try:
+            from django.conf import settings
+            root = settings.CANDLE_STORE_DIR
+        except Exception:
+            root = Path(__file__).resolve().parent.parent / 'var' / 'candles'
+        _default_store = CandleStore(root)
+    return _default_store
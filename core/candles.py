@@ -0,0 +1,174 @@
+"""
+Array-backed OHLCV candle series.
+
+``CandleSeries`` keeps candles as parallel numpy arrays (int64 epoch-ms
+timestamps, float64 prices and volume) instead of one dict per candle.
+Slicing returns views and ``to_frame`` wraps the same buffers in a pandas
+DataFrame, so nothing is copied between fetch, backtest and charting.
+Convert to ``Decimal`` only when writing model fields.
+"""
+from datetime import datetime, timezone as dt_timezone
+from decimal import Decimal
+from typing import Any, Dict, Iterable, List
+
+import numpy as np
+
+
+FIELDS = ('timestamp', 'open', 'high', 'low', 'close', 'volume')
+
+
+def _to_ms(ts) -> int:
+    if isinstance(ts, (int, np.integer)):
+        return int(ts)
+    if isinstance(ts, datetime):
+        if ts.tzinfo is None:
+            ts = ts.replace(tzinfo=dt_timezone.utc)
+        return int(round(ts.timestamp() * 1000))
+    # pandas Timestamp / numpy datetime64
+    return int(np.datetime64(ts, 'ms').astype('<i8'))
+
+
+def isoformat_ms(timestamps) -> List[str]:
+    """Vectorized ``datetime.isoformat()`` for UTC epoch-ms timestamps."""
+    timestamps = np.asarray(timestamps, dtype='<i8')
+    stamps = timestamps.view('datetime64[ms]')
+    whole = np.datetime_as_string(stamps, unit='s')
+    if np.any(timestamps % 1000):
+        # isoformat only prints a fraction (as microseconds) when it is non-zero.
+        whole = np.where(timestamps % 1000 == 0, whole, np.datetime_as_string(stamps, unit='us'))
+    return np.char.add(whole.astype(str), '+00:00').tolist()
+
+
+def closed_length(timestamps) -> int:
+    """Number of leading points of a regular series that are closed candles.
+
+    CoinGecko's ``market_chart`` ends its daily points with the live,
+    in-progress price. A final point closer to its predecessor than the
+    series' usual spacing is taken to be that tick and excluded.
+    """
+    n = len(timestamps)
+    if n < 3:
+        return n
+    steps = np.diff([_to_ms(t) for t in timestamps[-min(n, 32):]])
+    return n - 1 if steps[-1] < np.median(steps[:-1]) else n
+
+
+class CandleSeries:
+    """Parallel OHLCV arrays sorted by timestamp (epoch milliseconds, UTC)."""
+
+    __slots__ = FIELDS
+
+    def __init__(self, timestamp, open, high, low, close, volume=None):
+        self.timestamp = np.asarray(timestamp, dtype='<i8')
+        self.open = np.asarray(open, dtype='<f8')
+        self.high = np.asarray(high, dtype='<f8')
+        self.low = np.asarray(low, dtype='<f8')
+        self.close = np.asarray(close, dtype='<f8')
+        self.volume = (np.zeros(len(self.timestamp)) if volume is None
+                       else np.asarray(volume, dtype='<f8'))
+
+    # -- construction ------------------------------------------------------
+
+    @classmethod
+    def empty(cls) -> 'CandleSeries':
+        return cls(np.empty(0, dtype='<i8'), *(np.empty(0) for _ in range(5)))
+
+    @classmethod
+    def from_columns(cls, cols: Dict[str, np.ndarray]) -> 'CandleSeries':
+        """Wrap a dict of column arrays (e.g. a ``CandleStore.read`` result)."""
+        return cls(*(cols.get(name) for name in FIELDS))
+
+    @classmethod
+    def from_prices(cls, timestamps: Iterable, prices, volume=None) -> 'CandleSeries':
+        """Build a close-only series (open = high = low = close) from a price line."""
+        prices = np.asarray(prices, dtype='<f8')
+        if isinstance(timestamps, np.ndarray) and timestamps.dtype.kind in 'iu':
+            ts = timestamps
+        else:
+            ts = np.fromiter((_to_ms(t) for t in timestamps), dtype='<i8', count=len(prices))
+        return cls(ts, prices, prices, prices, prices, volume)
+
+    @classmethod
+    def from_dicts(cls, candles: List[Dict[str, Any]]) -> 'CandleSeries':
+        """Build from the legacy list-of-dicts format, sorting by timestamp."""
+        n = len(candles)
+        ts = np.fromiter((_to_ms(c['timestamp']) for c in candles), dtype='<i8', count=n)
+        cols = {name: np.fromiter((float(c.get(name, 0) or 0) for c in candles), dtype='<f8', count=n)
+                for name in FIELDS[1:]}
+        order = np.argsort(ts, kind='stable')
+        if np.any(order != np.arange(n)):
+            ts = ts[order]
+            cols = {name: arr[order] for name, arr in cols.items()}
+        return cls(ts, **cols)
+
+    @classmethod
+    def coerce(cls, candles) -> 'CandleSeries':
+        """Accept a ``CandleSeries`` or a legacy list of candle dicts."""
+        if isinstance(candles, cls):
+            return candles
+        if not candles:
+            return cls.empty()
+        return cls.from_dicts(list(candles))
+
+    # -- access ------------------------------------------------------------
+
+    def __len__(self) -> int:
+        return len(self.timestamp)
+
+    def __getitem__(self, key):
+        if isinstance(key, slice):
+            # Basic slicing of every column returns views, not copies.
+            return CandleSeries(*(getattr(self, name)[key] for name in FIELDS))
+        return self.row(int(key))
+
+    def __repr__(self) -> str:
+        if not len(self):
+            return 'CandleSeries(empty)'
+        return (f"CandleSeries({len(self)} candles, "
+                f"{self.datetime_at(0).isoformat()} .. {self.datetime_at(-1).isoformat()})")
+
+    def tail(self, n: int) -> 'CandleSeries':
+        return self[max(0, len(self) - n):]
+
+    def datetime_at(self, i: int) -> datetime:
+        return datetime.fromtimestamp(int(self.timestamp[i]) / 1000, tz=dt_timezone.utc)
+
+    def datetimes(self) -> List[datetime]:
+        """Timezone-aware datetimes for every candle (allocates one object per row)."""
+        return [datetime.fromtimestamp(ms / 1000, tz=dt_timezone.utc) for ms in self.timestamp.tolist()]
+
+    def row(self, i: int) -> Dict[str, Any]:
+        """One candle in the legacy dict format, with float prices."""
+        return {
+            'timestamp': self.datetime_at(i),
+            'open': float(self.open[i]),
+            'high': float(self.high[i]),
+            'low': float(self.low[i]),
+            'close': float(self.close[i]),
+            'volume': float(self.volume[i]),
+        }
+
+    def row_decimal(self, i: int) -> Dict[str, Any]:
+        """One candle with ``Decimal`` prices, for model persistence."""
+        data = self.row(i)
+        for name in FIELDS[1:]:
+            data[name] = Decimal(str(data[name]))
+        return data
+
+    # -- conversion ----------------------------------------------------------
+
+    def to_frame(self, datetime_index: bool = False):
+        """Wrap the arrays in a DataFrame without copying the price columns.
+
+        The ``timestamp`` column is timezone-aware (UTC); with
+        ``datetime_index=True`` it becomes the index instead.
+        """
+        import pandas as pd
+
+        stamps = pd.DatetimeIndex(self.timestamp.view('datetime64[ms]')).tz_localize('UTC')
+        data = {name: getattr(self, name) for name in FIELDS[1:]}
+        if datetime_index:
+            return pd.DataFrame(data, index=stamps, copy=False)
+        frame = pd.DataFrame(data, copy=False)
+        frame.insert(0, 'timestamp', stamps)
+        return frame
@@ -1,10 +1,16 @@
-import requests
+import numpy as np
 import time
 from datetime import datetime, timedelta, timezone as dt_timezone
 from decimal import Decimal
-from typing import Dict, List, Optional
+from concurrent.futures import ThreadPoolExecutor, wait
+from functools import partial
+from typing import Callable, Dict, List, Optional, Tuple
 from django.utils import timezone
 
+from .candles import CandleSeries
+from .candle_store import CandleStore, empty_columns, get_candle_store, interval_to_ms
+from .http_client import http_get
+
 
 class CryptoDataFetcher:
     """Fetches cryptocurrency data from CoinGecko API"""
@@ -25,7 +31,7 @@ class CryptoDataFetcher:
                 'include_24hr_change': 'true',
                 'include_24hr_vol': 'true'
             }
-            response = requests.get(url, params=params, timeout=10)
+            response = http_get('coingecko', url, params=params, timeout=10)
             response.raise_for_status()
             data = response.json()
             
@@ -54,11 +60,15 @@ class CryptoDataFetcher:
             'price': Decimal(str(data['price'])),
             'change_24h': Decimal(str(data['change'])),
             'volume_24h': Decimal('1200000000'),
+            'mock': True,
         }
     
     @staticmethod
-    def get_historical_data(symbol: str, days: int = 30) -> List[Dict]:
-        """Get historical price data"""
+    def get_historical_data(symbol: str, days: int = 30) -> CandleSeries:
+        """Get historical daily prices as a close-only CandleSeries.
+
+        Returns an empty series if CoinGecko cannot be reached.
+        """
         try:
             url = f"{CryptoDataFetcher.BASE_URL}/coins/{symbol}/market_chart"
             params = {
@@ -66,54 +76,106 @@ class CryptoDataFetcher:
                 'days': days,
                 'interval': 'daily'
             }
-            response = requests.get(url, params=params, timeout=10)
+            response = http_get('coingecko', url, params=params, timeout=10)
             response.raise_for_status()
             data = response.json()
-            
-            prices = []
-            for price_point in data.get('prices', []):
-                prices.append({
-                    'timestamp': datetime.fromtimestamp(price_point[0] / 1000, tz=dt_timezone.utc),
-                    'price': Decimal(str(price_point[1]))
-                })
-            return prices
+
+            points = np.array(data.get('prices', []), dtype=float).reshape(-1, 2)
+            volumes = np.array(data.get('total_volumes', []), dtype=float).reshape(-1, 2)
+            volume = volumes[:, 1] if len(volumes) == len(points) else None
+            return CandleSeries.from_prices(points[:, 0].astype('<i8'), points[:, 1], volume)
         except Exception as e:
             print(f"Error fetching historical data for {symbol}: {e}")
-            return []
+            return CandleSeries.empty()
+
+    BINANCE_KLINES_URL = "https://api.binance.com/api/v3/klines"
+    BINANCE_MAX_LIMIT = 1000
+
+    @staticmethod
+    def binance_symbol(asset_symbol: str) -> str:
+        """Map an asset symbol ('BTC/USD') to its Binance pair ('BTCUSDT'); USD quotes use USDT."""
+        base, _, quote = asset_symbol.upper().partition('/')
+        if not quote:
+            return base
+        return base + ('USDT' if quote == 'USD' else quote)
 
     @staticmethod
-    def get_binance_klines(symbol: str, interval: str = '1d', limit: int = 500) -> List[Dict]:
-        """Fetch OHLCV candlesticks from Binance public API.
+    def get_binance_klines(symbol: str, interval: str = '1d', limit: int = 500) -> CandleSeries:
+        """Fetch OHLCV candlesticks, served from the local candle store.
 
-        Returns list of dicts: {timestamp: datetime, open, high, low, close, volume}
+        Only the range missing from the store is requested from the Binance
+        public API; if Binance is unreachable whatever is stored is returned.
+        Only closed candles are returned.
         """
+        store = get_candle_store()
         try:
-            url = "https://api.binance.com/api/v3/klines"
-            params = {
-                'symbol': symbol,
-                'interval': interval,
-                'limit': limit
-            }
-            resp = requests.get(url, params=params, timeout=10)
-            resp.raise_for_status()
-            data = resp.json()
-
-            candles = []
-            for row in data:
-                # Binance kline format: [openTime, open, high, low, close, volume, closeTime, ...]
-                ts = datetime.fromtimestamp(row[0] / 1000, tz=dt_timezone.utc)
-                candles.append({
-                    'timestamp': ts,
-                    'open': Decimal(str(row[1])),
-                    'high': Decimal(str(row[2])),
-                    'low': Decimal(str(row[3])),
-                    'close': Decimal(str(row[4])),
-                    'volume': Decimal(str(row[5])),
-                })
-            return candles
+            CryptoDataFetcher._sync_binance_klines(store, symbol, interval, limit)
         except Exception as e:
             print(f"Error fetching Binance klines for {symbol}: {e}")
-            return []
+
+        return CandleSeries.from_columns(store.read(symbol, interval, limit=limit))
+
+    @staticmethod
+    def _fetch_binance_klines(symbol: str, interval: str, **params) -> Dict[str, np.ndarray]:
+        """Request one page of klines and return the closed candles as columns."""
+        params.update({'symbol': symbol, 'interval': interval})
+        resp = http_get('binance', CryptoDataFetcher.BINANCE_KLINES_URL, params=params, timeout=10)
+        resp.raise_for_status()
+        now_ms = int(time.time() * 1000)
+        # Binance kline format: [openTime, open, high, low, close, volume, closeTime, ...]
+        rows = [row for row in resp.json() if int(row[6]) < now_ms]
+        if not rows:
+            return empty_columns()
+        return {
+            'timestamp': np.array([int(r[0]) for r in rows], dtype='<i8'),
+            'open': np.array([r[1] for r in rows], dtype='<f8'),
+            'high': np.array([r[2] for r in rows], dtype='<f8'),
+            'low': np.array([r[3] for r in rows], dtype='<f8'),
+            'close': np.array([r[4] for r in rows], dtype='<f8'),
+            'volume': np.array([r[5] for r in rows], dtype='<f8'),
+        }
+
+    @staticmethod
+    def _sync_binance_klines(store: CandleStore, symbol: str, interval: str, limit: int):
+        """Bring the stored series up to date and at least ``limit`` rows deep."""
+        page = CryptoDataFetcher.BINANCE_MAX_LIMIT
+        step = interval_to_ms(interval)
+        info = store.stats(symbol, interval)
+
+        if info['last'] is None:
+            # One more than wanted: the newest kline is still open and gets dropped.
+            want = min(limit + 1, page)
+            cols = CryptoDataFetcher._fetch_binance_klines(symbol, interval, limit=want)
+            store.append(symbol, interval, cols, head_complete=len(cols['timestamp']) < want - 1)
+            info = store.stats(symbol, interval)
+            if info['last'] is None:
+                return
+        else:
+            # Tail: a newer closed candle exists once the one after the last
+            # stored candle has also closed.
+            start = info['last'] + 1
+            while int(time.time() * 1000) >= start - 1 + 2 * step:
+                cols = CryptoDataFetcher._fetch_binance_klines(symbol, interval, startTime=start, limit=page)
+                if not len(cols['timestamp']):
+                    break
+                store.append(symbol, interval, cols)
+                start = int(cols['timestamp'][-1]) + 1
+                if len(cols['timestamp']) < page - 1:
+                    break
+
+        # Head: backfill older candles when the caller wants more than we hold
+        # (also right after a first page that could not cover ``limit``).
+        missing = limit - info['rows']
+        first = info['first']
+        while missing > 0 and not info['head_complete']:
+            want = min(missing, page)
+            cols = CryptoDataFetcher._fetch_binance_klines(symbol, interval, endTime=first - 1, limit=want)
+            complete = len(cols['timestamp']) < want
+            store.append(symbol, interval, cols, head_complete=complete)
+            if complete:
+                break
+            missing -= want
+            first = int(cols['timestamp'][0])
 
 
 class StockDataFetcher:
@@ -131,7 +193,7 @@ class StockDataFetcher:
                 'symbol': 'SPY',  # S&P 500 ETF
                 'apikey': 'demo'  # Replace with actual API key
             }
-            response = requests.get(url, params=params, timeout=10)
+            response = http_get('alphavantage', url, params=params, timeout=10)
             response.raise_for_status()
             data = response.json()
             
@@ -154,6 +216,7 @@ class StockDataFetcher:
             'price': Decimal('4132.45'),
             'change': Decimal('49.59'),
             'change_percent': Decimal('1.2'),
+            'mock': True,
         }
 
 
@@ -169,7 +232,7 @@ class SentimentFetcher:
         try:
             # Using Alternative.me API (free, no key required)
             url = "https://api.alternative.me/fng/"
-            response = requests.get(url, timeout=10)
+            response = http_get('alternative_me', url, timeout=10)
             response.raise_for_status()
             data = response.json()
             
@@ -206,86 +269,156 @@ class SentimentFetcher:
         return {
             'score': 72,
             'level': 'greed',
+            'mock': True,
         }
 
 
 class DataSyncService:
     """Service to sync market data to database"""
-    
+
+    # Upper bound on the wall time of one concurrent sync, in seconds.
+    SYNC_DEADLINE = 12
+
+    CRYPTO_ASSETS = {
+        'btc': ('bitcoin', 'BTC/USD', 'Bitcoin'),
+        'eth': ('ethereum', 'ETH/USD', 'Ethereum'),
+    }
+
     @staticmethod
-    def sync_market_indicators():
-        """Sync all market indicators"""
-        from dashboard.models import MarketIndicator, Asset
-        
-        # Sync S&P 500
-        sp500_data = StockDataFetcher.get_sp500_price()
-        if sp500_data:
-            MarketIndicator.objects.create(
-                indicator_type='sp500',
-                value=sp500_data['price'],
-                change_percent=sp500_data['change_percent']
-            )
-        
-        # Sync Bitcoin
-        btc_data = CryptoDataFetcher.get_price('bitcoin')
-        if btc_data:
-            MarketIndicator.objects.create(
-                indicator_type='btc',
-                value=btc_data['price'],
-                change_percent=btc_data['change_24h']
-            )
-            # Update or create Asset
-            asset, _ = Asset.objects.get_or_create(
-                symbol='BTC/USD',
-                defaults={
-                    'name': 'Bitcoin',
-                    'asset_type': 'crypto',
-                    'exchange': 'Coinbase',
-                    'current_price': btc_data['price'],
-                    'change_24h': btc_data['change_24h'],
-                    'volume_24h': btc_data['volume_24h'],
-                }
-            )
-            if not _:
-                asset.current_price = btc_data['price']
-                asset.change_24h = btc_data['change_24h']
-                asset.volume_24h = btc_data['volume_24h']
-                asset.save()
-        
-        # Sync Ethereum
-        eth_data = CryptoDataFetcher.get_price('ethereum')
-        if eth_data:
-            MarketIndicator.objects.create(
-                indicator_type='eth',
-                value=eth_data['price'],
-                change_percent=eth_data['change_24h']
-            )
-            asset, _ = Asset.objects.get_or_create(
-                symbol='ETH/USD',
-                defaults={
-                    'name': 'Ethereum',
-                    'asset_type': 'crypto',
-                    'exchange': 'Coinbase',
-                    'current_price': eth_data['price'],
-                    'change_24h': eth_data['change_24h'],
-                    'volume_24h': eth_data['volume_24h'],
-                }
-            )
-            if not _:
-                asset.current_price = eth_data['price']
-                asset.change_24h = eth_data['change_24h']
-                asset.volume_24h = eth_data['volume_24h']
-                asset.save()
-    
+    def _fetch_concurrently(tasks: Dict[str, Callable[[], Optional[Dict]]],
+                            deadline: float) -> Tuple[Dict[str, Dict], Dict[str, str]]:
+        """Run every fetcher at once and wait at most ``deadline`` seconds.
+
+        Returns the fetched payloads and a status per task: 'ok', 'fallback'
+        (the fetcher fell back to mock data), 'empty', 'timeout' or
+        'error: <message>'.
+        """
+        results, report = {}, {}
+        executor = ThreadPoolExecutor(max_workers=len(tasks), thread_name_prefix='market-sync')
+        futures = {executor.submit(fn): name for name, fn in tasks.items()}
+        done, pending = wait(futures, timeout=deadline)
+        # Never block the caller on stragglers; their HTTP timeouts bound them.
+        executor.shutdown(wait=False, cancel_futures=True)
+
+        for future in done:
+            name = futures[future]
+            try:
+                data = future.result()
+            except Exception as e:
+                report[name] = f'error: {e}'
+                continue
+            if not data:
+                report[name] = 'empty'
+                continue
+            results[name] = data
+            report[name] = 'fallback' if data.get('mock') else 'ok'
+        for future in pending:
+            report[futures[future]] = 'timeout'
+        return results, report
+
     @staticmethod
-    def sync_sentiment():
-        """Sync market sentiment"""
+    def _save_indicator(indicator_type: str, value, change_percent):
+        from django.db import transaction
+        from dashboard.models import MarketIndicator
+        from dashboard.stream import publish_indicator
+
+        indicator = MarketIndicator.objects.create(
+            indicator_type=indicator_type,
+            value=value,
+            change_percent=change_percent,
+        )
+        # Push to live dashboard streams once the sync transaction commits.
+        transaction.on_commit(lambda: publish_indicator(indicator))
+
+    @staticmethod
+    def _save_crypto(indicator_type: str, data: Dict):
+        """Store a coin's indicator, asset and price; returns the new PriceData row."""
+        from dashboard.models import Asset, PriceData
+
+        _, symbol, name = DataSyncService.CRYPTO_ASSETS[indicator_type]
+        DataSyncService._save_indicator(indicator_type, data['price'], data['change_24h'])
+        # Update or create Asset
+        asset, created = Asset.objects.get_or_create(
+            symbol=symbol,
+            defaults={
+                'name': name,
+                'asset_type': 'crypto',
+                'exchange': 'Coinbase',
+                'current_price': data['price'],
+                'change_24h': data['change_24h'],
+                'volume_24h': data['volume_24h'],
+            }
+        )
+        if not created:
+            asset.current_price = data['price']
+            asset.change_24h = data['change_24h']
+            asset.volume_24h = data['volume_24h']
+            asset.save()
+        return PriceData.objects.create(
+            asset=asset,
+            price=data['price'],
+            volume=data['volume_24h'],
+            timestamp=timezone.now(),
+        )
+
+    @staticmethod
+    def _save_sentiment(data: Dict):
+        from django.db import transaction
         from dashboard.models import MarketSentiment
-        
-        sentiment_data = SentimentFetcher.get_fear_greed_index()
-        MarketSentiment.objects.create(
-            score=sentiment_data['score'],
-            level=sentiment_data['level']
+        from dashboard.stream import publish_sentiment
+
+        sentiment = MarketSentiment.objects.create(
+            score=data['score'],
+            level=data['level']
         )
+        transaction.on_commit(lambda: publish_sentiment(sentiment))
+
+    @staticmethod
+    def sync_all(include_indicators: bool = True, include_sentiment: bool = True,
+                 deadline: Optional[float] = None) -> Dict[str, str]:
+        """Fetch indicators and sentiment concurrently and store them in one transaction.
+
+        Wall time is roughly that of the slowest provider, capped by
+        ``deadline``. Returns a per-indicator status report (see
+        ``_fetch_concurrently``); failed or timed-out indicators are skipped.
+        """
+        from django.db import transaction
+        from dashboard.retention import record_prices
+
+        tasks = {}
+        if include_indicators:
+            tasks['sp500'] = StockDataFetcher.get_sp500_price
+            for key, (coin_id, _, _) in DataSyncService.CRYPTO_ASSETS.items():
+                tasks[key] = partial(CryptoDataFetcher.get_price, coin_id)
+        if include_sentiment:
+            tasks['sentiment'] = SentimentFetcher.get_fear_greed_index
+        if not tasks:
+            return {}
 
+        results, report = DataSyncService._fetch_concurrently(
+            tasks, deadline if deadline is not None else DataSyncService.SYNC_DEADLINE)
 
+        with transaction.atomic():
+            if 'sp500' in results:
+                DataSyncService._save_indicator('sp500', results['sp500']['price'], results['sp500']['change_percent'])
+            prices = [DataSyncService._save_crypto(key, results[key])
+                      for key in DataSyncService.CRYPTO_ASSETS if key in results]
+            # Rollups are updated once per sync rather than per saved row.
+            record_prices(prices)
+            if 'sentiment' in results:
+                DataSyncService._save_sentiment(results['sentiment'])
+
+        failed = {name: status for name, status in report.items() if status not in ('ok', 'fallback')}
+        if failed:
+            print(f"Market sync partial failure: {failed}")
+        return report
+
+    @staticmethod
+    def sync_market_indicators() -> Dict[str, str]:
+        """Sync all market indicators"""
+        return DataSyncService.sync_all(include_sentiment=False)
+
+    @staticmethod
+    def sync_sentiment() -> Dict[str, str]:
+        """Sync market sentiment"""
+        return DataSyncService.sync_all(include_indicators=False)
@@ -0,0 +1,80 @@
+"""
+Largest-Triangle-Three-Buckets (LTTB) downsampling for charts.
+
+``lttb_indices`` picks ``max_points`` of a series that keep its visual
+shape: the first and last points, and from each of ``max_points - 2``
+equal buckets in between the point forming the largest triangle with the
+point kept from the previous bucket and the mean of the next bucket.
+Peaks and troughs survive, unlike with every-nth-point thinning.
+
+Every quantity that does not depend on the previously kept point (bucket
+edges, next-bucket means and the per-point triangle coefficients) is
+computed for the whole series at once. Only the argmax per bucket runs
+in a Python loop, which is ``max_points`` short steps.
+"""
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+
+
+def lttb_indices(y, max_points: int, x=None) -> np.ndarray:
+    """Indices (ascending) of at most ``max_points`` points of ``y`` to draw.
+
+    ``x`` defaults to the positions ``0..n-1``; pass timestamps for
+    irregularly spaced series. Series already within budget are returned
+    whole.
+    """
+    y = np.asarray(y, dtype=float)
+    n = len(y)
+    if max_points >= n or n <= 2:
+        return np.arange(n)
+    if max_points < 3:
+        return np.array([0, n - 1][:max(max_points, 0)], dtype=np.int64)
+    x = np.arange(n, dtype=float) if x is None else np.asarray(x, dtype=float)
+
+    buckets = max_points - 2
+    # Interior points 1..n-2 split into ``buckets`` non-empty ranges [edges[i], edges[i+1]).
+    edges = np.linspace(1, n - 1, buckets + 1).astype(np.int64)
+    counts = np.diff(edges)
+    mean_x = np.add.reduceat(x[:n - 1], edges[:-1]) / counts
+    mean_y = np.add.reduceat(y[:n - 1], edges[:-1]) / counts
+    # Each bucket looks ahead to the next bucket's mean; the last one to the final point.
+    next_x = np.append(mean_x[1:], x[-1])
+    next_y = np.append(mean_y[1:], y[-1])
+
+    # Twice the area of the triangle (a, p, next) is |ax*A + ay*B + C| for point p.
+    owner = np.repeat(np.arange(buckets), counts)
+    px, py = x[1:n - 1], y[1:n - 1]
+    coef_a = py - next_y[owner]
+    coef_b = next_x[owner] - px
+    coef_c = px * next_y[owner] - next_x[owner] * py
+
+    out = np.empty(max_points, dtype=np.int64)
+    out[0], out[-1] = 0, n - 1
+    a = 0
+    for i in range(buckets):
+        lo, hi = edges[i] - 1, edges[i + 1] - 1
+        area = np.abs(x[a] * coef_a[lo:hi] + y[a] * coef_b[lo:hi] + coef_c[lo:hi])
+        a = edges[i] + int(np.argmax(area))
+        out[i + 1] = a
+    return out
+
+
+def lttb(x, y, max_points: int):
+    """``(x, y)`` arrays reduced to at most ``max_points`` points."""
+    keep = lttb_indices(y, max_points, x=x)
+    return np.asarray(x)[keep], np.asarray(y)[keep]
+
+
+def downsample_records(records: Sequence[Dict], value_key: str, max_points: Optional[int],
+                       x_key: Optional[str] = None) -> List[Dict]:
+    """The records (dicts) LTTB keeps when charting ``value_key``.
+
+    ``x_key`` names a numeric field to use as x; by default records are
+    taken as evenly spaced. ``max_points`` of None keeps everything.
+    """
+    if not max_points or len(records) <= max_points:
+        return list(records)
+    x = [r[x_key] for r in records] if x_key else None
+    keep = lttb_indices([r[value_key] for r in records], max_points, x=x)
+    return [records[i] for i in keep.tolist()]
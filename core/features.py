@@ -0,0 +1,132 @@
+"""
+Feature engineering for the forecast models.
+
+Lag matrices are strided views over the price array
+(``sliding_window_view``), so building them copies nothing however long
+the series is; the other features are whole-series vectorized
+computations from ``core.indicators``. Only ``feature_matrix`` allocates,
+once, for the final stacked design matrix.
+"""
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+from . import indicators
+
+
+def lag_matrix(values, window: int, horizon: int = 1) -> Tuple[np.ndarray, np.ndarray]:
+    """Lagged inputs and targets as read-only views over ``values``.
+
+    Row ``i`` of ``X`` is ``values[i:i + window]`` and row ``i`` of ``y`` the
+    ``horizon`` values that follow it (a 1-D ``y`` when ``horizon == 1``).
+    """
+    x = np.asarray(values, dtype=float)
+    rows = len(x) - window - horizon + 1
+    if rows <= 0:
+        return np.empty((0, window)), np.empty((0,) if horizon == 1 else (0, horizon))
+    X = sliding_window_view(x, window)[:rows]
+    if horizon == 1:
+        return X, x[window:window + rows]
+    return X, sliding_window_view(x[window:], horizon)[:rows]
+
+
+def returns(values, periods: int = 1, log: bool = False) -> np.ndarray:
+    """Simple (or log) returns over ``periods`` steps; ``nan`` for the first ``periods`` points."""
+    x = np.asarray(values, dtype=float)
+    out = np.full(len(x), np.nan)
+    if len(x) > periods:
+        with np.errstate(divide='ignore', invalid='ignore'):
+            out[periods:] = np.log(x[periods:] / x[:-periods]) if log else x[periods:] / x[:-periods] - 1.0
+    return out
+
+
+def rolling_stats(values, window: int) -> Dict[str, np.ndarray]:
+    """Rolling mean, population std, min and max; ``nan`` during warm-up."""
+    x = np.asarray(values, dtype=float)
+    out = {
+        'mean': indicators.sma(x, window),
+        'std': indicators.rolling_std(x, window),
+        'min': np.full(len(x), np.nan),
+        'max': np.full(len(x), np.nan),
+    }
+    if len(x) >= window:
+        view = sliding_window_view(x, window)
+        out['min'][window - 1:] = view.min(axis=1)
+        out['max'][window - 1:] = view.max(axis=1)
+    return out
+
+
+def indicator_features(values) -> Dict[str, np.ndarray]:
+    """The ``TechnicalIndicators`` signals as whole series, scaled to be price-independent.
+
+    ``rsi`` uses the same simple averaging as ``TechnicalIndicators.calculate_rsi``;
+    ``macd_hist`` is relative to price; ``bb_position`` is where the price
+    sits in its Bollinger band (0 = lower, 1 = upper).
+    """
+    x = np.asarray(values, dtype=float)
+    _, _, hist = indicators.macd(x)
+    middle, upper, lower = indicators.bollinger_bands(x)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        macd_hist = hist / x
+        width = upper - lower
+        bb_position = np.where(width > 0, (x - lower) / width, 0.5)
+    return {
+        'rsi': indicators.rsi(x, 14, smoothing='simple'),
+        'macd_hist': macd_hist,
+        'bb_position': np.where(np.isnan(middle), np.nan, bb_position),
+        'sma_ratio': x / indicators.sma(x, 20) - 1.0,
+    }
+
+
+EXTRA_FEATURES = ('returns', 'stats', 'indicators')
+
+
+def _extra_columns(x: np.ndarray, extra: Sequence[str], stats_window: int) -> List[np.ndarray]:
+    """Per-point feature series for the ``extra`` groups, in a fixed order."""
+    unknown = sorted(set(extra) - set(EXTRA_FEATURES))
+    if unknown:
+        raise ValueError(f"Unknown feature groups: {', '.join(unknown)}")
+    columns = []
+    if 'returns' in extra:
+        columns.append(returns(x))
+    if 'stats' in extra:
+        stats = rolling_stats(x, stats_window)
+        columns.extend(stats[name] / x - 1.0 if name != 'std' else stats[name] / x
+                       for name in ('mean', 'std', 'min', 'max'))
+    if 'indicators' in extra:
+        columns.extend(indicator_features(x).values())
+    return columns
+
+
+def feature_matrix(values, window: int, horizon: int = 1, extra: Sequence[str] = EXTRA_FEATURES,
+                   stats_window: Optional[int] = None, dtype=np.float32) -> Tuple[np.ndarray, np.ndarray, int]:
+    """Design matrix of lags plus extra per-point features, aligned to the lag targets.
+
+    The extra features at row ``i`` are taken at the last lag
+    (``values[i + window - 1]``), so nothing looks ahead. Leading rows where
+    any feature is still warming up are dropped. Returns ``(X, y, first)``
+    where ``first`` is the offset of the first kept row in the full lag
+    matrix. ``dtype`` defaults to float32, the precision tree models use.
+    """
+    x = np.asarray(values, dtype=float)
+    lags, y = lag_matrix(x, window, horizon)
+    rows = len(lags)
+    columns = _extra_columns(x, extra, stats_window or window)
+
+    X = np.empty((rows, window + len(columns)), dtype=dtype)
+    X[:, :window] = lags
+    for k, column in enumerate(columns):
+        X[:, window + k] = column[window - 1:window - 1 + rows]
+
+    valid = ~np.isnan(X).any(axis=1)
+    first = int(np.argmax(valid)) if valid.any() else rows
+    return X[first:], y[first:], first
+
+
+def feature_row(values, window: int, extra: Sequence[str] = EXTRA_FEATURES,
+                stats_window: Optional[int] = None) -> np.ndarray:
+    """The ``feature_matrix`` row for the latest point: its inputs for predicting what comes next."""
+    x = np.asarray(values, dtype=float)
+    columns = _extra_columns(x, extra, stats_window or window)
+    return np.concatenate([x[-window:], [column[-1] for column in columns]])
@@ -0,0 +1,238 @@
+"""
+Shared HTTP client layer for the market data fetchers.
+
+Every upstream provider gets one pooled ``requests.Session`` (so TLS
+connections are reused across calls), a token-bucket rate limiter, retry
+with jittered exponential backoff that honours ``Retry-After`` on 429/503,
+and per-call latency metrics. Each call has a total deadline covering the
+wait for a token and every retry, so an upstream outage or a long
+``Retry-After`` costs a caller at most that long.
+"""
+import random
+import threading
+import time
+from collections import deque
+from email.utils import parsedate_to_datetime
+from typing import Dict, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+
+
+# Requests per second and burst size for each provider. The CoinGecko and
+# Alpha Vantage numbers follow their free-tier quotas.
+PROVIDER_LIMITS = {
+    'coingecko': {'rate': 0.5, 'burst': 5},
+    'binance': {'rate': 10.0, 'burst': 20},
+    'alphavantage': {'rate': 5 / 60, 'burst': 5},
+    'alternative_me': {'rate': 1.0, 'burst': 5},
+}
+DEFAULT_LIMIT = {'rate': 1.0, 'burst': 5}
+
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+
+class DeadlineExceeded(requests.Timeout):
+    """The call's total deadline passed before a response could be obtained."""
+
+
+class TokenBucket:
+    """Thread-safe token bucket; ``acquire`` blocks until a token is free."""
+
+    def __init__(self, rate: float, burst: int):
+        self.rate = float(rate)
+        self.capacity = float(burst)
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+        self.blocked_until = 0.0
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def acquire(self, deadline: Optional[float] = None) -> bool:
+        """Take a token; False if none frees up before ``deadline`` (a ``time.monotonic()`` value)."""
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._refill(now)
+                if now >= self.blocked_until and self.tokens >= 1:
+                    self.tokens -= 1
+                    return True
+                wait = max(self.blocked_until - now, (1 - self.tokens) / self.rate)
+            if deadline is not None and now + wait > deadline:
+                return False
+            time.sleep(wait)
+
+    def block_for(self, seconds: float):
+        """Stop handing out tokens for ``seconds`` (used after a 429)."""
+        with self._lock:
+            self.blocked_until = max(self.blocked_until, time.monotonic() + seconds)
+            self.tokens = 0.0
+
+
+class LatencyStats:
+    """Call counters plus a sliding sample of recent latencies."""
+
+    def __init__(self, sample_size: int = 512):
+        self.calls = 0
+        self.errors = 0
+        self.retries = 0
+        self.throttled = 0
+        self.total_ms = 0.0
+        self.samples = deque(maxlen=sample_size)
+        self._lock = threading.Lock()
+
+    def record(self, elapsed_ms: float, ok: bool):
+        with self._lock:
+            self.calls += 1
+            self.total_ms += elapsed_ms
+            self.samples.append(elapsed_ms)
+            if not ok:
+                self.errors += 1
+
+    def record_retry(self):
+        with self._lock:
+            self.retries += 1
+
+    def record_throttle(self):
+        with self._lock:
+            self.throttled += 1
+
+    def snapshot(self) -> Dict:
+        with self._lock:
+            ordered = sorted(self.samples)
+            calls = self.calls
+
+            def pct(p):
+                return round(ordered[min(len(ordered) - 1, int(p * len(ordered)))], 2) if ordered else None
+
+            return {
+                'calls': calls,
+                'errors': self.errors,
+                'retries': self.retries,
+                'throttled': self.throttled,
+                'avg_ms': round(self.total_ms / calls, 2) if calls else None,
+                'p50_ms': pct(0.50),
+                'p95_ms': pct(0.95),
+                'max_ms': round(ordered[-1], 2) if ordered else None,
+            }
+
+
+class ProviderClient:
+    """Pooled, rate-limited HTTP client for one upstream provider."""
+
+    def __init__(self, name: str, rate: float, burst: int, max_retries: int = 3,
+                 backoff_base: float = 0.5, backoff_cap: float = 8.0, pool_size: int = 10,
+                 deadline: float = 15.0):
+        self.name = name
+        self.max_retries = max_retries
+        self.deadline = deadline
+        self.backoff_base = backoff_base
+        self.backoff_cap = backoff_cap
+        self.bucket = TokenBucket(rate, burst)
+        self.stats = LatencyStats()
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, max_retries=0)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+
+    def _backoff(self, attempt: int) -> float:
+        # "Full jitter": uniform in [0, min(cap, base * 2^attempt)].
+        return random.uniform(0, min(self.backoff_cap, self.backoff_base * (2 ** attempt)))
+
+    @staticmethod
+    def _retry_after(response: requests.Response) -> Optional[float]:
+        value = response.headers.get('Retry-After')
+        if not value:
+            return None
+        try:
+            return max(0.0, float(value))
+        except ValueError:
+            pass
+        try:
+            return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+        except (TypeError, ValueError):
+            return None
+
+    def get(self, url: str, params: Optional[Dict] = None, timeout: float = 10,
+            deadline: Optional[float] = None, **kwargs) -> requests.Response:
+        """GET with rate limiting and retries, all within ``deadline`` seconds.
+
+        ``deadline`` defaults to the client's and bounds the token wait, every
+        attempt's ``timeout`` and the sleeps between retries. The final
+        response is returned even if it is an error status, so callers keep
+        using ``raise_for_status``. Network errors are re-raised once retries
+        (or the deadline) run out; ``DeadlineExceeded`` is raised when no
+        attempt could be started in time.
+        """
+        give_up = time.monotonic() + (self.deadline if deadline is None else deadline)
+        attempt = 0
+        while True:
+            remaining = give_up - time.monotonic() if self.bucket.acquire(give_up) else 0
+            if remaining <= 0:
+                raise DeadlineExceeded(f"{self.name}: no request slot before the deadline")
+            started = time.perf_counter()
+            try:
+                response = self.session.get(url, params=params, timeout=min(timeout, remaining), **kwargs)
+            except (requests.ConnectionError, requests.Timeout):
+                self.stats.record((time.perf_counter() - started) * 1000, ok=False)
+                delay = self._backoff(attempt)
+                if attempt >= self.max_retries or time.monotonic() + delay >= give_up:
+                    raise
+            else:
+                ok = response.status_code < 400
+                self.stats.record((time.perf_counter() - started) * 1000, ok=ok)
+                if response.status_code not in RETRY_STATUSES or attempt >= self.max_retries:
+                    return response
+                delay = self._retry_after(response)
+                if response.status_code == 429:
+                    self.stats.record_throttle()
+                    # Pause every caller sharing this provider, not only this one, but never
+                    # longer than one backoff step: a long Retry-After must not stall them all.
+                    pause = delay if delay is not None else self._backoff(attempt + 1)
+                    self.bucket.block_for(min(pause, self.backoff_cap))
+                delay = min(self._backoff(attempt) if delay is None else delay, self.backoff_cap)
+                if time.monotonic() + delay >= give_up:
+                    return response
+                response.close()
+
+            self.stats.record_retry()
+            attempt += 1
+            time.sleep(delay)
+
+
+_clients: Dict[str, ProviderClient] = {}
+_clients_lock = threading.Lock()
+
+
+def get_client(provider: str) -> ProviderClient:
+    """Return the shared client for ``provider``, creating it on first use.
+
+    Limits can be overridden per provider with ``settings.HTTP_PROVIDER_LIMITS``.
+    """
+    with _clients_lock:
+        client = _clients.get(provider)
+        if client is None:
+            limits = dict(PROVIDER_LIMITS.get(provider, DEFAULT_LIMIT))
+            try:
+                from django.conf import settings
+                limits.update(getattr(settings, 'HTTP_PROVIDER_LIMITS', {}).get(provider, {}))
+            except Exception:
+                pass
+            client = ProviderClient(provider, **limits)
+            _clients[provider] = client
+        return client
+
+
+def http_get(provider: str, url: str, params: Optional[Dict] = None, timeout: float = 10, **kwargs) -> requests.Response:
+    """Convenience wrapper: ``get_client(provider).get(...)``."""
+    return get_client(provider).get(url, params=params, timeout=timeout, **kwargs)
+
+
+def client_metrics() -> Dict[str, Dict]:
+    """Latency and retry metrics for every provider used so far."""
+    with _clients_lock:
+        clients = list(_clients.values())
+    return {c.name: c.stats.snapshot() for c in clients}
@@ -0,0 +1,213 @@
+"""
+Vectorized technical indicators.
+
+Every function takes numpy-compatible arrays and returns the whole
+indicator series (same length as the input, ``nan`` where the indicator
+is not yet defined) in a single pass. ``TechnicalIndicators`` in
+``core.pattern_detection`` wraps these for its last-value API.
+"""
+from typing import Optional, Tuple
+
+import numpy as np
+
+
+# Elements per temporary block in ``rolling_std``.
+_STD_CHUNK_ELEMENTS = 1 << 20
+
+# Largest growth factor allowed for beta**-k inside one block of ``_ewm``.
+_EWM_BLOCK_RANGE = 1e100
+
+
+def _as_float(values) -> np.ndarray:
+    return np.asarray(values, dtype=float)
+
+
+def _ewm(x: np.ndarray, alpha: float, init: float) -> np.ndarray:
+    """Solve ``y[i] = alpha * x[i] + (1 - alpha) * y[i - 1]`` with ``y[-1] = init``.
+
+    The recurrence is evaluated in closed form over blocks, with a cumulative
+    sum of ``x[j] * beta**-j`` per block. Blocks are sized so ``beta**-j``
+    stays far from overflow, which for common periods means a handful of
+    blocks even on millions of points.
+    """
+    n = len(x)
+    out = np.empty(n)
+    if n == 0:
+        return out
+    beta = 1.0 - alpha
+    if beta <= 0.0:
+        out[:] = x
+        return out
+
+    block = n if beta == 1.0 else max(1, min(n, int(np.log(_EWM_BLOCK_RANGE) / -np.log(beta))))
+    k = np.arange(block)
+    pow_pos = beta ** (k + 1)          # beta^(k+1), weight on the carried value
+    pow_k = beta ** k                  # beta^k
+    pow_neg = beta ** -k.astype(float)  # beta^-k
+
+    carry = float(init)
+    for start in range(0, n, block):
+        chunk = x[start:start + block]
+        m = len(chunk)
+        acc = np.cumsum(chunk * pow_neg[:m])
+        y = pow_pos[:m] * carry + alpha * pow_k[:m] * acc
+        out[start:start + m] = y
+        carry = y[-1]
+    return out
+
+
+def ema(values, period: int) -> np.ndarray:
+    """Exponential moving average with ``alpha = 2 / (period + 1)``, seeded with the first value."""
+    x = _as_float(values)
+    if not len(x):
+        return x.copy()
+    alpha = 2.0 / (period + 1)
+    out = np.empty_like(x)
+    out[0] = x[0]
+    out[1:] = _ewm(x[1:], alpha, x[0])
+    return out
+
+
+def sma(values, period: int, min_periods: Optional[int] = None) -> np.ndarray:
+    """Rolling mean over ``period`` values.
+
+    Positions with fewer than ``min_periods`` values (default ``period``) are
+    ``nan``; with ``min_periods=1`` the warm-up uses the expanding mean, like
+    ``pandas.Series.rolling(period, min_periods=1).mean()``.
+    """
+    x = _as_float(values)
+    n = len(x)
+    if min_periods is None:
+        min_periods = period
+    if not n:
+        return x.copy()
+    # Centre on the first value so the running sum stays small.
+    ref = x[0]
+    csum = np.empty(n + 1)
+    csum[0] = 0.0
+    np.cumsum(x - ref, out=csum[1:])
+    idx = np.arange(1, n + 1)
+    lo = np.maximum(idx - period, 0)
+    counts = idx - lo
+    out = (csum[idx] - csum[lo]) / counts + ref
+    out[counts < min_periods] = np.nan
+    return out
+
+
+def rolling_std(values, period: int, ddof: int = 0) -> np.ndarray:
+    """Rolling standard deviation (population by default); ``nan`` during warm-up."""
+    x = _as_float(values)
+    out = np.full(len(x), np.nan)
+    if len(x) < period:
+        return out
+    windows = np.lib.stride_tricks.sliding_window_view(x, period)
+    # ``std`` materialises each window's deviations, so bound that temporary
+    # by working through the rows in chunks.
+    step = max(1, _STD_CHUNK_ELEMENTS // period)
+    for start in range(0, len(windows), step):
+        out[period - 1 + start:period - 1 + start + step] = windows[start:start + step].std(axis=1, ddof=ddof)
+    return out
+
+
+def rsi(values, period: int = 14, smoothing: str = 'wilder') -> np.ndarray:
+    """Relative Strength Index.
+
+    ``smoothing='wilder'`` seeds the average gain/loss with the mean of the
+    first ``period`` changes and then applies Wilder's ``1/period``
+    smoothing. ``smoothing='simple'`` uses the plain mean of the last
+    ``period`` changes at each point (the original scalar definition).
+    Values before index ``period`` are ``nan``; a zero average loss gives 100.
+    """
+    x = _as_float(values)
+    n = len(x)
+    out = np.full(n, np.nan)
+    if n < period + 1:
+        return out
+
+    deltas = np.diff(x)
+    gains = np.where(deltas > 0, deltas, 0.0)
+    losses = np.where(deltas < 0, -deltas, 0.0)
+
+    if smoothing == 'wilder':
+        alpha = 1.0 / period
+        avg_gain = np.empty(n - period)
+        avg_loss = np.empty(n - period)
+        avg_gain[0] = gains[:period].mean()
+        avg_loss[0] = losses[:period].mean()
+        avg_gain[1:] = _ewm(gains[period:], alpha, avg_gain[0])
+        avg_loss[1:] = _ewm(losses[period:], alpha, avg_loss[0])
+    elif smoothing == 'simple':
+        avg_gain = np.lib.stride_tricks.sliding_window_view(gains, period).mean(axis=1)
+        avg_loss = np.lib.stride_tricks.sliding_window_view(losses, period).mean(axis=1)
+    else:
+        raise ValueError(f"Unknown RSI smoothing: {smoothing}")
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        rs = avg_gain / avg_loss
+        values_out = 100.0 - 100.0 / (1.0 + rs)
+    out[period:] = np.where(avg_loss == 0, 100.0, values_out)
+    return out
+
+
+def macd(values, fast: int = 12, slow: int = 26, signal: int = 9) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """MACD line, signal line and histogram (EMAs seeded with the first value)."""
+    x = _as_float(values)
+    macd_line = ema(x, fast) - ema(x, slow)
+    signal_line = ema(macd_line, signal)
+    return macd_line, signal_line, macd_line - signal_line
+
+
+def bollinger_bands(values, period: int = 20, num_std: float = 2.0) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Middle (SMA), upper and lower bands using the population standard deviation."""
+    middle = sma(values, period)
+    std = rolling_std(values, period)
+    return middle, middle + num_std * std, middle - num_std * std
+
+
+def true_range(high, low, close) -> np.ndarray:
+    high, low, close = _as_float(high), _as_float(low), _as_float(close)
+    tr = high - low
+    if len(tr) > 1:
+        prev_close = close[:-1]
+        tr[1:] = np.maximum(tr[1:], np.maximum(np.abs(high[1:] - prev_close), np.abs(low[1:] - prev_close)))
+    return tr
+
+
+def atr(high, low, close, period: int = 14) -> np.ndarray:
+    """Average True Range with Wilder smoothing seeded by the mean of the first ``period`` ranges."""
+    tr = true_range(high, low, close)
+    out = np.full(len(tr), np.nan)
+    if len(tr) < period:
+        return out
+    seed = tr[:period].mean()
+    out[period - 1] = seed
+    out[period:] = _ewm(tr[period:], 1.0 / period, seed)
+    return out
+
+
+def obv(close, volume) -> np.ndarray:
+    """On-Balance Volume, starting from zero."""
+    close, volume = _as_float(close), _as_float(volume)
+    out = np.zeros(len(close))
+    if len(close) > 1:
+        direction = np.sign(np.diff(close))
+        np.cumsum(direction * volume[1:], out=out[1:])
+    return out
+
+
+def vwap(high, low, close, volume, window: Optional[int] = None) -> np.ndarray:
+    """Volume-weighted average of the typical price.
+
+    Cumulative from the first candle, or rolling over ``window`` candles.
+    Points with no traded volume are ``nan``.
+    """
+    typical = (_as_float(high) + _as_float(low) + _as_float(close)) / 3.0
+    volume = _as_float(volume)
+    pv = np.concatenate(([0.0], np.cumsum(typical * volume)))
+    vv = np.concatenate(([0.0], np.cumsum(volume)))
+    idx = np.arange(1, len(typical) + 1)
+    lo = np.zeros_like(idx) if window is None else np.maximum(idx - window, 0)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        out = (pv[idx] - pv[lo]) / (vv[idx] - vv[lo])
+    out[(vv[idx] - vv[lo]) == 0] = np.nan
+    return out
@@ -0,0 +1,74 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from core.data_fetchers import DataSyncService
+from patterns.services import LivePatternService
+
+
+class Command(BaseCommand):
+    help = (
+        "Refresh market indicators, asset prices and sentiment on a fixed cadence. "
+        "Dashboard views only read the stored snapshot, so run this alongside the web server."
+    )
+
+    def add_arguments(self, parser):
+        intervals = getattr(settings, 'INGESTION_INTERVALS', {})
+        parser.add_argument('--indicators-interval', type=float, default=intervals.get('indicators', 30),
+                            help='Seconds between S&P 500 / BTC / ETH refreshes (also updates asset prices).')
+        parser.add_argument('--sentiment-interval', type=float, default=intervals.get('sentiment', 300),
+                            help='Seconds between Fear & Greed index refreshes.')
+        parser.add_argument('--patterns-interval', type=float, default=intervals.get('patterns', 60),
+                            help='Seconds between live pattern scans on closed Binance candles (0 disables).')
+        parser.add_argument('--once', action='store_true', help='Run every job once and exit.')
+
+    def handle(self, *args, **options):
+        intervals = {
+            'indicators': options['indicators_interval'],
+            'sentiment': options['sentiment_interval'],
+            'patterns': options['patterns_interval'],
+        }
+        intervals = {job: seconds for job, seconds in intervals.items() if job != 'patterns' or seconds > 0}
+        next_due = {job: 0.0 for job in intervals}
+
+        while True:
+            # Drop connections the database closed while we slept.
+            close_old_connections()
+            now = time.monotonic()
+            due = {job for job, at in next_due.items() if at <= now}
+            sync_jobs = due - {'patterns'}
+            if sync_jobs:
+                # Jobs that fall due together share one concurrent fan-out.
+                started = time.monotonic()
+                try:
+                    report = DataSyncService.sync_all(
+                        include_indicators='indicators' in sync_jobs,
+                        include_sentiment='sentiment' in sync_jobs,
+                    )
+                    self.stdout.write(f"[{time.strftime('%H:%M:%S')}] synced {', '.join(sorted(sync_jobs))} "
+                                      f"in {time.monotonic() - started:.2f}s: {report}")
+                except Exception as e:
+                    self.stderr.write(f"[{time.strftime('%H:%M:%S')}] sync of {', '.join(sorted(sync_jobs))} "
+                                      f"failed: {e}")
+                # Failed jobs are retried on their normal cadence.
+                for job in sync_jobs:
+                    next_due[job] = started + intervals[job]
+            if 'patterns' in due:
+                started = time.monotonic()
+                try:
+                    report = LivePatternService.sync_live()
+                    self.stdout.write(f"[{time.strftime('%H:%M:%S')}] scanned patterns "
+                                      f"in {time.monotonic() - started:.2f}s: {report}")
+                except Exception as e:
+                    self.stderr.write(f"[{time.strftime('%H:%M:%S')}] pattern scan failed: {e}")
+                next_due['patterns'] = started + intervals['patterns']
+
+            if options['once']:
+                return
+
+            try:
+                time.sleep(max(0.0, min(next_due.values()) - time.monotonic()))
+            except KeyboardInterrupt:
+                return
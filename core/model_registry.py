@@ -0,0 +1,214 @@
+"""
+On-disk registry of fitted forecast models.
+
+Models are pickled under ``<root>/<asset>/`` with a file name built from
+the window, a hash of the hyperparameters and a fingerprint of the
+training data, so a model is reused until new candles arrive (changing
+the fingerprint) or it is older than the registry's TTL. Loaded models
+stay in an in-process LRU that evicts by their pickled size once the
+memory budget is exceeded.
+"""
+import hashlib
+import json
+import os
+import pickle
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Callable, Dict, Optional, Tuple
+
+import numpy as np
+
+from .candles import closed_length
+
+
+DEFAULT_MAX_MEMORY = 256 * 1024 * 1024
+DEFAULT_TTL = 24 * 3600
+
+
+def data_fingerprint(prices, timestamps=None) -> str:
+    """Short digest of a training series; changes whenever a closed candle is added or revised.
+
+    With ``timestamps`` a trailing live tick (see ``closed_length``) is
+    left out, so the fingerprint does not change on every request.
+    """
+    digest = hashlib.blake2b(digest_size=12)
+    if timestamps is not None and len(timestamps):
+        closed = closed_length(timestamps)
+        prices = prices[:closed]
+        digest.update(str(timestamps[closed - 1]).encode())
+    digest.update(np.ascontiguousarray(prices, dtype='<f8').tobytes())
+    return digest.hexdigest()
+
+
+def _params_hash(params: Dict[str, Any]) -> str:
+    encoded = json.dumps(params, sort_keys=True, default=str).encode()
+    return hashlib.blake2b(encoded, digest_size=6).hexdigest()
+
+
+def _safe(name: str) -> str:
+    return ''.join(ch for ch in str(name).upper() if ch.isalnum()) or 'DEFAULT'
+
+
+class ModelRegistry:
+    """Fitted models keyed by (asset, window, data fingerprint, hyperparameters)."""
+
+    def __init__(self, root, max_memory: int = DEFAULT_MAX_MEMORY, ttl: Optional[float] = DEFAULT_TTL):
+        self.root = Path(root)
+        self.max_memory = int(max_memory)
+        self.ttl = ttl
+        self._cache: 'OrderedDict[Path, Tuple[Any, int, float]]' = OrderedDict()
+        self._memory = 0
+        self._lock = threading.Lock()
+        # One lock per model file so concurrent requests train it only once.
+        self._train_locks: Dict[Path, threading.Lock] = {}
+        self.stats = {'memory_hits': 0, 'disk_hits': 0, 'trained': 0, 'evicted': 0}
+
+    # -- paths -------------------------------------------------------------
+
+    def path_for(self, asset: str, window: int, fingerprint: str, params: Dict[str, Any]) -> Path:
+        # Everything before the fingerprint identifies the model "slot" that
+        # ``store`` keeps a single file for.
+        return self.root / _safe(asset) / f'w{int(window)}-{_params_hash(params)}-{fingerprint}.pkl'
+
+    def _expired(self, created: float) -> bool:
+        return self.ttl is not None and time.time() - created > self.ttl
+
+    # -- in-process LRU ----------------------------------------------------
+
+    def _remember(self, path: Path, model: Any, size: int, created: float):
+        with self._lock:
+            old = self._cache.pop(path, None)
+            if old is not None:
+                self._memory -= old[1]
+            self._cache[path] = (model, size, created)
+            self._memory += size
+            # Always keep the newest entry, even if it alone exceeds the budget.
+            while self._memory > self.max_memory and len(self._cache) > 1:
+                _, (_, evicted_size, _) = self._cache.popitem(last=False)
+                self._memory -= evicted_size
+                self.stats['evicted'] += 1
+
+    def _forget(self, path: Path):
+        with self._lock:
+            entry = self._cache.pop(path, None)
+            if entry is not None:
+                self._memory -= entry[1]
+
+    @property
+    def memory_used(self) -> int:
+        return self._memory
+
+    # -- load / store --------------------------------------------------------
+
+    def load(self, path: Path) -> Optional[Any]:
+        """Return the model at ``path`` from memory or disk, or None if missing/expired."""
+        with self._lock:
+            entry = self._cache.get(path)
+            if entry is not None:
+                if not self._expired(entry[2]):
+                    self._cache.move_to_end(path)
+                    self.stats['memory_hits'] += 1
+                    return entry[0]
+        if entry is not None:
+            self._forget(path)
+
+        try:
+            with open(path, 'rb') as fh:
+                payload = fh.read()
+            created = os.path.getmtime(path)
+        except FileNotFoundError:
+            return None
+        if self._expired(created):
+            return None
+        try:
+            model = pickle.loads(payload)
+        except Exception as e:
+            # Written by an incompatible library version or truncated: retrain.
+            print(f"Discarding unreadable model {path.name}: {e}")
+            return None
+        self.stats['disk_hits'] += 1
+        self._remember(path, model, len(payload), created)
+        return model
+
+    def store(self, path: Path, model: Any):
+        """Write ``model`` atomically and drop older models for the same asset/window/params."""
+        path.parent.mkdir(parents=True, exist_ok=True)
+        payload = pickle.dumps(model, protocol=pickle.HIGHEST_PROTOCOL)
+        tmp = path.with_name(f'{path.name}.{uuid.uuid4().hex}.tmp')
+        with open(tmp, 'wb') as fh:
+            fh.write(payload)
+        os.replace(tmp, path)
+
+        prefix = path.name[:path.name.rindex('-') + 1]
+        for stale in path.parent.glob(f'{prefix}*.pkl'):
+            if stale != path:
+                self._forget(stale)
+                try:
+                    stale.unlink()
+                except FileNotFoundError:
+                    pass
+        self._remember(path, model, len(payload), time.time())
+
+    def get_or_train(self, asset: str, window: int, fingerprint: str, params: Dict[str, Any],
+                     train: Callable[[], Any]) -> Any:
+        """Return the registered model for this key, fitting it with ``train()`` on a miss."""
+        path = self.path_for(asset, window, fingerprint, params)
+        model = self.load(path)
+        if model is not None:
+            return model
+
+        with self._lock:
+            train_lock = self._train_locks.setdefault(path, threading.Lock())
+        with train_lock:
+            # Another thread may have trained it while we waited.
+            model = self.load(path)
+            if model is None:
+                model = train()
+                self.stats['trained'] += 1
+                try:
+                    self.store(path, model)
+                except OSError as e:
+                    print(f"Could not persist model {path.name}: {e}")
+                    self._remember(path, model, 0, time.time())
+        with self._lock:
+            self._train_locks.pop(path, None)
+        return model
+
+    def purge_expired(self) -> int:
+        """Delete expired model files; returns how many were removed."""
+        if self.ttl is None or not self.root.exists():
+            return 0
+        removed = 0
+        for path in self.root.glob('*/*.pkl'):
+            try:
+                if self._expired(os.path.getmtime(path)):
+                    self._forget(path)
+                    path.unlink()
+                    removed += 1
+            except FileNotFoundError:
+                continue
+        return removed
+
+
+_default_registry: Optional[ModelRegistry] = None
+
+
+def get_model_registry() -> ModelRegistry:
+    """Return the process-wide registry configured from ``settings.MODEL_REGISTRY``."""
+    global _default_registry
+    if _default_registry is None:
+        try:
+            from django.conf import settings
+            config = dict(getattr(settings, 'MODEL_REGISTRY', {}))
+        except Exception:
+            config = {}
+        root = config.get('DIR') or Path(__file__).resolve().parent.parent / 'var' / 'models'
+        _default_registry = ModelRegistry(
+            root,
+            max_memory=config.get('MAX_MEMORY_MB', DEFAULT_MAX_MEMORY // (1024 * 1024)) * 1024 * 1024,
+            ttl=config.get('TTL_SECONDS', DEFAULT_TTL),
+        )
+    return _default_registry
@@ -3,9 +3,23 @@ from typing import List, Dict, Tuple
 from decimal import Decimal
 from datetime import datetime, timedelta
 
+from . import indicators
+
+
+# Pattern types in the order of ``forecast.models.Pattern.PATTERN_TYPES``;
+# each has a ``PatternDetector.detect_<type>`` method.
+PATTERN_TYPES = (
+    'bull_flag', 'bear_flag', 'head_shoulders', 'double_top', 'double_bottom',
+    'ascending_triangle', 'descending_triangle', 'golden_cross', 'death_cross', 'doji',
+)
+
+# The types ``detect_all_patterns`` reports by default: the original four, so
+# forecasts and the legacy detect view keep saving the same Pattern rows.
+LEGACY_PATTERN_TYPES = ('bull_flag', 'head_shoulders', 'double_bottom', 'golden_cross')
+
 
 class TechnicalIndicators:
-    """Calculate technical indicators"""
+    """Calculate technical indicators (latest values; see core.indicators for full series)"""
     
     @staticmethod
     def calculate_rsi(prices: List[float], period: int = 14) -> float:
@@ -13,19 +27,7 @@ class TechnicalIndicators:
         if len(prices) < period + 1:
             return 50.0  # Neutral RSI
         
-        deltas = np.diff(prices)
-        gains = np.where(deltas > 0, deltas, 0)
-        losses = np.where(deltas < 0, -deltas, 0)
-        
-        avg_gain = np.mean(gains[-period:])
-        avg_loss = np.mean(losses[-period:])
-        
-        if avg_loss == 0:
-            return 100.0
-        
-        rs = avg_gain / avg_loss
-        rsi = 100 - (100 / (1 + rs))
-        return float(rsi)
+        return float(indicators.rsi(prices, period, smoothing='simple')[-1])
     
     @staticmethod
     def calculate_macd(prices: List[float], fast: int = 12, slow: int = 26, signal: int = 9) -> Dict:
@@ -33,46 +35,48 @@ class TechnicalIndicators:
         if len(prices) < slow:
             return {'macd': 0, 'signal': 0, 'histogram': 0}
         
-        prices_array = np.array(prices)
-        ema_fast = TechnicalIndicators._ema(prices_array, fast)
-        ema_slow = TechnicalIndicators._ema(prices_array, slow)
-        
-        macd_line = ema_fast - ema_slow
-        signal_line = TechnicalIndicators._ema(macd_line, signal)
-        histogram = macd_line - signal_line
+        macd_line, signal_line, histogram = indicators.macd(prices, fast, slow, signal)
         
         return {
-            'macd': float(macd_line[-1]) if len(macd_line) > 0 else 0,
-            'signal': float(signal_line[-1]) if len(signal_line) > 0 else 0,
-            'histogram': float(histogram[-1]) if len(histogram) > 0 else 0,
+            'macd': float(macd_line[-1]),
+            'signal': float(signal_line[-1]),
+            'histogram': float(histogram[-1]),
         }
     
     @staticmethod
     def _ema(data: np.ndarray, period: int) -> np.ndarray:
         """Calculate Exponential Moving Average"""
-        alpha = 2 / (period + 1)
-        ema = np.zeros_like(data)
-        ema[0] = data[0]
-        
-        for i in range(1, len(data)):
-            ema[i] = alpha * data[i] + (1 - alpha) * ema[i-1]
-        
-        return ema
+        return indicators.ema(data, period)
     
     @staticmethod
     def calculate_sma(prices: List[float], period: int) -> float:
         """Calculate Simple Moving Average"""
-        if len(prices) < period:
-            return float(np.mean(prices)) if prices else 0.0
-        return float(np.mean(prices[-period:]))
+        if not len(prices):
+            return 0.0
+        return float(indicators.sma(prices, period, min_periods=1)[-1])
 
 
 class PatternDetector:
     """Detect chart patterns in price data"""
     
-    def __init__(self, prices: List[float], timestamps: List[datetime] = None):
+    def __init__(self, prices: List[float], timestamps: List[datetime] = None,
+                 opens: List[float] = None, highs: List[float] = None, lows: List[float] = None):
         self.prices = prices
         self.timestamps = timestamps or []
+        # Optional OHLC columns (prices are the closes); only the doji needs them.
+        self.opens = opens
+        self.highs = highs
+        self.lows = lows
+
+    @staticmethod
+    def _peaks(recent) -> List[Tuple[int, float]]:
+        return [(i, recent[i]) for i in range(1, len(recent) - 1)
+                if recent[i] > recent[i-1] and recent[i] > recent[i+1]]
+
+    @staticmethod
+    def _troughs(recent) -> List[Tuple[int, float]]:
+        return [(i, recent[i]) for i in range(1, len(recent) - 1)
+                if recent[i] < recent[i-1] and recent[i] < recent[i+1]]
     
     def detect_bull_flag(self) -> Dict:
         """Detect Bull Flag pattern"""
@@ -98,18 +102,33 @@ class PatternDetector:
         
         return {'detected': False, 'confidence': 0}
     
+    def detect_bear_flag(self) -> Dict:
+        """Detect Bear Flag pattern (downward trend followed by consolidation)"""
+        if len(self.prices) < 20:
+            return {'detected': False, 'confidence': 0}
+        
+        recent_prices = self.prices[-20:]
+        first_half = recent_prices[:10]
+        second_half = recent_prices[10:]
+        
+        trend_down = np.mean(first_half[-5:]) < np.mean(first_half[:5])
+        second_std = np.std(second_half)
+        first_std = np.std(first_half)
+        consolidation = second_std < first_std * 0.7
+        
+        if trend_down and consolidation:
+            confidence = min(95, 60 + int((1 - second_std / first_std) * 35))
+            return {'detected': True, 'confidence': confidence}
+        
+        return {'detected': False, 'confidence': 0}
+    
     def detect_head_shoulders(self) -> Dict:
         """Detect Head & Shoulders pattern"""
         if len(self.prices) < 15:
             return {'detected': False, 'confidence': 0}
         
         # Simplified detection: look for three peaks
-        recent = self.prices[-15:]
-        peaks = []
-        
-        for i in range(1, len(recent) - 1):
-            if recent[i] > recent[i-1] and recent[i] > recent[i+1]:
-                peaks.append((i, recent[i]))
+        peaks = self._peaks(self.prices[-15:])
         
         if len(peaks) >= 3:
             # Check if middle peak is highest (head)
@@ -126,12 +145,7 @@ class PatternDetector:
         if len(self.prices) < 20:
             return {'detected': False, 'confidence': 0}
         
-        recent = self.prices[-20:]
-        troughs = []
-        
-        for i in range(1, len(recent) - 1):
-            if recent[i] < recent[i-1] and recent[i] < recent[i+1]:
-                troughs.append((i, recent[i]))
+        troughs = self._troughs(self.prices[-20:])
         
         if len(troughs) >= 2:
             # Check if two troughs are similar in price
@@ -144,6 +158,52 @@ class PatternDetector:
         
         return {'detected': False, 'confidence': 0}
     
+    def detect_double_top(self) -> Dict:
+        """Detect Double Top pattern (two peaks at a similar price)"""
+        if len(self.prices) < 20:
+            return {'detected': False, 'confidence': 0}
+        
+        peaks = sorted(self._peaks(self.prices[-20:]), key=lambda x: x[1], reverse=True)
+        if len(peaks) >= 2:
+            diff = abs(peaks[0][1] - peaks[1][1]) / peaks[0][1]
+            if diff < 0.03:  # Within 3%
+                confidence = 70 + int((1 - diff * 10) * 25)
+                return {'detected': True, 'confidence': min(95, confidence)}
+        
+        return {'detected': False, 'confidence': 0}
+    
+    def detect_ascending_triangle(self) -> Dict:
+        """Detect Ascending Triangle (flat resistance, rising lows)"""
+        if len(self.prices) < 20:
+            return {'detected': False, 'confidence': 0}
+        
+        recent = self.prices[-20:]
+        peaks = sorted(self._peaks(recent), key=lambda x: x[1], reverse=True)
+        if len(peaks) >= 2:
+            spread = (peaks[0][1] - peaks[1][1]) / peaks[0][1]
+            rising_lows = min(recent[10:]) > min(recent[:10]) * 1.01
+            if spread < 0.01 and rising_lows:
+                confidence = 65 + int((1 - spread * 100) * 25)
+                return {'detected': True, 'confidence': min(95, confidence)}
+        
+        return {'detected': False, 'confidence': 0}
+    
+    def detect_descending_triangle(self) -> Dict:
+        """Detect Descending Triangle (flat support, falling highs)"""
+        if len(self.prices) < 20:
+            return {'detected': False, 'confidence': 0}
+        
+        recent = self.prices[-20:]
+        troughs = sorted(self._troughs(recent), key=lambda x: x[1])
+        if len(troughs) >= 2:
+            spread = (troughs[1][1] - troughs[0][1]) / troughs[0][1]
+            falling_highs = max(recent[10:]) < max(recent[:10]) * 0.99
+            if spread < 0.01 and falling_highs:
+                confidence = 65 + int((1 - spread * 100) * 25)
+                return {'detected': True, 'confidence': min(95, confidence)}
+        
+        return {'detected': False, 'confidence': 0}
+    
     def detect_golden_cross(self, short_period: int = 50, long_period: int = 200) -> Dict:
         """Detect Golden Cross (short MA crosses above long MA)"""
         if len(self.prices) < long_period + 5:
@@ -163,25 +223,43 @@ class PatternDetector:
         
         return {'detected': False, 'confidence': 0}
     
-    def detect_all_patterns(self) -> List[Dict]:
-        """Detect all patterns and return results"""
-        patterns = []
+    def detect_death_cross(self, short_period: int = 50, long_period: int = 200) -> Dict:
+        """Detect Death Cross (short MA crosses below long MA)"""
+        if len(self.prices) < long_period + 5:
+            return {'detected': False, 'confidence': 0}
+        
+        short_ma = TechnicalIndicators.calculate_sma(self.prices, short_period)
+        long_ma = TechnicalIndicators.calculate_sma(self.prices, long_period)
+        prev_short = TechnicalIndicators.calculate_sma(self.prices[:-1], short_period)
+        prev_long = TechnicalIndicators.calculate_sma(self.prices[:-1], long_period)
         
-        bull_flag = self.detect_bull_flag()
-        if bull_flag['detected']:
-            patterns.append({'type': 'bull_flag', 'confidence': bull_flag['confidence']})
+        if prev_short >= prev_long and short_ma < long_ma:
+            confidence = 75 + int((1 - short_ma / long_ma) * 20)
+            return {'detected': True, 'confidence': min(95, confidence)}
         
-        head_shoulders = self.detect_head_shoulders()
-        if head_shoulders['detected']:
-            patterns.append({'type': 'head_shoulders', 'confidence': head_shoulders['confidence']})
+        return {'detected': False, 'confidence': 0}
+    
+    def detect_doji(self) -> Dict:
+        """Detect a Doji on the latest candle (body under 10% of its range); needs OHLC"""
+        if not self.prices or self.opens is None or self.highs is None or self.lows is None:
+            return {'detected': False, 'confidence': 0}
         
-        double_bottom = self.detect_double_bottom()
-        if double_bottom['detected']:
-            patterns.append({'type': 'double_bottom', 'confidence': double_bottom['confidence']})
+        body = abs(self.prices[-1] - self.opens[-1])
+        candle_range = self.highs[-1] - self.lows[-1]
+        if candle_range > 0 and body <= 0.1 * candle_range:
+            confidence = 60 + int((1 - body / (0.1 * candle_range)) * 35)
+            return {'detected': True, 'confidence': min(95, confidence)}
+        
+        return {'detected': False, 'confidence': 0}
+    
+    def detect_all_patterns(self, types=LEGACY_PATTERN_TYPES) -> List[Dict]:
+        """Detect patterns of ``types`` (pass ``PATTERN_TYPES`` for every rule) and return results"""
+        patterns = []
         
-        golden_cross = self.detect_golden_cross()
-        if golden_cross['detected']:
-            patterns.append({'type': 'golden_cross', 'confidence': golden_cross['confidence']})
+        for pattern_type in types:
+            result = getattr(self, f'detect_{pattern_type}')()
+            if result['detected']:
+                patterns.append({'type': pattern_type, 'confidence': result['confidence']})
         
         return patterns
 
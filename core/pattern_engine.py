@@ -0,0 +1,260 @@
+"""
+Incremental chart-pattern detection for live candles.
+
+``IncrementalPatternEngine`` applies the ``PatternDetector`` rules to each
+appended candle using only rolling state: the last 20 closes, the peaks and
+troughs still inside the widest window (each candle's peak/trough status
+is settled once the next candle arrives), streaming 50/200 SMAs for the
+golden/death cross and the currently active pattern runs. Work per candle
+is bounded by the window size, independent of history length.
+
+``update`` returns only the changes: a ``completed`` delta when a pattern
+type starts matching and an ``invalidated`` delta when an active one stops.
+Completed/invalidated pairs line up with the merged events of
+``core.pattern_scanner.scan_patterns`` (crosses use streaming SMAs, so an
+exact tie between the averages may resolve differently).
+
+``to_bytes()`` / ``from_bytes()`` snapshot the rolling state, so a live
+worker can resume after a restart without replaying history.
+"""
+import json
+from collections import deque
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from .pattern_detection import PATTERN_TYPES
+from .pattern_scanner import CROSS_LONG, CROSS_SHORT, PATTERN_SPANS
+from .streaming import StreamingSMA
+
+
+WINDOW = 20
+
+
+class IncrementalPatternEngine:
+    """Rolling pattern state for one asset/timeframe stream."""
+
+    def __init__(self, types=PATTERN_TYPES):
+        self.types = tuple(types)
+        self.count = 0
+        self.last_timestamp: Optional[int] = None
+        self.closes = deque(maxlen=WINDOW)
+        self.timestamps = deque(maxlen=WINDOW)
+        self.candle = None
+        # Confirmed local extremes as (index, close), oldest first.
+        self.peaks = deque()
+        self.troughs = deque()
+        self.sma_short = StreamingSMA(CROSS_SHORT)
+        self.sma_long = StreamingSMA(CROSS_LONG)
+        self.prev_smas = None
+        self._flag_cache = (-1, None)
+        # type -> {'start', 'end', 'confidence', 'entry_price'} for patterns matching at the last candle.
+        self.active: Dict[str, Dict] = {}
+
+    # -- rolling state -------------------------------------------------------
+
+    def _append(self, timestamp, open_, high, low, close):
+        if len(self.closes) >= 2:
+            left, mid = self.closes[-2], self.closes[-1]
+            if mid > left and mid > close:
+                self.peaks.append((self.count - 1, mid))
+            elif mid < left and mid < close:
+                self.troughs.append((self.count - 1, mid))
+        # Interior points of the widest window ending at the new candle start here.
+        oldest = self.count - (WINDOW - 2)
+        while self.peaks and self.peaks[0][0] < oldest:
+            self.peaks.popleft()
+        while self.troughs and self.troughs[0][0] < oldest:
+            self.troughs.popleft()
+
+        self.closes.append(close)
+        self.timestamps.append(timestamp)
+        self.candle = (open_, high, low, close)
+        self.prev_smas = (self.sma_short.value, self.sma_long.value)
+        self.sma_short.update(close)
+        self.sma_long.update(close)
+        self.count += 1
+        self.last_timestamp = timestamp
+
+    def _extremes(self, extremes: deque, width: int) -> List[float]:
+        """Closes of the confirmed extremes inside the ``width``-candle window."""
+        oldest = self.count - 1 - (width - 2)
+        return [price for index, price in extremes if index >= oldest]
+
+    # -- rules (same formulas as PatternDetector) -----------------------------
+
+    def _flag_stats(self):
+        """Trend means and half-window stds, computed once per candle for both flags."""
+        if self._flag_cache[0] != self.count:
+            recent = list(self.closes)
+            first_half, second_half = recent[:10], recent[10:]
+            self._flag_cache = (self.count, (np.mean(first_half[-5:]), np.mean(first_half[:5]),
+                                             np.std(second_half), np.std(first_half)))
+        return self._flag_cache[1]
+
+    def _flag(self, bullish: bool) -> Optional[int]:
+        if self.count < 20:
+            return None
+        recent_mean, early_mean, second_std, first_std = self._flag_stats()
+        trend = recent_mean > early_mean if bullish else recent_mean < early_mean
+        if trend and second_std < first_std * 0.7:
+            return min(95, 60 + int((1 - second_std / first_std) * 35))
+        return None
+
+    def _head_shoulders(self) -> Optional[int]:
+        if self.count < 15:
+            return None
+        peaks = sorted(self._extremes(self.peaks, 15), reverse=True)
+        if len(peaks) >= 3:
+            return min(95, 65 + int((peaks[1] / peaks[0]) * 20))
+        return None
+
+    def _double(self, extremes: deque, top: bool) -> Optional[int]:
+        if self.count < 20:
+            return None
+        values = sorted(self._extremes(extremes, 20), reverse=top)
+        if len(values) >= 2:
+            diff = abs(values[0] - values[1]) / values[0]
+            if diff < 0.03:
+                return min(95, 70 + int((1 - diff * 10) * 25))
+        return None
+
+    def _triangle(self, ascending: bool) -> Optional[int]:
+        if self.count < 20:
+            return None
+        recent = list(self.closes)
+        if ascending:
+            values = sorted(self._extremes(self.peaks, 20), reverse=True)
+            if len(values) < 2:
+                return None
+            spread = (values[0] - values[1]) / values[0]
+            sloped = min(recent[10:]) > min(recent[:10]) * 1.01
+        else:
+            values = sorted(self._extremes(self.troughs, 20))
+            if len(values) < 2:
+                return None
+            spread = (values[1] - values[0]) / values[0]
+            sloped = max(recent[10:]) < max(recent[:10]) * 0.99
+        if spread < 0.01 and sloped:
+            return min(95, 65 + int((1 - spread * 100) * 25))
+        return None
+
+    def _cross(self, golden: bool) -> Optional[int]:
+        if self.count < CROSS_LONG + 5:
+            return None
+        prev_short, prev_long = self.prev_smas
+        short_ma, long_ma = self.sma_short.value, self.sma_long.value
+        if golden and prev_short <= prev_long and short_ma > long_ma:
+            return min(95, 75 + int((short_ma / long_ma - 1) * 20))
+        if not golden and prev_short >= prev_long and short_ma < long_ma:
+            return min(95, 75 + int((1 - short_ma / long_ma) * 20))
+        return None
+
+    def _doji(self) -> Optional[int]:
+        open_, high, low, close = self.candle
+        body = abs(close - open_)
+        candle_range = high - low
+        if candle_range > 0 and body <= 0.1 * candle_range:
+            return min(95, 60 + int((1 - body / (0.1 * candle_range)) * 35))
+        return None
+
+    def detect(self) -> Dict[str, int]:
+        """Pattern types matching at the latest candle, with their confidence."""
+        rules = {
+            'bull_flag': lambda: self._flag(True),
+            'bear_flag': lambda: self._flag(False),
+            'head_shoulders': self._head_shoulders,
+            'double_top': lambda: self._double(self.peaks, True),
+            'double_bottom': lambda: self._double(self.troughs, False),
+            'ascending_triangle': lambda: self._triangle(True),
+            'descending_triangle': lambda: self._triangle(False),
+            'golden_cross': lambda: self._cross(True),
+            'death_cross': lambda: self._cross(False),
+            'doji': self._doji,
+        }
+        found = {}
+        for name in self.types:
+            confidence = rules[name]()
+            if confidence is not None:
+                found[name] = confidence
+        return found
+
+    # -- public API ------------------------------------------------------------
+
+    def update(self, timestamp: int, open_: float, high: float, low: float, close: float) -> List[Dict]:
+        """Append one closed candle and return the pattern deltas it causes.
+
+        Candles at or before the last seen timestamp are ignored, so the
+        same candles can be fed again safely.
+        """
+        if self.last_timestamp is not None and timestamp <= self.last_timestamp:
+            return []
+        self._append(int(timestamp), float(open_), float(high), float(low), float(close))
+        end = self.count - 1
+        found = self.detect()
+
+        deltas = []
+        for name in list(self.active):
+            if name not in found:
+                run = self.active.pop(name)
+                deltas.append(dict(run, event='invalidated', type=name, exit_price=float(close),
+                                   timestamp=self.last_timestamp))
+        for name, confidence in found.items():
+            run = self.active.get(name)
+            if run is None:
+                start = max(0, end - PATTERN_SPANS[name] + 1)
+                run = self.active[name] = {
+                    'start': start,
+                    'start_time': self.timestamps[start - self.count],
+                    'end': end,
+                    'confidence': confidence,
+                    'entry_price': float(close),
+                }
+                deltas.append(dict(run, event='completed', type=name, timestamp=self.last_timestamp))
+            else:
+                run['end'] = end
+                run['confidence'] = max(run['confidence'], confidence)
+        return deltas
+
+    def to_bytes(self) -> bytes:
+        return json.dumps({
+            'types': self.types,
+            'count': self.count,
+            'last_timestamp': self.last_timestamp,
+            'closes': list(self.closes),
+            'timestamps': list(self.timestamps),
+            'candle': self.candle,
+            'peaks': list(self.peaks),
+            'troughs': list(self.troughs),
+            'sma_short': self.sma_short.to_bytes().hex(),
+            'sma_long': self.sma_long.to_bytes().hex(),
+            'prev_smas': self.prev_smas,
+            'active': self.active,
+        }).encode()
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> 'IncrementalPatternEngine':
+        state = json.loads(data)
+        engine = cls(state['types'])
+        engine.count = state['count']
+        engine.last_timestamp = state['last_timestamp']
+        engine.closes.extend(state['closes'])
+        engine.timestamps.extend(state['timestamps'])
+        engine.candle = tuple(state['candle']) if state['candle'] else None
+        engine.peaks.extend(tuple(p) for p in state['peaks'])
+        engine.troughs.extend(tuple(t) for t in state['troughs'])
+        engine.sma_short = StreamingSMA.from_bytes(bytes.fromhex(state['sma_short']))
+        engine.sma_long = StreamingSMA.from_bytes(bytes.fromhex(state['sma_long']))
+        engine.prev_smas = tuple(state['prev_smas']) if state['prev_smas'] else None
+        engine.active = state['active']
+        return engine
+
+    def extend(self, candles, emit: bool = True) -> List[Dict]:
+        """Feed a ``CandleSeries``; with ``emit=False`` only warm up the state."""
+        deltas = []
+        for ts, o, h, l, c in zip(candles.timestamp.tolist(), candles.open.tolist(), candles.high.tolist(),
+                                  candles.low.tolist(), candles.close.tolist()):
+            changes = self.update(ts, o, h, l, c)
+            if emit:
+                deltas.extend(changes)
+        return deltas
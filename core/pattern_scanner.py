@@ -0,0 +1,319 @@
+"""
+Vectorized chart-pattern scan over a full price history.
+
+``scan_patterns`` evaluates every ``PATTERN_TYPES`` rule of
+``core.pattern_detection.PatternDetector`` at every candle at once: the
+detector's fixed-length windows become ``sliding_window_view`` views, local
+peaks and troughs are found once for the whole series, and per-window
+counts, extremes and moving averages come from cumulative sums and
+rolling reductions. A window ending at candle ``e`` is detected exactly
+when ``PatternDetector`` would detect it given the prices up to ``e``.
+
+The result is a structured ``EVENT_DTYPE`` array of
+``(start, end, type, confidence)`` rows, where ``type`` indexes
+``PATTERN_TYPES``.
+"""
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+from . import indicators
+from .candles import CandleSeries
+from .pattern_detection import PATTERN_TYPES
+
+
+EVENT_DTYPE = np.dtype([('start', '<i8'), ('end', '<i8'), ('type', 'u1'), ('confidence', 'u1')])
+
+# Candles covered by one detection, i.e. ``end - start + 1`` of an event.
+PATTERN_SPANS = {
+    'bull_flag': 20,
+    'bear_flag': 20,
+    'head_shoulders': 15,
+    'double_top': 20,
+    'double_bottom': 20,
+    'ascending_triangle': 20,
+    'descending_triangle': 20,
+    'golden_cross': 2,
+    'death_cross': 2,
+    'doji': 1,
+}
+
+CROSS_SHORT, CROSS_LONG = 50, 200
+
+# Rows per block when a reduction needs a temporary per window.
+_CHUNK_ROWS = 1 << 16
+
+
+def _lagged(values: np.ndarray, lag: int, n: int, fill=np.nan) -> np.ndarray:
+    """``out[e] = values[e - lag]`` for every end index ``e`` (``fill`` where undefined)."""
+    out = np.full(n, fill, dtype=values.dtype)
+    count = min(len(values), n - lag)
+    if count > 0:
+        out[lag:lag + count] = values[:count]
+    return out
+
+
+def _top2(values: np.ndarray, width: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Largest and second-largest value of every ``width``-long window (indexed by window start)."""
+    view = sliding_window_view(values, width)
+    largest = np.empty(len(view))
+    second = np.empty(len(view))
+    for start in range(0, len(view), _CHUNK_ROWS):
+        part = np.partition(view[start:start + _CHUNK_ROWS], width - 2, axis=1)
+        second[start:start + _CHUNK_ROWS] = part[:, -2]
+        largest[start:start + _CHUNK_ROWS] = part[:, -1]
+    return largest, second
+
+
+def _interior_count(flags: np.ndarray, width: int) -> np.ndarray:
+    """Set flags among the interior points of the ``width``-candle window ending at each ``e``.
+
+    Zero where fewer than ``width`` candles exist.
+    """
+    n = len(flags)
+    csum = np.concatenate(([0], np.cumsum(flags)))
+    out = np.zeros(n, dtype=np.int64)
+    e = np.arange(width - 1, n)
+    out[width - 1:] = csum[e] - csum[e - width + 2]
+    return out
+
+
+class _Scan:
+    """Shared per-series arrays, computed once and reused by every rule."""
+
+    def __init__(self, close, opens=None, highs=None, lows=None):
+        self.x = np.asarray(close, dtype=float)
+        self.opens, self.highs, self.lows = opens, highs, lows
+        self.n = n = len(self.x)
+        self.peak = np.zeros(n, dtype=bool)
+        self.trough = np.zeros(n, dtype=bool)
+        if n >= 3:
+            mid, left, right = self.x[1:-1], self.x[:-2], self.x[2:]
+            self.peak[1:-1] = (mid > left) & (mid > right)
+            self.trough[1:-1] = (mid < left) & (mid < right)
+        self._cache = {}
+
+    def cached(self, key, fn):
+        if key not in self._cache:
+            self._cache[key] = fn()
+        return self._cache[key]
+
+    # Two highest peaks / lowest troughs among the interior points of the
+    # window of ``width`` candles ending at each ``e``.
+    def peak_top2(self, width: int):
+        def build():
+            interior = width - 2
+            vals = np.where(self.peak, self.x, -np.inf)
+            largest, second = _top2(vals, interior) if self.n >= interior else (np.empty(0), np.empty(0))
+            count = _interior_count(self.peak, width)
+            return count, _lagged(largest, width - 2, self.n), _lagged(second, width - 2, self.n)
+        return self.cached(('peaks', width), build)
+
+    def trough_bottom2(self, width: int):
+        def build():
+            interior = width - 2
+            vals = np.where(self.trough, -self.x, -np.inf)
+            largest, second = _top2(vals, interior) if self.n >= interior else (np.empty(0), np.empty(0))
+            count = _interior_count(self.trough, width)
+            return count, -_lagged(largest, width - 2, self.n), -_lagged(second, width - 2, self.n)
+        return self.cached(('troughs', width), build)
+
+    def flag_parts(self):
+        """Trend and volatility of the two 10-candle halves of each 20-candle window."""
+        def build():
+            n = self.n
+            std10 = indicators.rolling_std(self.x, 10)
+            mean5 = np.full(n, np.nan)
+            if n >= 5:
+                mean5[4:] = sliding_window_view(self.x, 5).mean(axis=1)
+            valid = np.arange(n) >= 19
+            return {
+                'valid': valid,
+                'recent_mean': _lagged(mean5, 10, n),   # mean of first_half[-5:]
+                'early_mean': _lagged(mean5, 15, n),    # mean of first_half[:5]
+                'first_std': _lagged(std10, 10, n),
+                'second_std': std10,
+            }
+        return self.cached('flags', build)
+
+    def half_extremes(self):
+        """Min and max of each half of the 20-candle window ending at ``e``."""
+        def build():
+            n = self.n
+            mins, maxs = np.full(n, np.nan), np.full(n, np.nan)
+            if n >= 10:
+                view = sliding_window_view(self.x, 10)
+                mins[9:] = view.min(axis=1)
+                maxs[9:] = view.max(axis=1)
+            return {'first_min': _lagged(mins, 10, n), 'second_min': mins,
+                    'first_max': _lagged(maxs, 10, n), 'second_max': maxs}
+        return self.cached('halves', build)
+
+    def cross_smas(self):
+        def build():
+            short = indicators.sma(self.x, CROSS_SHORT, min_periods=1)
+            long = indicators.sma(self.x, CROSS_LONG, min_periods=1)
+            return short, long, _lagged(short, 1, self.n), _lagged(long, 1, self.n)
+        return self.cached('cross', build)
+
+
+def _confidence(base: int, scale: float, fraction: np.ndarray) -> np.ndarray:
+    """``min(95, base + int(fraction * scale))`` elementwise (non-finite -> 0)."""
+    with np.errstate(invalid='ignore', over='ignore'):
+        value = base + np.trunc(np.nan_to_num(fraction * scale, nan=0.0, posinf=0.0, neginf=0.0))
+    return np.minimum(95, value)
+
+
+def _flag(scan: _Scan, bullish: bool):
+    f = scan.flag_parts()
+    trend = f['recent_mean'] > f['early_mean'] if bullish else f['recent_mean'] < f['early_mean']
+    with np.errstate(divide='ignore', invalid='ignore'):
+        mask = f['valid'] & trend & (f['second_std'] < f['first_std'] * 0.7)
+        conf = _confidence(60, 35, 1 - f['second_std'] / f['first_std'])
+    return mask, conf
+
+
+def _bull_flag(scan):
+    return _flag(scan, True)
+
+
+def _bear_flag(scan):
+    return _flag(scan, False)
+
+
+def _head_shoulders(scan):
+    count, largest, second = scan.peak_top2(15)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return count >= 3, _confidence(65, 20, second / largest)
+
+
+def _double_top(scan):
+    count, largest, second = scan.peak_top2(20)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        diff = np.abs(largest - second) / largest
+        return (count >= 2) & (diff < 0.03), _confidence(70, 25, 1 - diff * 10)
+
+
+def _double_bottom(scan):
+    count, lowest, second = scan.trough_bottom2(20)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        diff = np.abs(lowest - second) / lowest
+        return (count >= 2) & (diff < 0.03), _confidence(70, 25, 1 - diff * 10)
+
+
+def _ascending_triangle(scan):
+    count, largest, second = scan.peak_top2(20)
+    h = scan.half_extremes()
+    with np.errstate(divide='ignore', invalid='ignore'):
+        spread = (largest - second) / largest
+        mask = (count >= 2) & (spread < 0.01) & (h['second_min'] > h['first_min'] * 1.01)
+        return mask, _confidence(65, 25, 1 - spread * 100)
+
+
+def _descending_triangle(scan):
+    count, lowest, second = scan.trough_bottom2(20)
+    h = scan.half_extremes()
+    with np.errstate(divide='ignore', invalid='ignore'):
+        spread = (second - lowest) / lowest
+        mask = (count >= 2) & (spread < 0.01) & (h['second_max'] < h['first_max'] * 0.99)
+        return mask, _confidence(65, 25, 1 - spread * 100)
+
+
+def _golden_cross(scan):
+    short, long, prev_short, prev_long = scan.cross_smas()
+    mask = (np.arange(scan.n) >= CROSS_LONG + 4) & (prev_short <= prev_long) & (short > long)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return mask, _confidence(75, 20, short / long - 1)
+
+
+def _death_cross(scan):
+    short, long, prev_short, prev_long = scan.cross_smas()
+    mask = (np.arange(scan.n) >= CROSS_LONG + 4) & (prev_short >= prev_long) & (short < long)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return mask, _confidence(75, 20, 1 - short / long)
+
+
+def _doji(scan):
+    if scan.opens is None or scan.highs is None or scan.lows is None:
+        return np.zeros(scan.n, dtype=bool), np.zeros(scan.n)
+    body = np.abs(scan.x - scan.opens)
+    candle_range = scan.highs - scan.lows
+    with np.errstate(divide='ignore', invalid='ignore'):
+        mask = (candle_range > 0) & (body <= 0.1 * candle_range)
+        return mask, _confidence(60, 35, 1 - body / (0.1 * candle_range))
+
+
+_RULES = {
+    'bull_flag': _bull_flag,
+    'bear_flag': _bear_flag,
+    'head_shoulders': _head_shoulders,
+    'double_top': _double_top,
+    'double_bottom': _double_bottom,
+    'ascending_triangle': _ascending_triangle,
+    'descending_triangle': _descending_triangle,
+    'golden_cross': _golden_cross,
+    'death_cross': _death_cross,
+    'doji': _doji,
+}
+
+
+def _events(code: int, span: int, mask: np.ndarray, conf: np.ndarray, merge: bool) -> np.ndarray:
+    ends = np.flatnonzero(mask)
+    if merge and len(ends):
+        # Consecutive detections of one pattern become one event spanning
+        # them all, keeping the best confidence.
+        breaks = np.flatnonzero(np.diff(ends) != 1) + 1
+        first = np.concatenate(([0], breaks))
+        last = np.concatenate((breaks - 1, [len(ends) - 1]))
+        best = np.maximum.reduceat(conf[ends], first)
+        starts, ends = ends[first] - span + 1, ends[last]
+    else:
+        best = conf[ends]
+        starts = ends - span + 1
+    out = np.empty(len(ends), dtype=EVENT_DTYPE)
+    out['start'] = np.maximum(starts, 0)
+    out['end'] = ends
+    out['type'] = code
+    out['confidence'] = best
+    return out
+
+
+def scan_patterns(candles, types: Optional[Sequence[str]] = None, merge: bool = True) -> np.ndarray:
+    """Scan a full history for chart patterns.
+
+    Args:
+        candles: a ``CandleSeries`` (the doji rule needs its OHLC columns)
+            or a plain array of closes.
+        types: pattern types to evaluate (default: all ``PATTERN_TYPES``).
+        merge: collapse runs of consecutive detections of a type into one
+            event; with ``False`` every detecting window is its own event.
+    Returns:
+        ``EVENT_DTYPE`` array sorted by ``end`` then type.
+    """
+    if isinstance(candles, CandleSeries):
+        scan = _Scan(candles.close, candles.open, candles.high, candles.low)
+    else:
+        scan = _Scan(candles)
+    types = PATTERN_TYPES if types is None else types
+
+    parts = []
+    for name in types:
+        if name not in _RULES:
+            raise ValueError(f"Unknown pattern type: {name}")
+        mask, conf = _RULES[name](scan)
+        parts.append(_events(PATTERN_TYPES.index(name), PATTERN_SPANS[name], mask, conf, merge))
+    events = np.concatenate(parts) if parts else np.empty(0, dtype=EVENT_DTYPE)
+    return events[np.lexsort((events['type'], events['end']))]
+
+
+def events_to_dicts(events: np.ndarray, timestamps=None) -> List[Dict]:
+    """Convert scanner events to dicts; ``timestamps`` (epoch ms) adds start/end times."""
+    out = []
+    for start, end, code, confidence in events.tolist():
+        item = {'type': PATTERN_TYPES[code], 'start': start, 'end': end, 'confidence': confidence}
+        if timestamps is not None:
+            item['start_time'] = int(timestamps[start])
+            item['end_time'] = int(timestamps[end])
+        out.append(item)
+    return out
@@ -0,0 +1,115 @@
+"""
+In-process publish/subscribe for live dashboard updates.
+
+Publishers (the ingestion path, the DB feed in ``dashboard.stream``) call
+``Broker.publish`` from any thread. Subscribers are asyncio consumers,
+one per open Server-Sent Events connection. Each gets a bounded
+``asyncio.Queue`` filled through its own event loop, so no thread is held
+per client. A slow client loses its oldest queued events instead of
+blocking publishers.
+
+Events carry a per-process sequence id. The last ``history`` events are
+kept so a reconnecting client (``Last-Event-ID``) receives what it missed.
+Publishing with a ``key`` drops the event when its ``state`` matches the
+last one published under that key, so values that did not change are
+not re-sent.
+"""
+import asyncio
+import itertools
+import threading
+from collections import deque
+from typing import Any, Dict, Iterable, Optional, Set
+
+
+class Subscription:
+    def __init__(self, broker: 'Broker', channels: Optional[Set[str]], loop: asyncio.AbstractEventLoop,
+                 queue_size: int):
+        self.broker = broker
+        self.channels = channels
+        self.loop = loop
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+        self.dropped = 0
+
+    def wants(self, event: Dict[str, Any]) -> bool:
+        return self.channels is None or event['channel'] in self.channels
+
+    def _deliver(self, event: Dict[str, Any]):
+        """Runs on the subscriber's loop."""
+        if self.queue.full():
+            self.queue.get_nowait()
+            self.dropped += 1
+        self.queue.put_nowait(event)
+
+    async def get(self, timeout: Optional[float] = None) -> Optional[Dict[str, Any]]:
+        """Next event, or None after ``timeout`` seconds without one."""
+        try:
+            return await asyncio.wait_for(self.queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+    def close(self):
+        self.broker.unsubscribe(self)
+
+
+class Broker:
+    def __init__(self, history: int = 256, queue_size: int = 100):
+        self.queue_size = queue_size
+        self._history = deque(maxlen=history)
+        self._subscribers: Set[Subscription] = set()
+        self._state: Dict[Any, Any] = {}
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+
+    @property
+    def subscriber_count(self) -> int:
+        with self._lock:
+            return len(self._subscribers)
+
+    def publish(self, channel: str, data: Dict[str, Any], key: Any = None, state: Any = None) -> Optional[Dict]:
+        """Send ``data`` to every subscriber of ``channel``; returns the event, or None if deduplicated."""
+        with self._lock:
+            if key is not None:
+                state = data if state is None else state
+                if self._state.get(key) == state:
+                    return None
+                self._state[key] = state
+            event = {'id': next(self._ids), 'channel': channel, 'data': data}
+            self._history.append(event)
+            subscribers = [s for s in self._subscribers if s.wants(event)]
+
+        for subscription in subscribers:
+            try:
+                subscription.loop.call_soon_threadsafe(subscription._deliver, event)
+            except RuntimeError:
+                # Its event loop is gone; the connection ended without closing.
+                self.unsubscribe(subscription)
+        return event
+
+    def subscribe(self, channels: Optional[Iterable[str]] = None, last_event_id: Optional[int] = None) -> Subscription:
+        """Subscribe from the running event loop; replays history after ``last_event_id``."""
+        subscription = Subscription(self, set(channels) if channels else None, asyncio.get_running_loop(),
+                                    self.queue_size)
+        with self._lock:
+            if last_event_id is not None:
+                for event in self._history:
+                    if event['id'] > last_event_id and subscription.wants(event):
+                        subscription._deliver(event)
+            self._subscribers.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription):
+        with self._lock:
+            self._subscribers.discard(subscription)
+
+
+_default_broker: Optional[Broker] = None
+_default_lock = threading.Lock()
+
+
+def get_broker() -> Broker:
+    """The process-wide broker."""
+    global _default_broker
+    with _default_lock:
+        if _default_broker is None:
+            _default_broker = Broker()
+        return _default_broker
@@ -0,0 +1,283 @@
+"""
+Incremental (streaming) indicators for live candles.
+
+Each object holds the minimal state needed to update an indicator in O(1)
+per new price and returns the same value the batch functions in
+``core.pattern_detection.TechnicalIndicators`` would return for the full
+price list seen so far. State objects use ``__slots__`` and can be
+snapshotted with ``to_bytes()`` / ``from_bytes()`` so a worker can resume
+after a restart without replaying history.
+"""
+import math
+import struct
+from array import array
+from typing import Dict
+
+
+class _StreamingState:
+    """Binary snapshot support shared by the streaming indicators.
+
+    Subclasses list their scalar fields in ``_SCALARS`` as ``(name, struct
+    code)`` pairs and their ``array('d')`` ring buffers in ``_BUFFERS``.
+    """
+
+    __slots__ = ()
+    _TAG = 0
+    _SCALARS = ()
+    _BUFFERS = ()
+
+    @classmethod
+    def _scalar_format(cls) -> str:
+        return '<' + ''.join(code for _, code in cls._SCALARS)
+
+    def to_bytes(self) -> bytes:
+        parts = [struct.pack('<B', self._TAG),
+                 struct.pack(self._scalar_format(), *(getattr(self, name) for name, _ in self._SCALARS))]
+        for name in self._BUFFERS:
+            buf = getattr(self, name)
+            parts.append(struct.pack('<I', len(buf)))
+            parts.append(buf.tobytes())
+        return b''.join(parts)
+
+    @classmethod
+    def from_bytes(cls, data: bytes):
+        view = memoryview(data)
+        (tag,) = struct.unpack_from('<B', view, 0)
+        if tag != cls._TAG:
+            raise ValueError(f"Snapshot is not a {cls.__name__} state")
+        obj = cls.__new__(cls)
+        offset = 1
+        fmt = cls._scalar_format()
+        for (name, _), value in zip(cls._SCALARS, struct.unpack_from(fmt, view, offset)):
+            setattr(obj, name, value)
+        offset += struct.calcsize(fmt)
+        for name in cls._BUFFERS:
+            (length,) = struct.unpack_from('<I', view, offset)
+            offset += 4
+            buf = array('d')
+            buf.frombytes(view[offset:offset + 8 * length])
+            offset += 8 * length
+            setattr(obj, name, buf)
+        return obj
+
+    def __eq__(self, other):
+        return type(self) is type(other) and self.to_bytes() == other.to_bytes()
+
+
+class StreamingEMA(_StreamingState):
+    """EMA seeded with the first value, like ``TechnicalIndicators._ema``."""
+
+    __slots__ = ('alpha', 'value', 'count')
+    _TAG = 1
+    _SCALARS = (('alpha', 'd'), ('value', 'd'), ('count', 'Q'))
+
+    def __init__(self, period: int):
+        self.alpha = 2.0 / (period + 1)
+        self.value = 0.0
+        self.count = 0
+
+    def update(self, price: float) -> float:
+        if self.count == 0:
+            self.value = float(price)
+        else:
+            self.value = self.alpha * price + (1 - self.alpha) * self.value
+        self.count += 1
+        return self.value
+
+
+class StreamingSMA(_StreamingState):
+    """Ring-buffer SMA matching ``TechnicalIndicators.calculate_sma``.
+
+    Until ``period`` prices have been seen the mean of all prices so far is
+    returned. The running sum is rebuilt from the buffer once per period to
+    stop floating-point drift.
+    """
+
+    __slots__ = ('period', 'pos', 'count', 'total', 'buffer')
+    _TAG = 2
+    _SCALARS = (('period', 'I'), ('pos', 'I'), ('count', 'Q'), ('total', 'd'))
+    _BUFFERS = ('buffer',)
+
+    def __init__(self, period: int):
+        self.period = int(period)
+        self.pos = 0
+        self.count = 0
+        self.total = 0.0
+        self.buffer = array('d', bytes(8 * self.period))
+
+    def update(self, price: float) -> float:
+        price = float(price)
+        self.total += price - self.buffer[self.pos]
+        self.buffer[self.pos] = price
+        self.pos = (self.pos + 1) % self.period
+        self.count += 1
+        if self.pos == 0:
+            self.total = math.fsum(self.buffer)
+        return self.value
+
+    @property
+    def value(self) -> float:
+        if self.count == 0:
+            return 0.0
+        return self.total / min(self.count, self.period)
+
+
+class StreamingRSI(_StreamingState):
+    """Streaming RSI.
+
+    By default matches ``TechnicalIndicators.calculate_rsi``: the plain mean
+    of the last ``period`` gains and losses, 50 until ``period + 1`` prices
+    have been seen and 100 when the average loss is zero. With
+    ``wilder=True`` it matches ``core.indicators.rsi`` (Wilder smoothing).
+    """
+
+    __slots__ = ('period', 'wilder', 'count', 'pos', 'last_price',
+                 'avg_gain', 'avg_loss', 'gains', 'losses')
+    _TAG = 3
+    _SCALARS = (('period', 'I'), ('wilder', '?'), ('count', 'Q'), ('pos', 'I'),
+                ('last_price', 'd'), ('avg_gain', 'd'), ('avg_loss', 'd'))
+    _BUFFERS = ('gains', 'losses')
+
+    def __init__(self, period: int = 14, wilder: bool = False):
+        self.period = int(period)
+        self.wilder = bool(wilder)
+        self.count = 0
+        self.pos = 0
+        self.last_price = 0.0
+        # In simple mode these are running sums; in Wilder mode, averages.
+        self.avg_gain = 0.0
+        self.avg_loss = 0.0
+        self.gains = array('d', bytes(8 * self.period))
+        self.losses = array('d', bytes(8 * self.period))
+
+    def update(self, price: float) -> float:
+        price = float(price)
+        if self.count > 0:
+            delta = price - self.last_price
+            gain = delta if delta > 0 else 0.0
+            loss = -delta if delta < 0 else 0.0
+            changes = self.count  # number of deltas including this one
+            if self.wilder and changes > self.period:
+                self.avg_gain += (gain - self.avg_gain) / self.period
+                self.avg_loss += (loss - self.avg_loss) / self.period
+            else:
+                self.avg_gain += gain - self.gains[self.pos]
+                self.avg_loss += loss - self.losses[self.pos]
+                self.gains[self.pos] = gain
+                self.losses[self.pos] = loss
+                self.pos = (self.pos + 1) % self.period
+                if self.pos == 0:
+                    self.avg_gain = math.fsum(self.gains)
+                    self.avg_loss = math.fsum(self.losses)
+                if self.wilder and changes == self.period:
+                    # Seed Wilder averages with the mean of the first ``period`` changes.
+                    self.avg_gain /= self.period
+                    self.avg_loss /= self.period
+        self.last_price = price
+        self.count += 1
+        return self.value
+
+    @property
+    def value(self) -> float:
+        if self.count < self.period + 1:
+            return 50.0
+        if self.wilder:
+            avg_gain, avg_loss = self.avg_gain, self.avg_loss
+        else:
+            avg_gain, avg_loss = self.avg_gain / self.period, self.avg_loss / self.period
+        if avg_loss == 0:
+            return 100.0
+        return 100 - (100 / (1 + avg_gain / avg_loss))
+
+
+class StreamingMACD(_StreamingState):
+    """Streaming MACD matching ``TechnicalIndicators.calculate_macd``.
+
+    All three EMAs update from the first price; like the batch version the
+    result is all zeros until ``slow`` prices have been seen.
+    """
+
+    __slots__ = ('slow_period', 'fast_alpha', 'slow_alpha', 'signal_alpha',
+                 'fast', 'slow', 'signal', 'count')
+    _TAG = 4
+    _SCALARS = (('slow_period', 'I'), ('fast_alpha', 'd'), ('slow_alpha', 'd'), ('signal_alpha', 'd'),
+                ('fast', 'd'), ('slow', 'd'), ('signal', 'd'), ('count', 'Q'))
+
+    def __init__(self, fast: int = 12, slow: int = 26, signal: int = 9):
+        self.slow_period = int(slow)
+        self.fast_alpha = 2.0 / (fast + 1)
+        self.slow_alpha = 2.0 / (slow + 1)
+        self.signal_alpha = 2.0 / (signal + 1)
+        self.fast = self.slow = self.signal = 0.0
+        self.count = 0
+
+    def update(self, price: float) -> Dict[str, float]:
+        price = float(price)
+        if self.count == 0:
+            self.fast = self.slow = price
+            self.signal = 0.0
+        else:
+            self.fast = self.fast_alpha * price + (1 - self.fast_alpha) * self.fast
+            self.slow = self.slow_alpha * price + (1 - self.slow_alpha) * self.slow
+            macd = self.fast - self.slow
+            self.signal = self.signal_alpha * macd + (1 - self.signal_alpha) * self.signal
+        self.count += 1
+        return self.value
+
+    @property
+    def value(self) -> Dict[str, float]:
+        if self.count < self.slow_period:
+            return {'macd': 0, 'signal': 0, 'histogram': 0}
+        macd = self.fast - self.slow
+        return {'macd': macd, 'signal': self.signal, 'histogram': macd - self.signal}
+
+
+class RollingVariance(_StreamingState):
+    """Sliding-window mean/variance using Welford's update.
+
+    ``std`` is the population standard deviation (``np.std`` default) of the
+    last ``window`` prices, or of every price while fewer have been seen.
+    """
+
+    __slots__ = ('window', 'pos', 'count', 'mean', 'm2', 'buffer')
+    _TAG = 5
+    _SCALARS = (('window', 'I'), ('pos', 'I'), ('count', 'Q'), ('mean', 'd'), ('m2', 'd'))
+    _BUFFERS = ('buffer',)
+
+    def __init__(self, window: int):
+        self.window = int(window)
+        self.pos = 0
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.buffer = array('d', bytes(8 * self.window))
+
+    def update(self, price: float) -> float:
+        x = float(price)
+        if self.count < self.window:
+            n = self.count + 1
+            delta = x - self.mean
+            self.mean += delta / n
+            self.m2 += delta * (x - self.mean)
+        else:
+            old = self.buffer[self.pos]
+            old_mean = self.mean
+            self.mean += (x - old) / self.window
+            self.m2 += (x - old) * (x - self.mean + old - old_mean)
+        self.buffer[self.pos] = x
+        self.pos = (self.pos + 1) % self.window
+        self.count += 1
+        if self.pos == 0:
+            # Re-derive from the full window once per cycle to cancel drift.
+            self.mean = math.fsum(self.buffer) / self.window
+            self.m2 = math.fsum((v - self.mean) ** 2 for v in self.buffer)
+        return self.std
+
+    @property
+    def variance(self) -> float:
+        n = min(self.count, self.window)
+        return max(self.m2, 0.0) / n if n else 0.0
+
+    @property
+    def std(self) -> float:
+        return math.sqrt(self.variance)
@@ -0,0 +1,169 @@
+"""
+Parameter sweeps for the SMA crossover backtest.
+
+Candles are loaded once, every SMA needed by the grid comes from a single
+cumulative-sum pass, and (short, long) pairs are evaluated across a
+process pool. Close prices and the SMA matrix live in one shared-memory
+block that workers map instead of receiving pickled copies.
+"""
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from itertools import product
+from multiprocessing.shared_memory import SharedMemory
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from .backtester import crossover_events, equity_metrics, simulate_crossover
+from .candles import CandleSeries
+
+
+METRICS = ('total_return_pct', 'max_drawdown_pct', 'num_trades')
+
+# Pairs handed to a worker per task; small enough to balance, large enough
+# to amortise inter-process overhead.
+CHUNK_SIZE = 16
+
+# Worker-side view of the shared arrays, set by ``_attach``.
+_shared: Dict[str, Any] = {}
+
+
+def sma_matrix(close: np.ndarray, windows: Sequence[int]) -> np.ndarray:
+    """Rolling means (``min_periods=1``) for every window from one cumulative sum.
+
+    Row ``k`` holds the SMA for ``windows[k]``. Values can differ from
+    pandas' rolling mean in the last bits, so a crossover decided by an
+    exact tie may resolve differently than in ``run_backtest``.
+    """
+    close = np.asarray(close, dtype=float)
+    n = len(close)
+    out = np.empty((len(windows), n))
+    if not n:
+        return out
+    ref = close[0]
+    csum = np.empty(n + 1)
+    csum[0] = 0.0
+    np.cumsum(close - ref, out=csum[1:])
+    idx = np.arange(1, n + 1)
+    for k, window in enumerate(windows):
+        lo = np.maximum(idx - window, 0)
+        out[k] = (csum[idx] - csum[lo]) / (idx - lo) + ref
+    return out
+
+
+def _evaluate(context: Dict[str, Any], pairs: List[Tuple[int, int]], costs: List[Tuple[float, float]],
+              initial_capital: float) -> List[Dict[str, Any]]:
+    close, smas, row = context['close'], context['smas'], context['row']
+    results = []
+    for short, long in pairs:
+        sma_short, sma_long = smas[row[short]], smas[row[long]]
+        events = crossover_events(sma_short, sma_long)
+        for commission, slippage in costs:
+            _, sides, _, equity = simulate_crossover(close, sma_short, sma_long, initial_capital,
+                                                     commission, slippage, events=events)
+            metrics = equity_metrics(equity, initial_capital, int(np.count_nonzero(sides < 0)))
+            results.append({
+                'short_window': short,
+                'long_window': long,
+                'commission_pct': commission,
+                'slippage': slippage,
+                'final_equity': float(equity[-1]),
+                **metrics,
+            })
+    return results
+
+
+def _attach(name: str, shape: Tuple[int, int], windows: List[int]):
+    """Pool initializer: map the shared close/SMA block into this worker."""
+    shm = SharedMemory(name=name)
+    block = np.ndarray(shape, dtype=float, buffer=shm.buf)
+    _shared.update(shm=shm, close=block[0], smas=block[1:], row={w: k for k, w in enumerate(windows)})
+
+
+def _evaluate_shared(pairs, costs, initial_capital):
+    return _evaluate(_shared, pairs, costs, initial_capital)
+
+
+def _heatmaps(results: List[Dict[str, Any]], short_windows: List[int], long_windows: List[int],
+              costs: List[Tuple[float, float]]) -> List[Dict[str, Any]]:
+    """One (short x long) matrix per metric for each commission/slippage pair.
+
+    Cells for pairs that were not evaluated (short >= long) are ``None``.
+    """
+    s_pos = {w: i for i, w in enumerate(short_windows)}
+    l_pos = {w: i for i, w in enumerate(long_windows)}
+    grids = {cost: {m: [[None] * len(long_windows) for _ in short_windows] for m in METRICS} for cost in costs}
+    for r in results:
+        grid = grids[(r['commission_pct'], r['slippage'])]
+        for m in METRICS:
+            grid[m][s_pos[r['short_window']]][l_pos[r['long_window']]] = r[m]
+    return [{
+        'commission_pct': commission,
+        'slippage': slippage,
+        'short_windows': short_windows,
+        'long_windows': long_windows,
+        'z': grids[(commission, slippage)],
+    } for commission, slippage in costs]
+
+
+def run_sweep(candles, short_windows: Iterable[int], long_windows: Iterable[int],
+              commissions: Iterable[float] = (0.001,), slippages: Iterable[float] = (0.0005,),
+              initial_capital: float = 10000.0, workers: Optional[int] = None,
+              rank_by: str = 'total_return_pct', top: Optional[int] = None) -> Dict[str, Any]:
+    """Backtest every (short, long, commission, slippage) combination.
+
+    Pairs with ``short >= long`` are skipped. ``workers`` defaults to the CPU
+    count; with one worker (or a small grid) everything runs in-process.
+
+    Returns ``results`` ranked by ``rank_by`` (descending, optionally cut to
+    ``top``), heatmap-ready matrices per cost setting, and timing info.
+    """
+    started = time.perf_counter()
+    series = CandleSeries.coerce(candles)
+    short_windows = sorted({int(w) for w in short_windows if int(w) > 0})
+    long_windows = sorted({int(w) for w in long_windows if int(w) > 0})
+    costs = [(float(c), float(s)) for c, s in product(commissions, slippages)]
+    pairs = [(s, l) for s, l in product(short_windows, long_windows) if s < l]
+    if rank_by not in METRICS + ('final_equity',):
+        raise ValueError(f"Cannot rank by {rank_by}")
+
+    if not len(series) or not pairs or not costs:
+        results = []
+    else:
+        windows = sorted(set(short_windows) | set(long_windows))
+        smas = sma_matrix(series.close, windows)
+        workers = max(1, min(workers or os.cpu_count() or 1, -(-len(pairs) // CHUNK_SIZE)))
+        chunks = [pairs[i:i + CHUNK_SIZE] for i in range(0, len(pairs), CHUNK_SIZE)]
+
+        if workers == 1:
+            context = {'close': series.close, 'smas': smas, 'row': {w: k for k, w in enumerate(windows)}}
+            results = [r for chunk in chunks for r in _evaluate(context, chunk, costs, initial_capital)]
+        else:
+            shape = (len(windows) + 1, len(series))
+            shm = SharedMemory(create=True, size=int(np.prod(shape)) * 8)
+            try:
+                block = np.ndarray(shape, dtype=float, buffer=shm.buf)
+                block[0] = series.close
+                block[1:] = smas
+                del block
+                with ProcessPoolExecutor(max_workers=workers, initializer=_attach,
+                                         initargs=(shm.name, shape, windows)) as pool:
+                    futures = [pool.submit(_evaluate_shared, chunk, costs, initial_capital) for chunk in chunks]
+                    results = [r for f in futures for r in f.result()]
+            finally:
+                shm.close()
+                shm.unlink()
+
+    ranked = sorted(results, key=lambda r: r[rank_by], reverse=True)
+    for rank, r in enumerate(ranked, start=1):
+        r['rank'] = rank
+
+    return {
+        'results': ranked[:top] if top else ranked,
+        'heatmaps': _heatmaps(results, short_windows, long_windows, costs),
+        'combinations': len(results),
+        'candles': len(series),
+        'workers': workers if results else 0,
+        'elapsed_ms': round((time.perf_counter() - started) * 1000, 1),
+    }
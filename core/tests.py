@@ -1,3 +1,720 @@
-from django.test import TestCase
+import asyncio
+import tempfile
+import threading
+import time
+from datetime import timedelta
+from io import StringIO
+from unittest import mock
 
-# Create your tests here.
+import numpy as np
+import requests
+from decimal import Decimal
+
+from django.core.management import call_command
+from django.test import SimpleTestCase, TestCase
+
+from core import candle_store, features, indicators
+from core.backtester import run_backtest
+from core.better_ml import BetterMLForecast, tree_predictions
+from core.candle_store import CandleStore, interval_to_ms
+from core.candles import CandleSeries, isoformat_ms
+from core.data_fetchers import CryptoDataFetcher, DataSyncService
+from core.downsample import downsample_records, lttb_indices
+from core.cache import ResultCache
+from core.pubsub import Broker
+from core.http_client import ProviderClient, TokenBucket
+from core.model_registry import ModelRegistry
+from core.pattern_detection import LEGACY_PATTERN_TYPES, PATTERN_TYPES, PatternDetector, TechnicalIndicators
+from core.pattern_engine import IncrementalPatternEngine
+from core.pattern_scanner import events_to_dicts, scan_patterns
+from core.sweep import run_sweep
+from core.streaming import RollingVariance, StreamingEMA, StreamingMACD, StreamingRSI, StreamingSMA
+
+
+DAY_MS = interval_to_ms('1d')
+
+
+def make_columns(start_ms, n, step=DAY_MS):
+    ts = start_ms + np.arange(n, dtype='<i8') * step
+    close = 100.0 + np.arange(n, dtype=float)
+    return {'timestamp': ts, 'open': close, 'high': close + 1, 'low': close - 1,
+            'close': close, 'volume': np.ones(n)}
+
+
+class CandleStoreTests(SimpleTestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.store = CandleStore(self.tmp.name)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_append_skips_overlap_and_reads_ranges(self):
+        self.store.append('BTCUSDT', '1d', make_columns(0, 10))
+        written = self.store.append('BTCUSDT', '1d', make_columns(5 * DAY_MS, 10))
+
+        self.assertEqual(written, 5)
+        cols = self.store.read('BTCUSDT', '1d')
+        self.assertEqual(len(cols['timestamp']), 15)
+        self.assertTrue(np.all(np.diff(cols['timestamp']) == DAY_MS))
+
+        tail = self.store.read('BTCUSDT', '1d', limit=3)
+        self.assertEqual(tail['close'].tolist(), [107.0, 108.0, 109.0])
+
+        window = self.store.read('BTCUSDT', '1d', start=2 * DAY_MS, end=4 * DAY_MS)
+        self.assertEqual(window['timestamp'].tolist(), [2 * DAY_MS, 3 * DAY_MS, 4 * DAY_MS])
+
+    def test_compaction_preserves_rows(self):
+        for i in range(candle_store.MAX_SEGMENTS + 1):
+            self.store.append('ETHUSDT', '1h', make_columns(i * 3_600_000, 1, step=3_600_000))
+
+        index = self.store._load_index(self.store._key_dir('ETHUSDT', '1h'))
+        self.assertEqual(len(index['segments']), 1)
+        self.assertEqual(self.store.stats('ETHUSDT', '1h')['rows'], candle_store.MAX_SEGMENTS + 1)
+
+    def test_read_retries_after_concurrent_compaction(self):
+        for i in range(3):
+            self.store.append('ETHUSDT', '1h', make_columns(i * 3_600_000, 1, step=3_600_000))
+        key_dir = self.store._key_dir('ETHUSDT', '1h')
+        stale = self.store._load_index(key_dir)
+        self.store.compact('ETHUSDT', '1h')
+
+        # The first index load returns the pre-compaction segment list.
+        loads = [stale]
+        real_load = self.store._load_index
+        with mock.patch.object(self.store, '_load_index',
+                               side_effect=lambda d: loads.pop() if loads else real_load(d)):
+            cols = self.store.read('ETHUSDT', '1h')
+        self.assertEqual(len(cols['timestamp']), 3)
+
+
+class BinanceKlinesStoreTests(SimpleTestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        patcher = mock.patch('core.data_fetchers.get_candle_store', return_value=CandleStore(self.tmp.name))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(self.tmp.cleanup)
+
+    @staticmethod
+    def _klines(now_ms, n):
+        first = (now_ms // DAY_MS - n + 1) * DAY_MS
+        return [[first + i * DAY_MS, '1', '2', '0.5', str(100 + i), '10', first + (i + 1) * DAY_MS - 1]
+                for i in range(n)]
+
+    def test_second_call_is_served_locally(self):
+        now_ms = 1_700_000_000_000
+        klines = self._klines(now_ms, 50)
+
+        def fetch(provider, url, params, timeout):
+            response = mock.Mock()
+            response.json.return_value = klines[-params['limit']:]
+            return response
+
+        with mock.patch('core.data_fetchers.time.time', return_value=now_ms / 1000), \
+                mock.patch('core.data_fetchers.http_get', side_effect=fetch) as get:
+            first = CryptoDataFetcher.get_binance_klines('BTCUSDT', interval='1d', limit=20)
+            second = CryptoDataFetcher.get_binance_klines('BTCUSDT', interval='1d', limit=20)
+
+        # The still-open candle is never stored or returned, and the first fetch still fills the limit.
+        self.assertEqual(get.call_count, 1)
+        self.assertEqual(len(first), 20)
+        self.assertEqual(first.timestamp.tolist(), second.timestamp.tolist())
+        self.assertEqual(first[-1]['close'], 148.0)
+
+    def test_first_call_backfills_past_one_page(self):
+        now_ms = 1_700_000_000_000
+        klines = self._klines(now_ms, 3000)
+
+        def fetch(provider, url, params, timeout):
+            rows = [k for k in klines if k[0] <= params.get('endTime', now_ms)]
+            response = mock.Mock()
+            response.json.return_value = rows[-params['limit']:]
+            return response
+
+        with mock.patch('core.data_fetchers.time.time', return_value=now_ms / 1000), \
+                mock.patch('core.data_fetchers.http_get', side_effect=fetch) as get:
+            first = CryptoDataFetcher.get_binance_klines('BTCUSDT', interval='1d', limit=1500)
+            calls = get.call_count
+            second = CryptoDataFetcher.get_binance_klines('BTCUSDT', interval='1d', limit=1500)
+
+        self.assertEqual(len(first), 1500)
+        self.assertEqual(np.diff(first.timestamp).tolist(), [DAY_MS] * 1499)
+        self.assertEqual(first.timestamp.tolist(), second.timestamp.tolist())
+        self.assertEqual(get.call_count, calls)
+
+
+class CandleSeriesTests(SimpleTestCase):
+    def setUp(self):
+        self.series = CandleSeries.from_columns(make_columns(0, 120))
+
+    def test_slices_and_frames_share_memory(self):
+        window = self.series[10:20]
+        frame = self.series.to_frame()
+
+        self.assertEqual(len(window), 10)
+        self.assertTrue(np.shares_memory(window.close, self.series.close))
+        self.assertTrue(np.shares_memory(frame['close'].to_numpy(), self.series.close))
+        self.assertEqual(frame['timestamp'].iloc[1].isoformat(), '1970-01-02T00:00:00+00:00')
+
+    def test_isoformat_ms_matches_datetimes(self):
+        series = CandleSeries(np.array([0, 86_400_000, 1_700_000_000_123]), *np.ones((4, 3)))
+        self.assertEqual(isoformat_ms(series.timestamp), [dt.isoformat() for dt in series.datetimes()])
+
+    def test_vectorized_backtest_matches_loop_engine(self):
+        close = random_walk(2000, seed=4)
+        series = CandleSeries(np.arange(2000) * 60_000 + 7, close, close + 1, close - 1, close)
+        for short, long in ((5, 20), (10, 50), (30, 10)):
+            self.assertEqual(run_backtest(series, short, long, interval='1m'),
+                             run_backtest(series, short, long, interval='1m', engine='loop'))
+
+    def test_backtest_accepts_legacy_dicts(self):
+        legacy = [self.series.row_decimal(i) for i in range(len(self.series))][::-1]
+
+        self.assertEqual(run_backtest(legacy, 5, 20), run_backtest(self.series, 5, 20))
+
+
+class SweepTests(SimpleTestCase):
+    def test_sweep_matches_single_backtests(self):
+        close = random_walk(600, seed=9)
+        series = CandleSeries(np.arange(600) * DAY_MS, close, close, close, close)
+        result = run_sweep(series, [5, 10, 40], [20, 40], commissions=[0.001, 0.0], workers=1)
+
+        # 4 valid (short, long) pairs x 2 commissions; (40, 20) and (40, 40) are skipped
+        self.assertEqual(result['combinations'], 4 * 2)
+        for r in result['results']:
+            expected = run_backtest(series, r['short_window'], r['long_window'],
+                                    commission_pct=r['commission_pct'])['metrics']
+            for key in ('total_return_pct', 'max_drawdown_pct', 'num_trades'):
+                self.assertAlmostEqual(r[key], expected[key], places=6)
+        returns = [r['total_return_pct'] for r in result['results']]
+        self.assertEqual(returns, sorted(returns, reverse=True))
+        self.assertIsNone(result['heatmaps'][0]['z']['num_trades'][2][0])
+
+    def test_process_pool_matches_inline(self):
+        close = random_walk(400, seed=3)
+        series = CandleSeries(np.arange(400) * DAY_MS, close, close, close, close)
+        shorts, longs = range(2, 20), range(21, 30)
+
+        inline = run_sweep(series, shorts, longs, workers=1)
+        pooled = run_sweep(series, shorts, longs, workers=2)
+
+        self.assertEqual(pooled['workers'], 2)
+        self.assertEqual(inline['results'], pooled['results'])
+
+
+def random_walk(n, seed=0):
+    rng = np.random.default_rng(seed)
+    return 100 + np.cumsum(rng.normal(0, 1, n))
+
+
+class IndicatorsTests(SimpleTestCase):
+    def test_ema_matches_recurrence(self):
+        prices = random_walk(5000)
+        for period in (2, 12, 200):
+            alpha = 2 / (period + 1)
+            expected = np.empty_like(prices)
+            expected[0] = prices[0]
+            for i in range(1, len(prices)):
+                expected[i] = alpha * prices[i] + (1 - alpha) * expected[i - 1]
+            np.testing.assert_allclose(indicators.ema(prices, period), expected, rtol=1e-10)
+
+    def test_wilder_rsi_matches_recurrence(self):
+        prices = random_walk(500, seed=1)
+        deltas = np.diff(prices)
+        gain, loss = np.clip(deltas, 0, None), np.clip(-deltas, 0, None)
+        avg_gain, avg_loss = gain[:14].mean(), loss[:14].mean()
+        for i in range(14, len(deltas)):
+            avg_gain = (avg_gain * 13 + gain[i]) / 14
+            avg_loss = (avg_loss * 13 + loss[i]) / 14
+
+        self.assertAlmostEqual(indicators.rsi(prices, 14)[-1], 100 - 100 / (1 + avg_gain / avg_loss), places=8)
+        self.assertTrue(np.isnan(indicators.rsi(prices, 14)[13]))
+
+    def test_scalar_wrappers_keep_last_value_semantics(self):
+        prices = random_walk(300, seed=2).tolist()
+        deltas = np.diff(prices)
+        avg_gain = np.mean(np.where(deltas > 0, deltas, 0)[-14:])
+        avg_loss = np.mean(np.where(deltas < 0, -deltas, 0)[-14:])
+
+        self.assertAlmostEqual(TechnicalIndicators.calculate_rsi(prices), 100 - 100 / (1 + avg_gain / avg_loss))
+        self.assertAlmostEqual(TechnicalIndicators.calculate_sma(prices, 50), np.mean(prices[-50:]))
+        self.assertAlmostEqual(TechnicalIndicators.calculate_sma(prices[:5], 50), np.mean(prices[:5]))
+        self.assertEqual(TechnicalIndicators.calculate_rsi(prices[:10]), 50.0)
+
+
+class FeatureTests(SimpleTestCase):
+    def test_lag_matrix_is_a_view(self):
+        x = np.arange(10.0)
+        X, y = features.lag_matrix(x, 3)
+        X5, y5 = features.lag_matrix(x, 3, horizon=2)
+
+        self.assertTrue(np.shares_memory(X, x))
+        np.testing.assert_array_equal(X[0], [0, 1, 2])
+        np.testing.assert_array_equal(y, np.arange(3.0, 10.0))
+        self.assertEqual(X5.shape, (6, 3))
+        np.testing.assert_array_equal(y5[-1], [8, 9])
+
+    def test_feature_matrix_aligns_features_with_last_lag(self):
+        x = random_walk(300, seed=2)
+        X, y, first = features.feature_matrix(x, 10, dtype=float)
+        rsi = indicators.rsi(x, 14, smoothing='simple')
+
+        self.assertFalse(np.isnan(X).any())
+        self.assertEqual(len(X), len(y))
+        # Row 0 of the full lag matrix ends at x[9]; kept rows start ``first`` later.
+        np.testing.assert_array_equal(X[:, :10], features.lag_matrix(x, 10)[0][first:])
+        self.assertEqual(X[0, 10], x[first + 9] / x[first + 8] - 1)
+        self.assertEqual(X[0, 15], rsi[first + 9])
+        self.assertEqual(y[0], x[first + 10])
+
+    def test_feature_row_matches_the_next_matrix_row(self):
+        x = random_walk(300, seed=2)
+        X, _, _ = features.feature_matrix(x, 10, dtype=float)
+        np.testing.assert_array_equal(features.feature_row(x[:-1], 10), X[-1])
+
+
+def random_candles(n, seed=0):
+    rng = np.random.default_rng(seed)
+    close = random_walk(n, seed)
+    open_ = close + rng.normal(0, 0.3, n)
+    return CandleSeries(np.arange(n) * 60_000, open_, np.maximum(open_, close) + rng.random(n),
+                        np.minimum(open_, close) - rng.random(n), close)
+
+
+class PatternScannerTests(SimpleTestCase):
+    def test_scan_matches_detector_at_every_candle(self):
+        series = random_candles(260, seed=1)
+        found = {(e['end'], e['type']): e['confidence']
+                 for e in events_to_dicts(scan_patterns(series, merge=False))}
+
+        expected = {}
+        for end in range(len(series)):
+            window = series[:end + 1]
+            detector = PatternDetector(window.close.tolist(), opens=window.open.tolist(),
+                                       highs=window.high.tolist(), lows=window.low.tolist())
+            for pattern in detector.detect_all_patterns(types=PATTERN_TYPES):
+                expected[(end, pattern['type'])] = pattern['confidence']
+
+        self.assertEqual(found, expected)
+        self.assertGreaterEqual(len({t for _, t in expected}), 6)
+
+    def test_detector_defaults_to_the_original_four_types(self):
+        prices = [100.0 + i for i in range(30)]
+        detector = PatternDetector(prices, opens=prices, highs=[p + 1 for p in prices], lows=[p - 1 for p in prices])
+
+        self.assertIn('doji', {p['type'] for p in detector.detect_all_patterns(types=PATTERN_TYPES)})
+        self.assertTrue({p['type'] for p in detector.detect_all_patterns()} <= set(LEGACY_PATTERN_TYPES))
+
+    def test_merge_collapses_consecutive_detections(self):
+        series = random_candles(500, seed=2)
+        single = scan_patterns(series, types=['bull_flag'], merge=False)
+        merged = scan_patterns(series, types=['bull_flag'])
+
+        self.assertLess(len(merged), len(single))
+        self.assertEqual(set(merged['type']), {PATTERN_TYPES.index('bull_flag')})
+        self.assertEqual(merged['confidence'].max(), single['confidence'].max())
+        covered = np.zeros(len(series), dtype=bool)
+        for start, end, _, _ in merged.tolist():
+            covered[start + 19:end + 1] = True
+        self.assertTrue(covered[single['end']].all())
+
+
+class IncrementalPatternEngineTests(SimpleTestCase):
+    def test_deltas_reproduce_scanner_events(self):
+        series = random_candles(1500, seed=3)
+        engine = IncrementalPatternEngine()
+        deltas = engine.extend(series[:700]) + engine.extend(series)  # overlap is skipped
+
+        closed = {(d['type'], d['start']): d for d in deltas if d['event'] == 'invalidated'}
+        runs = set()
+        for d in deltas:
+            if d['event'] == 'completed':
+                run = closed.get((d['type'], d['start'])) or engine.active[d['type']]
+                self.assertEqual(d['start_time'], series.timestamp[d['start']])
+                runs.add((d['start'], run['end'], PATTERN_TYPES.index(d['type']), run['confidence']))
+
+        self.assertEqual(runs, {tuple(e) for e in scan_patterns(series).tolist()})
+        self.assertEqual(engine.count, len(series))
+
+    def test_restored_engine_emits_the_same_deltas(self):
+        series = random_candles(600, seed=5)
+        engine = IncrementalPatternEngine()
+        engine.extend(series[:350])
+        restored = IncrementalPatternEngine.from_bytes(engine.to_bytes())
+
+        self.assertEqual(restored.extend(series), engine.extend(series))
+        self.assertEqual(restored.to_bytes(), engine.to_bytes())
+
+
+class StreamingIndicatorTests(SimpleTestCase):
+    def test_matches_batch_indicators_across_restarts(self):
+        prices = random_walk(400, seed=3).tolist()
+        states = [StreamingEMA(12), StreamingSMA(20), StreamingRSI(14), StreamingRSI(14, wilder=True),
+                  StreamingMACD(), RollingVariance(10)]
+
+        for i, price in enumerate(prices):
+            if i == 200:
+                # Simulate a worker restart from snapshots.
+                states = [type(st).from_bytes(st.to_bytes()) for st in states]
+            for st in states:
+                st.update(price)
+            if i % 37 and i != len(prices) - 1:
+                continue
+            seen = prices[:i + 1]
+            ema, sma, rsi, wilder, macd, var = states
+            self.assertAlmostEqual(ema.value, TechnicalIndicators._ema(np.array(seen), 12)[-1], places=9)
+            self.assertAlmostEqual(sma.value, TechnicalIndicators.calculate_sma(seen, 20), places=9)
+            self.assertAlmostEqual(rsi.value, TechnicalIndicators.calculate_rsi(seen), places=9)
+            if i >= 14:
+                self.assertAlmostEqual(wilder.value, indicators.rsi(seen, 14)[-1], places=9)
+            for key, value in TechnicalIndicators.calculate_macd(seen).items():
+                self.assertAlmostEqual(macd.value[key], value, places=9)
+            self.assertAlmostEqual(var.std, float(np.std(seen[-10:])), places=9)
+
+    def test_snapshot_rejects_other_types(self):
+        with self.assertRaises(ValueError):
+            StreamingSMA.from_bytes(StreamingEMA(5).to_bytes())
+
+
+class BetterMLForecastTests(SimpleTestCase):
+    def test_batched_tree_predictions_match_estimators(self):
+        prices = random_walk(200, seed=6).tolist()
+        X = np.random.default_rng(1).normal(100, 5, (20, 10))
+        for mode in BetterMLForecast.MODES:
+            forest = BetterMLForecast(prices, mode=mode, max_horizon=5).model
+            per_tree = tree_predictions(forest, X)
+            expected = np.stack([est.predict(X).reshape(len(X), -1) for est in forest.estimators_], axis=1)
+            np.testing.assert_array_equal(per_tree, expected)
+
+    def test_direct_mode_forecasts_up_to_trained_horizon(self):
+        forecaster = BetterMLForecast(random_walk(200, seed=6).tolist(), mode='direct', max_horizon=14)
+
+        self.assertEqual(len(forecaster.predict(14)['forecast_points']), 14)
+        self.assertEqual(len(forecaster.predict(1)['forecast_points']), 1)
+        with self.assertRaises(ValueError):
+            forecaster.predict(15)
+
+    def test_extra_features(self):
+        prices = random_walk(200, seed=6).tolist()
+        for mode in BetterMLForecast.MODES:
+            forecaster = BetterMLForecast(prices, mode=mode, max_horizon=7,
+                                          features=('lags', 'returns', 'stats', 'indicators'))
+            self.assertEqual(forecaster.model.n_features_in_, 10 + 1 + 4 + 4)
+            self.assertEqual(len(forecaster.predict(7)['forecast_points']), 7)
+        self.assertEqual(BetterMLForecast(prices).model.n_features_in_, 10)
+        with self.assertRaises(ValueError):
+            BetterMLForecast(prices, features=('lags', 'volume'))
+
+
+class ModelRegistryTests(SimpleTestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.root = tmp.name
+        self.prices = random_walk(80, seed=5).tolist()
+
+    def test_reuses_model_until_candles_change(self):
+        registry = ModelRegistry(self.root)
+        first = BetterMLForecast(self.prices, asset='BTC/USD', registry=registry)
+        again = BetterMLForecast(self.prices, asset='BTC/USD', registry=registry)
+        self.assertIs(again.model, first.model)
+        self.assertEqual(again.predict(5), first.predict(5))
+
+        # A fresh process loads the pickled model from disk instead of training.
+        reloaded = ModelRegistry(self.root)
+        BetterMLForecast(self.prices, asset='BTC/USD', registry=reloaded)
+        self.assertEqual(reloaded.stats['trained'], 0)
+        self.assertEqual(reloaded.stats['disk_hits'], 1)
+
+        BetterMLForecast(self.prices + [self.prices[-1] + 1], asset='BTC/USD', registry=registry)
+        self.assertEqual(registry.stats['trained'], 2)
+        # The superseded model file is dropped.
+        self.assertEqual(len(list((registry.root / 'BTCUSD').glob('*.pkl'))), 1)
+
+    def test_live_tick_does_not_retrain(self):
+        registry = ModelRegistry(self.root)
+        days = CandleSeries.from_prices(1_700_006_400_000 + np.arange(len(self.prices)) * DAY_MS,
+                                        self.prices).datetimes()
+        # CoinGecko's daily series ends with the in-progress price at request time.
+        for tick, tick_price in ((days[-1] + timedelta(hours=1), 101.5), (days[-1] + timedelta(hours=2), 99.0)):
+            forecaster = BetterMLForecast(self.prices + [tick_price], days + [tick], asset='BTC/USD',
+                                          registry=registry)
+            self.assertEqual(forecaster.predict(3)['current_price'], Decimal(str(tick_price)))
+        self.assertEqual(registry.stats['trained'], 1)
+
+        BetterMLForecast(self.prices + [100.0], days + [days[-1] + timedelta(days=1)], asset='BTC/USD', registry=registry)
+        self.assertEqual(registry.stats['trained'], 2)
+
+    def test_expiry_and_memory_eviction(self):
+        registry = ModelRegistry(self.root, max_memory=1, ttl=60)
+        calls = []
+
+        def train(name):
+            return lambda: calls.append(name) or {'model': name}
+
+        registry.get_or_train('btc', 10, 'a', {}, train('btc'))
+        registry.get_or_train('eth', 10, 'a', {}, train('eth'))
+        self.assertEqual(registry.stats['evicted'], 1)
+        # Evicted from memory but still on disk.
+        self.assertEqual(registry.get_or_train('btc', 10, 'a', {}, train('btc')), {'model': 'btc'})
+        self.assertEqual(calls, ['btc', 'eth'])
+
+        with mock.patch('core.model_registry.time.time', return_value=time.time() + 120):
+            registry.get_or_train('btc', 10, 'a', {}, train('btc'))
+        self.assertEqual(calls, ['btc', 'eth', 'btc'])
+
+
+class FakeClock:
+    """Stands in for ``time.monotonic``/``time.sleep``: sleeping advances the clock."""
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += seconds
+
+    def patch(self):
+        return mock.patch.multiple('core.http_client.time', monotonic=self.monotonic, sleep=self.sleep)
+
+
+class TokenBucketTests(SimpleTestCase):
+    def setUp(self):
+        self.clock = FakeClock()
+        patcher = self.clock.patch()
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_burst_then_rate(self):
+        bucket = TokenBucket(rate=2, burst=3)
+        for _ in range(3):
+            bucket.acquire()
+        self.assertEqual(self.clock.now, 1000.0)
+        bucket.acquire()
+        self.assertEqual(self.clock.now, 1000.5)
+
+    def test_refill_is_capped_at_burst(self):
+        bucket = TokenBucket(rate=1, burst=3)
+        for _ in range(3):
+            bucket.acquire()
+        self.clock.sleep(2)
+        bucket.acquire()
+        bucket.acquire()
+        self.assertEqual(self.clock.now, 1002.0)
+
+        self.clock.sleep(100)
+        for _ in range(3):
+            bucket.acquire()
+        self.assertEqual(self.clock.now, 1102.0)
+        self.assertFalse(bucket.acquire(deadline=self.clock.now + 0.5))
+
+    def test_block_expires(self):
+        bucket = TokenBucket(rate=10, burst=5)
+        bucket.block_for(4)
+        self.assertFalse(bucket.acquire(deadline=self.clock.now + 3))
+        self.assertTrue(bucket.acquire())
+        self.assertEqual(self.clock.now, 1004.0)
+
+
+class ProviderClientTests(SimpleTestCase):
+    def test_retries_after_429_honouring_retry_after(self):
+        client = ProviderClient('test', rate=100, burst=10)
+        throttled = mock.Mock(status_code=429, headers={'Retry-After': '2'})
+        ok = mock.Mock(status_code=200, headers={})
+        with mock.patch.object(client.session, 'get', side_effect=[throttled, ok]) as get, \
+                mock.patch.object(client.bucket, 'block_for') as block_for, \
+                mock.patch('core.http_client.time.sleep') as sleep:
+            response = client.get('https://example.invalid/')
+
+        self.assertIs(response, ok)
+        self.assertEqual(get.call_count, 2)
+        block_for.assert_called_once_with(2.0)
+        sleep.assert_any_call(2.0)
+        stats = client.stats.snapshot()
+        self.assertEqual((stats['calls'], stats['retries'], stats['throttled']), (2, 1, 1))
+
+    def test_long_retry_after_only_pauses_callers_briefly(self):
+        clock = FakeClock()
+        throttled = mock.Mock(status_code=429, headers={'Retry-After': '120'})
+        ok = mock.Mock(status_code=200, headers={})
+        with clock.patch():
+            client = ProviderClient('test', rate=100, burst=10)
+            client.session.get = mock.Mock(side_effect=[throttled, ok])
+            self.assertIs(client.get('https://example.invalid/'), ok)
+            self.assertLessEqual(client.bucket.blocked_until - 1000.0, client.backoff_cap)
+        self.assertEqual(clock.now, 1000.0 + client.backoff_cap)
+
+    def test_outage_fails_within_the_deadline(self):
+        clock = FakeClock()
+        timeouts = []
+
+        def hang(url, params, timeout):
+            timeouts.append(timeout)
+            clock.sleep(timeout)
+            raise requests.Timeout('read timed out')
+
+        with clock.patch():
+            client = ProviderClient('test', rate=100, burst=10, deadline=15)
+            client.session.get = hang
+            with self.assertRaises(requests.Timeout):
+                client.get('https://example.invalid/', timeout=10)
+        self.assertLessEqual(clock.now, 1015.0)
+        self.assertEqual(timeouts[0], 10)
+        self.assertLess(len(timeouts), client.max_retries + 1)
+
+
+class DataSyncServiceTests(TestCase):
+    def test_sync_all_reports_partial_failures(self):
+        from dashboard.models import Asset, MarketIndicator, MarketSentiment, PriceRollup
+
+        crypto = {'price': Decimal('100'), 'change_24h': Decimal('1'), 'volume_24h': Decimal('5')}
+
+        def slow_sp500():
+            time.sleep(0.5)
+            return {'price': Decimal('1'), 'change_percent': Decimal('0')}
+
+        def failing_price(coin_id):
+            if coin_id == 'ethereum':
+                raise RuntimeError('boom')
+            return crypto
+
+        with mock.patch('core.data_fetchers.StockDataFetcher.get_sp500_price', side_effect=slow_sp500), \
+                mock.patch('core.data_fetchers.CryptoDataFetcher.get_price', side_effect=failing_price), \
+                mock.patch('core.data_fetchers.SentimentFetcher.get_fear_greed_index',
+                           return_value={'score': 20, 'level': 'extreme_fear', 'mock': True}):
+            report = DataSyncService.sync_all(deadline=0.1)
+
+        self.assertEqual(report['sp500'], 'timeout')
+        self.assertEqual(report['btc'], 'ok')
+        self.assertTrue(report['eth'].startswith('error'))
+        self.assertEqual(report['sentiment'], 'fallback')
+        self.assertEqual(list(MarketIndicator.objects.values_list('indicator_type', flat=True)), ['btc'])
+        self.assertEqual(Asset.objects.get(symbol='BTC/USD').current_price, Decimal('100'))
+        self.assertEqual(sorted(PriceRollup.objects.values_list('resolution', flat=True)), ['1d', '1h', '1m', '5m'])
+        self.assertEqual(MarketSentiment.objects.get().score, 20)
+
+
+class IngestMarketDataCommandTests(SimpleTestCase):
+    def test_once_runs_every_job_in_one_sync(self):
+        with mock.patch('core.management.commands.ingest_market_data.DataSyncService.sync_all',
+                        return_value={'btc': 'ok'}) as sync_all, \
+                mock.patch('core.management.commands.ingest_market_data.LivePatternService.sync_live',
+                           return_value={}) as sync_live:
+            call_command('ingest_market_data', '--once', stdout=mock.Mock())
+
+        sync_all.assert_called_once_with(include_indicators=True, include_sentiment=True)
+        sync_live.assert_called_once_with()
+
+    def test_failing_job_does_not_stop_the_worker(self):
+        stderr = StringIO()
+        with mock.patch('core.management.commands.ingest_market_data.DataSyncService.sync_all',
+                        side_effect=RuntimeError('database is locked')), \
+                mock.patch('core.management.commands.ingest_market_data.LivePatternService.sync_live',
+                           return_value={}) as sync_live:
+            call_command('ingest_market_data', '--once', stdout=mock.Mock(), stderr=stderr)
+
+        self.assertIn('database is locked', stderr.getvalue())
+        sync_live.assert_called_once_with()
+
+
+class ResultCacheTests(SimpleTestCase):
+    def test_ttl_and_lru(self):
+        cache = ResultCache('t', max_entries=2, ttl=60)
+        cache.set('a', 1)
+        cache.set('b', 2)
+        self.assertEqual(cache.get('a'), 1)  # 'b' is now least recently used
+        cache.set('c', 3)
+        self.assertIsNone(cache.get('b'))
+        self.assertEqual(cache.stats()['evictions'], 1)
+
+        with mock.patch('core.cache.time.monotonic', return_value=time.monotonic() + 61):
+            self.assertIsNone(cache.get('a'))
+        self.assertEqual(cache.stats()['expired'], 1)
+
+    def test_concurrent_misses_compute_once(self):
+        cache = ResultCache('t')
+        calls = []
+        started = threading.Event()
+
+        def compute():
+            calls.append(1)
+            started.set()
+            time.sleep(0.1)
+            return 42
+
+        threads = [threading.Thread(target=lambda: cache.get_or_compute('k', compute)) for _ in range(5)]
+        threads[0].start()
+        started.wait(1)
+        for thread in threads[1:]:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(cache.stats()['coalesced'], 4)
+
+    def test_failures_are_not_cached(self):
+        cache = ResultCache('t')
+        with self.assertRaises(ValueError):
+            cache.get_or_compute('k', mock.Mock(side_effect=ValueError))
+        self.assertEqual(cache.get_or_compute('k', lambda: 1), 1)
+
+
+class BrokerTests(SimpleTestCase):
+    def test_channels_dedupe_and_replay(self):
+        broker = Broker(history=10)
+
+        async def scenario():
+            subscription = broker.subscribe(['indicator'])
+            # Published from another thread, as the ingestion path does.
+            await asyncio.to_thread(broker.publish, 'signal', {'id': 1})
+            for value in (100, 100, 101):
+                await asyncio.to_thread(broker.publish, 'indicator', {'value': value}, key='btc')
+            received = [await subscription.get(1), await subscription.get(1), await subscription.get(0.05)]
+            subscription.close()
+
+            replay = broker.subscribe(last_event_id=1)
+            replayed = [replay.queue.get_nowait()['id'] for _ in range(replay.queue.qsize())]
+            replay.close()
+            return received, replayed
+
+        received, replayed = asyncio.run(scenario())
+        self.assertEqual([e['data']['value'] for e in received[:2]], [100, 101])
+        self.assertIsNone(received[2])
+        self.assertEqual(replayed, [2, 3])
+        self.assertEqual(broker.subscriber_count, 0)
+
+    def test_slow_subscriber_drops_oldest(self):
+        broker = Broker(queue_size=2)
+
+        async def scenario():
+            subscription = broker.subscribe()
+            for i in range(4):
+                broker.publish('signal', {'id': i})
+            await asyncio.sleep(0)
+            return [subscription.queue.get_nowait()['data']['id'] for _ in range(2)], subscription.dropped
+
+        self.assertEqual(asyncio.run(scenario()), ([2, 3], 2))
+
+
+class DownsampleTests(SimpleTestCase):
+    def test_keeps_ends_and_extremes(self):
+        y = np.sin(np.linspace(0, 20, 5000))
+        y[1234] = 5.0
+        keep = lttb_indices(y, 200)
+        self.assertEqual(len(keep), 200)
+        self.assertEqual((keep[0], keep[-1]), (0, 4999))
+        self.assertTrue(np.all(np.diff(keep) > 0))
+        self.assertIn(1234, keep)
+        self.assertLess(abs(y[keep].min() + 1), 0.01)
+
+    def test_small_inputs_and_records(self):
+        self.assertEqual(lttb_indices([1, 2, 3], 10).tolist(), [0, 1, 2])
+        self.assertEqual(lttb_indices(np.arange(10.0), 2).tolist(), [0, 9])
+        records = [{'t': t * t, 'v': float(t % 5)} for t in range(100)]
+        self.assertEqual(len(downsample_records(records, 'v', None)), 100)
+        thinned = downsample_records(records, 'v', 10, x_key='t')
+        self.assertEqual(len(thinned), 10)
+        self.assertEqual((thinned[0], thinned[-1]), (records[0], records[-1]))
@@ -1,5 +1,6 @@
 from django.contrib import admin
-from .models import MarketIndicator, Signal, MarketSentiment, Asset, PriceData
+from .models import (Asset, IndicatorRollup, LatestIndicator, MarketIndicator, MarketSentiment, PriceData,
+                     PriceRollup, SentimentRollup, Signal)
 
 
 @admin.register(MarketIndicator)
@@ -9,6 +10,12 @@ class MarketIndicatorAdmin(admin.ModelAdmin):
     readonly_fields = ['timestamp']
 
 
+@admin.register(LatestIndicator)
+class LatestIndicatorAdmin(admin.ModelAdmin):
+    list_display = ['indicator_type', 'value', 'change_percent', 'timestamp']
+    readonly_fields = ['indicator_type', 'value', 'change_percent', 'timestamp', 'source']
+
+
 @admin.register(Signal)
 class SignalAdmin(admin.ModelAdmin):
     list_display = ['asset', 'signal_type', 'entry_price', 'target_price', 'confidence', 'created_at']
@@ -35,3 +42,22 @@ class PriceDataAdmin(admin.ModelAdmin):
     list_display = ['asset', 'price', 'volume', 'timestamp']
     list_filter = ['timestamp']
     search_fields = ['asset__symbol']
+
+
+@admin.register(IndicatorRollup)
+class IndicatorRollupAdmin(admin.ModelAdmin):
+    list_display = ['indicator_type', 'resolution', 'bucket', 'open', 'high', 'low', 'close', 'count']
+    list_filter = ['indicator_type', 'resolution']
+
+
+@admin.register(SentimentRollup)
+class SentimentRollupAdmin(admin.ModelAdmin):
+    list_display = ['resolution', 'bucket', 'open', 'high', 'low', 'close', 'level', 'count']
+    list_filter = ['resolution']
+
+
+@admin.register(PriceRollup)
+class PriceRollupAdmin(admin.ModelAdmin):
+    list_display = ['asset', 'resolution', 'bucket', 'open', 'high', 'low', 'close', 'count']
+    list_filter = ['resolution']
+    search_fields = ['asset__symbol']
@@ -1,24 +1,31 @@
-from rest_framework.decorators import api_view
+from rest_framework.decorators import api_view, permission_classes
+from rest_framework.permissions import IsAdminUser
 from rest_framework.response import Response
 from rest_framework import status
 from django.utils import timezone
 from datetime import timedelta
-from .models import MarketIndicator, Signal, MarketSentiment, Asset, PriceData
-from core.data_fetchers import DataSyncService
+from django.utils.http import parse_etags, quote_etag
+from . import retention
+from .models import LatestIndicator, MarketIndicator, Signal, MarketSentiment, Asset
+from core.http_client import client_metrics
 
 
 @api_view(['GET'])
 def market_overview(request):
-    """API endpoint for market overview data"""
-    # Sync latest data
-    try:
-        DataSyncService.sync_market_indicators()
-    except:
-        pass
-    
+    """API endpoint for market overview data.
+
+    Reads the one-row-per-type snapshot and sends an ETag; a request whose
+    If-None-Match still matches gets 304 Not Modified.
+    """
+    snapshot = LatestIndicator.snapshot()
+    etag = quote_etag(LatestIndicator.etag(snapshot))
+    headers = {'ETag': etag, 'Cache-Control': 'no-cache'}
+    if etag in parse_etags(request.headers.get('If-None-Match', '')):
+        return Response(status=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
     indicators = {}
     for indicator_type in ['sp500', 'btc', 'eth', 'ai_accuracy']:
-        latest = MarketIndicator.objects.filter(indicator_type=indicator_type).first()
+        latest = snapshot.get(indicator_type)
         if latest:
             indicators[indicator_type] = {
                 'value': float(latest.value),
@@ -26,7 +33,7 @@ def market_overview(request):
                 'timestamp': latest.timestamp.isoformat(),
             }
     
-    return Response(indicators)
+    return Response(indicators, headers=headers)
 
 
 @api_view(['GET'])
@@ -65,25 +72,71 @@ def sentiment(request):
 
 @api_view(['GET'])
 def price_data(request, symbol):
-    """API endpoint for price data"""
+    """API endpoint for price data.
+
+    ``resolution`` (raw, 1m, 5m, 1h, 1d) reads that rollup tier;
+    ``max_points`` picks the finest tier whose point count fits and thins
+    what is still over budget with LTTB. Older
+    parts of the window come from coarser rollups once raw rows are
+    compacted; each point's ``resolution`` says which.
+    """
     try:
         asset = Asset.objects.get(symbol=symbol)
-        hours = int(request.GET.get('hours', 24))
-        since = timezone.now() - timedelta(hours=hours)
-        
-        prices = PriceData.objects.filter(
-            asset=asset,
-            timestamp__gte=since
-        ).order_by('timestamp')
-        
-        data = [{
-            'timestamp': p.timestamp.isoformat(),
-            'price': float(p.price),
-            'volume': float(p.volume),
-        } for p in prices]
-        
-        return Response(data)
     except Asset.DoesNotExist:
         return Response({'error': 'Asset not found'}, status=status.HTTP_404_NOT_FOUND)
 
+    try:
+        hours = float(request.GET.get('hours', 24))
+        if not hours > 0:
+            raise ValueError(hours)
+        since = timezone.now() - timedelta(hours=hours)
+        max_points = max(2, int(request.GET['max_points'])) if request.GET.get('max_points') else None
+    except (ValueError, OverflowError):
+        return Response({'error': 'hours must be a positive number and max_points an integer'},
+                        status=status.HTTP_400_BAD_REQUEST)
+    resolution = request.GET.get('resolution')
+    if resolution and resolution not in retention.TIERS:
+        return Response({'error': f"resolution must be one of {', '.join(retention.TIERS)}"},
+                        status=status.HTTP_400_BAD_REQUEST)
+    if not resolution and max_points:
+        resolution = retention.choose_resolution('price', since, series=asset.id, max_points=max_points)
+
+    points = retention.history('price', since, series=asset.id, resolution=resolution or 'raw')
+    return Response(price_points(retention.downsample(points, max_points)))
+
 
+def price_points(points):
+    """Price chart points in the API shape (``price`` is the bucket close)."""
+    return [{
+        'timestamp': p['timestamp'].isoformat(),
+        'price': p['close'],
+        'open': p['open'],
+        'high': p['high'],
+        'low': p['low'],
+        'volume': p['volume'],
+        'resolution': p['resolution'],
+    } for p in points]
+
+
+@api_view(['GET'])
+def indicator_history(request, indicator_type):
+    """Indicator values over the last ``hours`` (raw, then rollups for older data)"""
+    if indicator_type not in dict(MarketIndicator.INDICATOR_TYPES):
+        return Response({'error': 'Unknown indicator'}, status=status.HTTP_404_NOT_FOUND)
+    since = timezone.now() - timedelta(hours=int(request.GET.get('hours', 24)))
+    return Response([{**p, 'timestamp': p['timestamp'].isoformat()}
+                     for p in retention.history('indicator', since, series=indicator_type)])
+
+
+@api_view(['GET'])
+def sentiment_history(request):
+    """Sentiment scores over the last ``hours`` (raw, then rollups for older data)"""
+    since = timezone.now() - timedelta(hours=int(request.GET.get('hours', 24)))
+    return Response([{**p, 'timestamp': p['timestamp'].isoformat()} for p in retention.history('sentiment', since)])
+
+
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+def provider_metrics(request):
+    """Per-provider upstream call latency, error and retry counters"""
+    return Response(client_metrics())
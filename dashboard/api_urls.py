@@ -1,5 +1,5 @@
 from django.urls import path
-from . import api
+from . import api, stream
 
 app_name = 'dashboard_api'
 
@@ -7,7 +7,11 @@ urlpatterns = [
     path('market-overview/', api.market_overview, name='market_overview'),
     path('signals/', api.signals, name='signals'),
     path('sentiment/', api.sentiment, name='sentiment'),
+    path('sentiment/history/', api.sentiment_history, name='sentiment_history'),
+    path('indicators/<str:indicator_type>/history/', api.indicator_history, name='indicator_history'),
     path('price-data/<str:symbol>/', api.price_data, name='price_data'),
+    path('stream/', stream.market_stream, name='stream'),
+    path('provider-metrics/', api.provider_metrics, name='provider_metrics'),
 ]
 
 
@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand
+
+from dashboard.retention import SOURCES, compact, retention_config
+
+
+class Command(BaseCommand):
+    help = (
+        "Roll raw market indicator, sentiment and price rows older than DATA_RETENTION RAW_DAYS into "
+        "minute/hour/day rollups, delete them in batches, and prune expired rollups. Safe to run repeatedly "
+        "(e.g. daily from cron)."
+    )
+
+    def add_arguments(self, parser):
+        config = retention_config()
+        parser.add_argument('--raw-days', type=float, default=config['RAW_DAYS'],
+                            help='Keep raw rows this many days (default: DATA_RETENTION RAW_DAYS).')
+        parser.add_argument('--batch-size', type=int, default=config['BATCH_SIZE'],
+                            help='Raw rows aggregated and deleted per transaction.')
+        parser.add_argument('--source', action='append', choices=list(SOURCES),
+                            help='Only compact this table (repeatable; default: all).')
+
+    def handle(self, *args, **options):
+        report = compact(raw_days=options['raw_days'], batch_size=options['batch_size'], sources=options['source'])
+        for name, result in report.items():
+            pruned = ', '.join(f"{resolution}: {count}" for resolution, count in result['pruned'].items()) or 'none'
+            self.stdout.write(f"{name}: compacted {result['compacted']} raw rows, pruned rollups ({pruned})")
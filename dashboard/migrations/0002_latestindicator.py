@@ -0,0 +1,40 @@
+# Generated by Django 5.2.18 on 2026-10-17 03:11
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def backfill_snapshot(apps, schema_editor):
+    MarketIndicator = apps.get_model('dashboard', 'MarketIndicator')
+    LatestIndicator = apps.get_model('dashboard', 'LatestIndicator')
+    types = MarketIndicator.objects.values_list('indicator_type', flat=True).distinct()
+    for indicator_type in types:
+        latest = MarketIndicator.objects.filter(indicator_type=indicator_type).order_by('-timestamp').first()
+        LatestIndicator.objects.create(indicator_type=indicator_type, value=latest.value,
+                                       change_percent=latest.change_percent, timestamp=latest.timestamp,
+                                       source=latest)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dashboard', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LatestIndicator',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('indicator_type', models.CharField(choices=[('sp500', 'S&P 500'), ('btc', 'BTC/USD'), ('eth', 'ETH/USD'), ('ai_accuracy', 'AI Accuracy')], max_length=20, unique=True)),
+                ('value', models.DecimalField(decimal_places=2, max_digits=20)),
+                ('change_percent', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('timestamp', models.DateTimeField()),
+                ('source', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='dashboard.marketindicator')),
+            ],
+            options={
+                'ordering': ['indicator_type'],
+            },
+        ),
+        migrations.RunPython(backfill_snapshot, migrations.RunPython.noop),
+    ]
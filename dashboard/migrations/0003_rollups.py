@@ -0,0 +1,98 @@
+# Generated by Django 5.2.18 on 2026-10-17 03:16
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dashboard', '0002_latestindicator'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='IndicatorRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('resolution', models.CharField(choices=[('1m', '1 minute'), ('1h', '1 hour'), ('1d', '1 day')], max_length=4)),
+                ('bucket', models.DateTimeField(help_text='Start of the bucket (UTC)')),
+                ('open', models.DecimalField(decimal_places=2, max_digits=20)),
+                ('high', models.DecimalField(decimal_places=2, max_digits=20)),
+                ('low', models.DecimalField(decimal_places=2, max_digits=20)),
+                ('close', models.DecimalField(decimal_places=2, max_digits=20)),
+                ('count', models.PositiveIntegerField(default=0)),
+                ('indicator_type', models.CharField(choices=[('sp500', 'S&P 500'), ('btc', 'BTC/USD'), ('eth', 'ETH/USD'), ('ai_accuracy', 'AI Accuracy')], max_length=20)),
+                ('change_percent', models.DecimalField(decimal_places=2, help_text='Last reading in the bucket', max_digits=10)),
+            ],
+            options={
+                'ordering': ['bucket'],
+                'abstract': False,
+            },
+        ),
+        migrations.CreateModel(
+            name='PriceRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('resolution', models.CharField(choices=[('1m', '1 minute'), ('1h', '1 hour'), ('1d', '1 day')], max_length=4)),
+                ('bucket', models.DateTimeField(help_text='Start of the bucket (UTC)')),
+                ('open', models.DecimalField(decimal_places=2, max_digits=20)),
+                ('high', models.DecimalField(decimal_places=2, max_digits=20)),
+                ('low', models.DecimalField(decimal_places=2, max_digits=20)),
+                ('close', models.DecimalField(decimal_places=2, max_digits=20)),
+                ('count', models.PositiveIntegerField(default=0)),
+                ('volume', models.DecimalField(decimal_places=2, default=0, help_text='Last reading in the bucket', max_digits=20)),
+            ],
+            options={
+                'ordering': ['bucket'],
+                'abstract': False,
+            },
+        ),
+        migrations.CreateModel(
+            name='SentimentRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('resolution', models.CharField(choices=[('1m', '1 minute'), ('1h', '1 hour'), ('1d', '1 day')], max_length=4)),
+                ('bucket', models.DateTimeField(help_text='Start of the bucket (UTC)')),
+                ('open', models.DecimalField(decimal_places=2, max_digits=20)),
+                ('high', models.DecimalField(decimal_places=2, max_digits=20)),
+                ('low', models.DecimalField(decimal_places=2, max_digits=20)),
+                ('close', models.DecimalField(decimal_places=2, max_digits=20)),
+                ('count', models.PositiveIntegerField(default=0)),
+                ('level', models.CharField(choices=[('extreme_fear', 'Extreme Fear'), ('fear', 'Fear'), ('neutral', 'Neutral'), ('greed', 'Greed'), ('extreme_greed', 'Extreme Greed')], help_text='Last reading in the bucket', max_length=20)),
+            ],
+            options={
+                'ordering': ['bucket'],
+                'abstract': False,
+            },
+        ),
+        migrations.AddIndex(
+            model_name='marketsentiment',
+            index=models.Index(fields=['-timestamp'], name='dashboard_m_timesta_e365a6_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='indicatorrollup',
+            index=models.Index(fields=['resolution', 'bucket'], name='dashboard_i_resolut_8d1d2c_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='indicatorrollup',
+            constraint=models.UniqueConstraint(fields=('indicator_type', 'resolution', 'bucket'), name='uniq_indicator_rollup'),
+        ),
+        migrations.AddField(
+            model_name='pricerollup',
+            name='asset',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='price_rollups', to='dashboard.asset'),
+        ),
+        migrations.AddConstraint(
+            model_name='sentimentrollup',
+            constraint=models.UniqueConstraint(fields=('resolution', 'bucket'), name='uniq_sentiment_rollup'),
+        ),
+        migrations.AddIndex(
+            model_name='pricerollup',
+            index=models.Index(fields=['resolution', 'bucket'], name='dashboard_p_resolut_a37903_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='pricerollup',
+            constraint=models.UniqueConstraint(fields=('asset', 'resolution', 'bucket'), name='uniq_price_rollup'),
+        ),
+    ]
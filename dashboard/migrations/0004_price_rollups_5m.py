@@ -0,0 +1,59 @@
+# Generated by Django 5.2.18 on 2026-10-17 03:19
+
+from datetime import datetime, timezone
+
+from django.db import migrations, models
+
+RESOLUTION_SECONDS = {'1m': 60, '5m': 300, '1h': 3600, '1d': 86400}
+
+
+def backfill_price_rollups(apps, schema_editor):
+    """Roll up the PriceData rows still stored; from now on rollups are kept current on save."""
+    PriceData = apps.get_model('dashboard', 'PriceData')
+    PriceRollup = apps.get_model('dashboard', 'PriceRollup')
+    for asset_id in PriceData.objects.values_list('asset_id', flat=True).distinct().order_by():
+        rows = PriceData.objects.filter(asset_id=asset_id).order_by('timestamp', 'id').values_list(
+            'timestamp', 'price', 'volume')
+        buckets = {}
+        for timestamp, price, volume in rows.iterator():
+            for resolution, size in RESOLUTION_SECONDS.items():
+                bucket = datetime.fromtimestamp(int(timestamp.timestamp()) // size * size, tz=timezone.utc)
+                row = buckets.get((resolution, bucket))
+                if row is None:
+                    buckets[resolution, bucket] = PriceRollup(
+                        asset_id=asset_id, resolution=resolution, bucket=bucket, open=price, high=price,
+                        low=price, close=price, volume=volume, count=1)
+                else:
+                    row.high, row.low = max(row.high, price), min(row.low, price)
+                    row.close, row.volume = price, volume
+                    row.count += 1
+        # Buckets already written by compaction belong to rows that no longer exist.
+        existing = set(PriceRollup.objects.filter(asset_id=asset_id).values_list('resolution', 'bucket'))
+        PriceRollup.objects.bulk_create([row for key, row in buckets.items() if key not in existing],
+                                        batch_size=2000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dashboard', '0003_rollups'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='indicatorrollup',
+            name='resolution',
+            field=models.CharField(choices=[('1m', '1 minute'), ('5m', '5 minutes'), ('1h', '1 hour'), ('1d', '1 day')], max_length=4),
+        ),
+        migrations.AlterField(
+            model_name='pricerollup',
+            name='resolution',
+            field=models.CharField(choices=[('1m', '1 minute'), ('5m', '5 minutes'), ('1h', '1 hour'), ('1d', '1 day')], max_length=4),
+        ),
+        migrations.AlterField(
+            model_name='sentimentrollup',
+            name='resolution',
+            field=models.CharField(choices=[('1m', '1 minute'), ('5m', '5 minutes'), ('1h', '1 hour'), ('1d', '1 day')], max_length=4),
+        ),
+        migrations.RunPython(backfill_price_rollups, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,43 @@
+# Generated by Django 5.2.18 on 2026-10-17 03:52
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dashboard', '0004_price_rollups_5m'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='indicatorrollup',
+            name='first_at',
+            field=models.DateTimeField(blank=True, help_text='Time of the first reading in the bucket', null=True),
+        ),
+        migrations.AddField(
+            model_name='indicatorrollup',
+            name='last_at',
+            field=models.DateTimeField(blank=True, help_text='Time of the last reading in the bucket', null=True),
+        ),
+        migrations.AddField(
+            model_name='pricerollup',
+            name='first_at',
+            field=models.DateTimeField(blank=True, help_text='Time of the first reading in the bucket', null=True),
+        ),
+        migrations.AddField(
+            model_name='pricerollup',
+            name='last_at',
+            field=models.DateTimeField(blank=True, help_text='Time of the last reading in the bucket', null=True),
+        ),
+        migrations.AddField(
+            model_name='sentimentrollup',
+            name='first_at',
+            field=models.DateTimeField(blank=True, help_text='Time of the first reading in the bucket', null=True),
+        ),
+        migrations.AddField(
+            model_name='sentimentrollup',
+            name='last_at',
+            field=models.DateTimeField(blank=True, help_text='Time of the last reading in the bucket', null=True),
+        ),
+    ]
@@ -1,5 +1,9 @@
+import hashlib
+
 from django.db import models
 from django.contrib.auth.models import User
+from django.db.models.signals import post_save
+from django.dispatch import receiver
 
 
 class MarketIndicator(models.Model):
@@ -25,6 +29,54 @@ class MarketIndicator(models.Model):
         return f"{self.get_indicator_type_display()}: {self.value} ({self.change_percent}%)"
 
 
+class LatestIndicator(models.Model):
+    """Newest reading of each indicator type, one row per type.
+
+    Kept current on every MarketIndicator save, so the overview reads all
+    indicators in one query instead of one lookup per type.
+    """
+    indicator_type = models.CharField(max_length=20, choices=MarketIndicator.INDICATOR_TYPES, unique=True)
+    value = models.DecimalField(max_digits=20, decimal_places=2)
+    change_percent = models.DecimalField(max_digits=10, decimal_places=2)
+    timestamp = models.DateTimeField()
+    source = models.ForeignKey(MarketIndicator, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+
+    class Meta:
+        ordering = ['indicator_type']
+
+    def __str__(self):
+        return f"Latest {self.get_indicator_type_display()}: {self.value} ({self.change_percent}%)"
+
+    @classmethod
+    def snapshot(cls):
+        """All current readings keyed by indicator type, in one query."""
+        return {row.indicator_type: row for row in cls.objects.all()}
+
+    @staticmethod
+    def etag(snapshot) -> str:
+        """Version of a snapshot; changes whenever any reading changes."""
+        digest = hashlib.blake2b(digest_size=8)
+        for indicator_type in sorted(snapshot):
+            row = snapshot[indicator_type]
+            digest.update(f"{indicator_type}|{row.value}|{row.change_percent}|{row.timestamp.isoformat()};".encode())
+        return digest.hexdigest()
+
+
+@receiver(post_save, sender=MarketIndicator)
+def update_latest_indicator(sender, instance, **kwargs):
+    """Move the snapshot row of the saved indicator's type forward."""
+    # An older reading saved late must not replace a newer snapshot.
+    updated = LatestIndicator.objects.filter(
+        indicator_type=instance.indicator_type, timestamp__lte=instance.timestamp,
+    ).update(value=instance.value, change_percent=instance.change_percent,
+             timestamp=instance.timestamp, source=instance)
+    if not updated:
+        LatestIndicator.objects.get_or_create(indicator_type=instance.indicator_type, defaults={
+            'value': instance.value, 'change_percent': instance.change_percent,
+            'timestamp': instance.timestamp, 'source': instance,
+        })
+
+
 class Signal(models.Model):
     SIGNAL_TYPES = [
         ('LONG', 'Long'),
@@ -63,6 +115,9 @@ class MarketSentiment(models.Model):
     class Meta:
         ordering = ['-timestamp']
         get_latest_by = 'timestamp'
+        indexes = [
+            models.Index(fields=['-timestamp']),
+        ]
     
     def __str__(self):
         return f"Sentiment: {self.get_level_display()} ({self.score})"
@@ -103,3 +158,78 @@ class PriceData(models.Model):
     
     def __str__(self):
         return f"{self.asset.symbol} - {self.price} @ {self.timestamp}"
+
+
+class Rollup(models.Model):
+    """OHLC aggregate of the raw readings of one series in one time bucket.
+
+    Written by ``dashboard.retention.compact`` before raw rows are deleted
+    (price rollups by each market sync). Buckets are UTC-aligned;
+    ``count`` is the number of raw readings and ``first_at``/``last_at``
+    bound them, so readings merged out of order keep the right open and
+    close.
+    """
+    RESOLUTIONS = [
+        ('1m', '1 minute'),
+        ('5m', '5 minutes'),
+        ('1h', '1 hour'),
+        ('1d', '1 day'),
+    ]
+
+    resolution = models.CharField(max_length=4, choices=RESOLUTIONS)
+    bucket = models.DateTimeField(help_text="Start of the bucket (UTC)")
+    open = models.DecimalField(max_digits=20, decimal_places=2)
+    high = models.DecimalField(max_digits=20, decimal_places=2)
+    low = models.DecimalField(max_digits=20, decimal_places=2)
+    close = models.DecimalField(max_digits=20, decimal_places=2)
+    count = models.PositiveIntegerField(default=0)
+    first_at = models.DateTimeField(null=True, blank=True, help_text="Time of the first reading in the bucket")
+    last_at = models.DateTimeField(null=True, blank=True, help_text="Time of the last reading in the bucket")
+
+    class Meta:
+        abstract = True
+        ordering = ['bucket']
+
+
+class IndicatorRollup(Rollup):
+    indicator_type = models.CharField(max_length=20, choices=MarketIndicator.INDICATOR_TYPES)
+    change_percent = models.DecimalField(max_digits=10, decimal_places=2, help_text="Last reading in the bucket")
+
+    class Meta(Rollup.Meta):
+        constraints = [
+            models.UniqueConstraint(fields=['indicator_type', 'resolution', 'bucket'], name='uniq_indicator_rollup'),
+        ]
+        indexes = [
+            models.Index(fields=['resolution', 'bucket']),
+        ]
+
+    def __str__(self):
+        return f"{self.get_indicator_type_display()} {self.resolution} @ {self.bucket}: {self.close}"
+
+
+class SentimentRollup(Rollup):
+    level = models.CharField(max_length=20, choices=MarketSentiment.SENTIMENT_LEVELS, help_text="Last reading in the bucket")
+
+    class Meta(Rollup.Meta):
+        constraints = [
+            models.UniqueConstraint(fields=['resolution', 'bucket'], name='uniq_sentiment_rollup'),
+        ]
+
+    def __str__(self):
+        return f"Sentiment {self.resolution} @ {self.bucket}: {self.close}"
+
+
+class PriceRollup(Rollup):
+    asset = models.ForeignKey(Asset, on_delete=models.CASCADE, related_name='price_rollups')
+    volume = models.DecimalField(max_digits=20, decimal_places=2, default=0, help_text="Last reading in the bucket")
+
+    class Meta(Rollup.Meta):
+        constraints = [
+            models.UniqueConstraint(fields=['asset', 'resolution', 'bucket'], name='uniq_price_rollup'),
+        ]
+        indexes = [
+            models.Index(fields=['resolution', 'bucket']),
+        ]
+
+    def __str__(self):
+        return f"{self.asset.symbol} {self.resolution} @ {self.bucket}: {self.close}"
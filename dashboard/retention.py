@@ -0,0 +1,286 @@
+"""
+Retention for the append-only market history tables.
+
+``compact`` rolls raw ``MarketIndicator``, ``MarketSentiment`` and
+``PriceData`` rows older than ``RAW_DAYS`` into OHLC aggregates at 1
+minute, 5 minutes, 1 hour and 1 day (``IndicatorRollup``,
+``SentimentRollup``, ``PriceRollup``) and deletes them. Price rollups are
+instead kept current by the writer, one batch per market sync
+(``record_prices``), so charts can read any resolution of recent data
+too; compaction only deletes those raw rows. Each batch of raw rows is aggregated
+and deleted in one transaction, so an interrupted run loses nothing and
+the next run resumes where it stopped. Each rollup tier is then pruned
+after its own retention (``MINUTE_DAYS``, ``FIVE_MINUTE_DAYS``,
+``HOUR_DAYS``, ``DAY_DAYS``; ``None`` keeps a tier forever).
+
+The cutoff is aligned to a UTC day, so every bucket written is complete.
+A batch that lands in an existing bucket extends it; its open and close
+only replace the bucket's when its readings are earlier or later than the
+ones already there, so batches may arrive in any order.
+
+``history`` reads a series over a time range, using raw rows (or a
+chosen rollup tier) where they exist and the next coarser tier that
+covers the older part. ``choose_resolution`` picks the finest tier that
+fits a point budget and ``downsample`` thins the rest for charts.
+"""
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone as dt_timezone
+from decimal import Decimal
+from typing import Dict, Iterable, List, Optional
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from core.downsample import downsample_records
+
+from .models import (IndicatorRollup, MarketIndicator, MarketSentiment, PriceData, PriceRollup,
+                     SentimentRollup)
+
+RESOLUTION_SECONDS = {'1m': 60, '5m': 300, '1h': 3600, '1d': 86400}
+RETENTION_KEYS = {'1m': 'MINUTE_DAYS', '5m': 'FIVE_MINUTE_DAYS', '1h': 'HOUR_DAYS', '1d': 'DAY_DAYS'}
+TIERS = ['raw', *RESOLUTION_SECONDS]
+
+
+@dataclass(frozen=True)
+class Source:
+    raw: type
+    rollup: type
+    series_field: Optional[str]  # None for a single-series table
+    value_field: str
+    last_field: str  # carried over from the bucket's last reading
+    rolled_up_on_write: bool = False  # rollups kept current by the writer, not compaction
+
+
+SOURCES = {
+    'indicator': Source(MarketIndicator, IndicatorRollup, 'indicator_type', 'value', 'change_percent'),
+    'sentiment': Source(MarketSentiment, SentimentRollup, None, 'score', 'level'),
+    'price': Source(PriceData, PriceRollup, 'asset_id', 'price', 'volume', rolled_up_on_write=True),
+}
+
+
+def retention_config() -> Dict:
+    config = {'RAW_DAYS': 7, 'MINUTE_DAYS': 30, 'FIVE_MINUTE_DAYS': 90, 'HOUR_DAYS': 365, 'DAY_DAYS': None,
+              'BATCH_SIZE': 5000}
+    config.update(getattr(settings, 'DATA_RETENTION', {}))
+    return config
+
+
+def bucket_start(moment: datetime, resolution: str) -> datetime:
+    """Start of the UTC bucket of ``resolution`` containing ``moment``."""
+    size = RESOLUTION_SECONDS[resolution]
+    epoch = int(moment.timestamp()) // size * size
+    return datetime.fromtimestamp(epoch, tz=dt_timezone.utc)
+
+
+def _series_filter(source: Source, series) -> Dict:
+    return {source.series_field: series} if source.series_field else {}
+
+
+def _aggregate(rows, resolution: str) -> Dict[datetime, Dict]:
+    """OHLC per bucket of ``(timestamp, value, last)`` rows sorted by timestamp."""
+    buckets = {}
+    for timestamp, value, last in rows:
+        bucket = bucket_start(timestamp, resolution)
+        agg = buckets.get(bucket)
+        if agg is None:
+            buckets[bucket] = {'open': value, 'high': value, 'low': value, 'close': value, 'count': 1, 'last': last,
+                               'first_at': timestamp, 'last_at': timestamp}
+        else:
+            agg['high'] = max(agg['high'], value)
+            agg['low'] = min(agg['low'], value)
+            agg['close'] = value
+            agg['count'] += 1
+            agg['last'] = last
+            agg['last_at'] = timestamp
+    return buckets
+
+
+def _merge_rollups(source: Source, series, resolution: str, buckets: Dict[datetime, Dict], batch_size: int):
+    """Insert new buckets and extend existing ones.
+
+    An existing bucket takes the batch's open only if the batch starts
+    earlier, and its close and last value only if the batch ends later.
+    Rows written before reading times were tracked count as older.
+    """
+    rollup = source.rollup
+    existing = {row.bucket: row for row in rollup.objects.filter(
+        resolution=resolution, bucket__in=list(buckets), **_series_filter(source, series))}
+    create, update = [], []
+    for bucket, agg in buckets.items():
+        row = existing.get(bucket)
+        if row is None:
+            create.append(rollup(resolution=resolution, bucket=bucket, open=agg['open'], high=agg['high'],
+                                 low=agg['low'], close=agg['close'], count=agg['count'], first_at=agg['first_at'],
+                                 last_at=agg['last_at'], **{source.last_field: agg['last']},
+                                 **_series_filter(source, series)))
+            continue
+        if row.first_at is not None and agg['first_at'] < row.first_at:
+            row.open = agg['open']
+            row.first_at = agg['first_at']
+        if row.last_at is None or agg['last_at'] >= row.last_at:
+            row.close = agg['close']
+            row.last_at = agg['last_at']
+            setattr(row, source.last_field, agg['last'])
+        row.high = max(row.high, Decimal(agg['high']))
+        row.low = min(row.low, Decimal(agg['low']))
+        row.count += agg['count']
+        update.append(row)
+    rollup.objects.bulk_create(create, batch_size=batch_size)
+    rollup.objects.bulk_update(update, ['open', 'high', 'low', 'close', 'count', 'first_at', 'last_at',
+                                        source.last_field], batch_size=batch_size)
+
+
+def _compact_series(source: Source, series, cutoff: datetime, batch_size: int) -> int:
+    raw = source.raw.objects.filter(timestamp__lt=cutoff, **_series_filter(source, series)).order_by('timestamp', 'id')
+    compacted = 0
+    while True:
+        batch = list(raw.values_list('id', 'timestamp', source.value_field, source.last_field)[:batch_size])
+        if not batch:
+            return compacted
+        rows = [(timestamp, value, last) for _, timestamp, value, last in batch]
+        with transaction.atomic():
+            if not source.rolled_up_on_write:
+                for resolution in RESOLUTION_SECONDS:
+                    _merge_rollups(source, series, resolution, _aggregate(rows, resolution), batch_size)
+            source.raw.objects.filter(id__in=[row[0] for row in batch]).delete()
+        compacted += len(batch)
+
+
+def record_prices(prices: Iterable[PriceData]):
+    """Fold newly saved PriceData rows into their assets' rollups at every resolution.
+
+    Called once per batch of writes, so a sync costs one read and one
+    write per asset and resolution rather than per row.
+    """
+    source = SOURCES['price']
+    by_asset = {}
+    for price_data in prices:
+        by_asset.setdefault(price_data.asset_id, []).append(
+            (price_data.timestamp, Decimal(str(price_data.price)), Decimal(str(price_data.volume))))
+    batch_size = retention_config()['BATCH_SIZE']
+    for asset_id, rows in by_asset.items():
+        rows.sort(key=lambda row: row[0])
+        for resolution in RESOLUTION_SECONDS:
+            _merge_rollups(source, asset_id, resolution, _aggregate(rows, resolution), batch_size)
+
+
+def _prune(rollup, resolution: str, cutoff: datetime, batch_size: int) -> int:
+    stale = rollup.objects.filter(resolution=resolution, bucket__lt=cutoff).order_by('bucket')
+    pruned = 0
+    while True:
+        ids = list(stale.values_list('id', flat=True)[:batch_size])
+        if not ids:
+            return pruned
+        rollup.objects.filter(id__in=ids).delete()
+        pruned += len(ids)
+
+
+def compact(now: Optional[datetime] = None, raw_days: Optional[float] = None,
+            batch_size: Optional[int] = None, sources=None) -> Dict[str, Dict]:
+    """Roll up and delete old raw rows, then prune expired rollups.
+
+    Returns per source the number of raw rows compacted and rollups
+    pruned per resolution.
+    """
+    config = retention_config()
+    now = now or timezone.now()
+    raw_days = config['RAW_DAYS'] if raw_days is None else raw_days
+    batch_size = batch_size or config['BATCH_SIZE']
+    cutoff = bucket_start(now - timedelta(days=raw_days), '1d')
+
+    report = {}
+    for name in sources or SOURCES:
+        source = SOURCES[name]
+        old = source.raw.objects.filter(timestamp__lt=cutoff)
+        series_values = (old.values_list(source.series_field, flat=True).distinct().order_by()
+                         if source.series_field else [None])
+        compacted = sum(_compact_series(source, series, cutoff, batch_size) for series in list(series_values))
+
+        pruned = {}
+        for resolution, key in RETENTION_KEYS.items():
+            if config[key] is not None:
+                pruned[resolution] = _prune(source.rollup, resolution, now - timedelta(days=config[key]), batch_size)
+        report[name] = {'compacted': compacted, 'pruned': pruned}
+    return report
+
+
+def _plain(value):
+    return float(value) if isinstance(value, Decimal) else value
+
+
+def history(name: str, since: datetime, until: Optional[datetime] = None, series=None,
+            resolution: str = 'raw') -> List[Dict]:
+    """Readings of one series in ``[since, until)``, oldest first.
+
+    Starts from ``resolution`` (``'raw'`` by default, or a rollup
+    resolution) and covers the span before its oldest point with the next
+    coarser tier that has data. Every point has ``timestamp``,
+    ``resolution``, ``open``/``high``/``low``/``close`` and the source's
+    last-value field (``change_percent``, ``level`` or ``volume``). For
+    ``'indicator'`` ``series`` is the indicator type, for ``'price'`` the
+    asset id.
+    """
+    source = SOURCES[name]
+    until = until or timezone.now()
+    where = _series_filter(source, series)
+    tiers = TIERS[TIERS.index(resolution):]
+
+    points = []
+    if tiers[0] == 'raw':
+        raw = source.raw.objects.filter(timestamp__gte=since, timestamp__lt=until, **where).order_by('timestamp')
+        points = [{
+            'timestamp': timestamp, 'resolution': 'raw',
+            'open': _plain(value), 'high': _plain(value), 'low': _plain(value), 'close': _plain(value),
+            source.last_field: _plain(last),
+        } for timestamp, value, last in raw.values_list('timestamp', source.value_field, source.last_field)]
+        tiers = tiers[1:]
+
+    covered = points[0]['timestamp'] if points else until
+    for tier in tiers:
+        if covered <= since:
+            break
+        rollups = source.rollup.objects.filter(resolution=tier, bucket__gte=bucket_start(since, tier), **where)
+        if covered == until:
+            rollups = rollups.filter(bucket__lt=until)
+        else:
+            # Only buckets that end before the finer data starts, so nothing overlaps.
+            rollups = rollups.filter(bucket__lte=covered - timedelta(seconds=RESOLUTION_SECONDS[tier]))
+        rows = list(rollups.order_by('bucket').values('bucket', 'open', 'high', 'low', 'close', source.last_field))
+        if not rows:
+            continue
+        points[:0] = [{
+            'timestamp': row['bucket'], 'resolution': tier,
+            'open': _plain(row['open']), 'high': _plain(row['high']), 'low': _plain(row['low']),
+            'close': _plain(row['close']), source.last_field: _plain(row[source.last_field]),
+        } for row in rows]
+        covered = rows[0]['bucket']
+    return points
+
+
+def choose_resolution(name: str, since: datetime, until: Optional[datetime] = None, series=None,
+                      max_points: int = 500) -> str:
+    """Finest tier whose points in ``[since, until)`` fit in ``max_points``.
+
+    Raw rows are counted; rollup tiers are estimated from the span, which
+    is an upper bound. Falls back to the coarsest tier.
+    """
+    source = SOURCES[name]
+    until = until or timezone.now()
+    raw_count = source.raw.objects.filter(timestamp__gte=since, timestamp__lt=until,
+                                          **_series_filter(source, series)).count()
+    if raw_count <= max_points:
+        return 'raw'
+    span = (until - since).total_seconds()
+    for tier, size in RESOLUTION_SECONDS.items():
+        if span / size <= max_points:
+            return tier
+    return TIERS[-1]
+
+
+def downsample(points: List[Dict], max_points: Optional[int]) -> List[Dict]:
+    """``history`` points thinned with LTTB on the close to at most ``max_points``."""
+    if not max_points or len(points) <= max_points:
+        return points
+    return downsample_records([{**p, 'epoch': p['timestamp'].timestamp()} for p in points], 'close',
+                              max_points, x_key='epoch')
@@ -0,0 +1,214 @@
+"""
+Server-Sent Events stream of dashboard updates.
+
+``market_stream`` holds one long-lived connection per client and pushes
+four kinds of events from the process-wide ``core.pubsub`` broker:
+``indicator`` (a market indicator whose value changed), ``signal`` (a
+new Signal), ``sentiment`` (a changed sentiment reading) and ``alert``
+(a new PatternAlert). This replaces each tab's periodic polling.
+
+Events reach the broker two ways. ``DataSyncService`` publishes as soon
+as its writes commit, when ingestion runs in this process. ``MarketFeed``
+is one thread per web process that checks the tables for new rows while
+any client is connected, which covers writes from other processes. That
+is a few queries per interval per process, however many clients there
+are.
+
+Streaming needs an ASGI server (see README). Under WSGI the endpoint
+answers 204, so EventSource stops and the page falls back to polling.
+"""
+import json
+import threading
+import time
+from typing import Dict, Optional
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.handlers.asgi import ASGIRequest
+from django.db import close_old_connections
+from django.http import HttpResponse, StreamingHttpResponse
+
+from core.pubsub import get_broker
+
+CHANNELS = ('indicator', 'signal', 'sentiment', 'alert')
+
+
+def stream_config() -> Dict:
+    config = {'POLL_SECONDS': 2.0, 'HEARTBEAT_SECONDS': 15.0, 'RETRY_MS': 5000}
+    config.update(getattr(settings, 'LIVE_STREAM', {}))
+    return config
+
+
+# -- event payloads (same shapes as the polling endpoints) --------------------
+
+def publish_indicator(indicator):
+    data = {
+        'type': indicator.indicator_type,
+        'value': float(indicator.value),
+        'change_percent': float(indicator.change_percent),
+        'timestamp': indicator.timestamp.isoformat(),
+    }
+    get_broker().publish('indicator', data, key=('indicator', data['type']),
+                         state=(data['value'], data['change_percent']))
+
+
+def publish_sentiment(sentiment):
+    data = {'score': sentiment.score, 'level': sentiment.level, 'timestamp': sentiment.timestamp.isoformat()}
+    get_broker().publish('sentiment', data, key='sentiment', state=(data['score'], data['level']))
+
+
+def publish_signal(signal):
+    get_broker().publish('signal', {
+        'id': signal.id,
+        'asset': signal.asset,
+        'signal_type': signal.signal_type,
+        'entry_price': float(signal.entry_price) if signal.entry_price else None,
+        'target_price': float(signal.target_price) if signal.target_price else None,
+        'confidence': signal.confidence,
+        'notes': signal.notes,
+        'created_at': signal.created_at.isoformat(),
+    })
+
+
+def publish_alert(alert):
+    get_broker().publish('alert', {
+        'id': alert.id,
+        'alert_type': alert.alert_type,
+        'asset': alert.asset.symbol if alert.asset else None,
+        'message': alert.message,
+        'confidence': alert.confidence,
+        'created_at': alert.created_at.isoformat(),
+    })
+
+
+# -- DB feed --------------------------------------------------------------------
+
+class MarketFeed:
+    """Publishes rows added since the last check, while anyone is subscribed."""
+
+    BATCH = 100
+
+    def __init__(self):
+        from dashboard.models import MarketIndicator, MarketSentiment, Signal
+        from patterns.models import PatternAlert
+
+        self.sources = {
+            'indicator': MarketIndicator,
+            'sentiment': MarketSentiment,
+            'signal': Signal,
+            'alert': PatternAlert,
+        }
+        # Only rows written after the feed starts are news.
+        self.skip_to_latest()
+
+    def skip_to_latest(self):
+        """Treat every row written so far as already published."""
+        self.last_ids = {name: model.objects.order_by('-id').values_list('id', flat=True).first() or 0
+                         for name, model in self.sources.items()}
+
+    def poll(self) -> int:
+        """Publish new rows once; returns how many rows were seen."""
+        seen = 0
+        for name, model in self.sources.items():
+            queryset = model.objects.select_related('asset') if name == 'alert' else model.objects
+            rows = list(queryset.filter(id__gt=self.last_ids[name]).order_by('id')[:self.BATCH])
+            if not rows:
+                continue
+            seen += len(rows)
+            self.last_ids[name] = rows[-1].id
+            if name == 'indicator':
+                # Only the newest reading per indicator matters.
+                for row in {row.indicator_type: row for row in rows}.values():
+                    publish_indicator(row)
+            elif name == 'sentiment':
+                publish_sentiment(rows[-1])
+            elif name == 'signal':
+                for row in rows:
+                    publish_signal(row)
+            else:
+                for row in rows:
+                    publish_alert(row)
+        return seen
+
+    def run(self, poll_seconds: float, log=print):
+        """Poll every ``poll_seconds`` while anyone is subscribed, forever.
+
+        Nothing is queried while nobody listens; the first subscriber after
+        an idle spell starts from the rows current at that point, not from
+        everything written meanwhile. A failing poll is logged once, and
+        again when polling recovers.
+        """
+        broker = get_broker()
+        idle, failing = False, False
+        while True:
+            time.sleep(poll_seconds)
+            if not broker.subscriber_count:
+                idle = True
+                continue
+            close_old_connections()
+            try:
+                if idle:
+                    self.skip_to_latest()
+                    idle = False
+                else:
+                    self.poll()
+            except Exception as e:
+                if not failing:
+                    log(f"Market feed poll failed: {e}")
+                failing = True
+            else:
+                if failing:
+                    log("Market feed poll recovered")
+                failing = False
+
+
+_feed: Optional[MarketFeed] = None
+_feed_lock = threading.Lock()
+
+
+def ensure_feed():
+    """Start this process's feed thread on first use."""
+    global _feed
+    with _feed_lock:
+        if _feed is None:
+            _feed = MarketFeed()
+            threading.Thread(target=_feed.run, args=(stream_config()['POLL_SECONDS'],),
+                             name='market-feed', daemon=True).start()
+
+
+# -- SSE view ------------------------------------------------------------------
+
+def format_event(event: Dict) -> str:
+    return f"id: {event['id']}\nevent: {event['channel']}\ndata: {json.dumps(event['data'])}\n\n"
+
+
+async def _events(channels, last_event_id, config):
+    subscription = get_broker().subscribe(channels, last_event_id)
+    try:
+        yield f"retry: {config['RETRY_MS']}\n\n"
+        while True:
+            event = await subscription.get(timeout=config['HEARTBEAT_SECONDS'])
+            # A comment line keeps proxies from closing an idle connection.
+            yield format_event(event) if event is not None else ": keepalive\n\n"
+    finally:
+        subscription.close()
+
+
+async def market_stream(request):
+    """SSE endpoint; ``?channels=indicator,signal`` limits the event types."""
+    if not isinstance(request, ASGIRequest):
+        return HttpResponse(status=204)
+
+    channels = [c for c in request.GET.get('channels', '').split(',') if c in CHANNELS] or None
+    try:
+        last_event_id = int(request.headers.get('Last-Event-ID') or '')
+    except ValueError:
+        last_event_id = None
+
+    config = stream_config()
+    if _feed is None:
+        await sync_to_async(ensure_feed)()
+    response = StreamingHttpResponse(_events(channels, last_event_id, config), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
@@ -1,3 +1,273 @@
-from django.test import TestCase
+import asyncio
+import json
+from io import StringIO
+from datetime import datetime, timedelta, timezone as dt_timezone
+from decimal import Decimal
+from unittest import mock
 
-# Create your tests here.
+from asgiref.sync import sync_to_async
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.utils.timezone import now as timezone_now
+
+from core import pubsub
+from patterns.models import PatternAlert
+from . import retention, stream
+from .models import (Asset, IndicatorRollup, LatestIndicator, MarketIndicator, MarketSentiment, PriceData,
+                     PriceRollup, SentimentRollup, Signal)
+
+
+class MarketStreamTests(TestCase):
+    def setUp(self):
+        pubsub._default_broker = pubsub.Broker()
+        MarketIndicator.objects.create(indicator_type='btc', value=100, change_percent=1)
+
+    def test_feed_publishes_only_new_rows_and_changed_values(self):
+        feed = stream.MarketFeed()
+        self.assertEqual(feed.poll(), 0)
+
+        asset = Asset.objects.create(symbol='BTC/USD', name='Bitcoin', asset_type='crypto')
+        MarketIndicator.objects.create(indicator_type='btc', value=101, change_percent=1)
+        MarketIndicator.objects.create(indicator_type='btc', value=102, change_percent=2)
+        MarketSentiment.objects.create(score=70, level='greed')
+        Signal.objects.create(asset='BTC/USD', signal_type='LONG', confidence=80)
+        PatternAlert.objects.create(alert_type='pattern', asset=asset, message='Doji', confidence=70)
+        self.assertEqual(feed.poll(), 5)
+
+        MarketIndicator.objects.create(indicator_type='btc', value=102, change_percent=2)
+        feed.poll()
+
+        events = list(pubsub.get_broker()._history)
+        self.assertEqual([e['channel'] for e in events], ['indicator', 'sentiment', 'signal', 'alert'])
+        self.assertEqual(events[0]['data']['value'], 102.0)
+        self.assertEqual(events[3]['data']['asset'], 'BTC/USD')
+
+    def run_feed(self, feed, steps, listeners=0):
+        """Run ``feed`` for one poll interval per step; each step runs during the sleep."""
+        state = {'listeners': listeners}
+        steps = iter(steps)
+        log = mock.Mock()
+        with mock.patch('dashboard.stream.time.sleep', lambda _: next(steps)(state)), \
+                mock.patch.object(pubsub.Broker, 'subscriber_count', property(lambda _: state['listeners'])), \
+                mock.patch('dashboard.stream.close_old_connections'):
+            with self.assertRaises(StopIteration):
+                feed.run(0, log=log)
+        return log
+
+    def test_feed_does_not_replay_rows_written_while_idle(self):
+        feed = stream.MarketFeed()
+
+        def write_while_idle(state):
+            for i in range(3):
+                MarketIndicator.objects.create(indicator_type='btc', value=101 + i, change_percent=1)
+
+        def subscribe(state):
+            state['listeners'] = 1
+
+        def write(state):
+            MarketIndicator.objects.create(indicator_type='eth', value=5, change_percent=1)
+
+        log = self.run_feed(feed, [write_while_idle, subscribe, write])
+        self.assertEqual([e['data']['type'] for e in pubsub.get_broker()._history], ['eth'])
+        log.assert_not_called()
+
+    def test_feed_logs_a_failing_poll_once(self):
+        feed = stream.MarketFeed()
+        feed.poll = mock.Mock(side_effect=[RuntimeError('db down'), RuntimeError('db down'), 0])
+        log = self.run_feed(feed, [lambda state: None] * 3, listeners=1)
+        self.assertEqual(feed.poll.call_count, 3)
+        self.assertEqual([c.args[0] for c in log.call_args_list],
+                         ['Market feed poll failed: db down', 'Market feed poll recovered'])
+
+    def test_wsgi_requests_are_told_to_poll(self):
+        self.assertEqual(self.client.get('/api/dashboard/stream/').status_code, 204)
+
+    def test_asgi_stream_delivers_published_events(self):
+        stream._feed = object()  # don't start the feed thread
+
+        async def scenario():
+            response = await self.async_client.get('/api/dashboard/stream/?channels=sentiment',
+                                                   HTTP_LAST_EVENT_ID='0')
+            self.assertEqual(response['Content-Type'], 'text/event-stream')
+            chunks = aiter(response.streaming_content)
+            self.assertTrue((await anext(chunks)).startswith(b'retry:'))
+
+            broker = pubsub.get_broker()
+            pending = asyncio.ensure_future(anext(chunks))
+            await asyncio.sleep(0)
+            await sync_to_async(broker.publish)('signal', {'id': 1})
+            await sync_to_async(broker.publish)('sentiment', {'score': 40, 'level': 'fear'})
+            chunk = (await asyncio.wait_for(pending, 5)).decode()
+            await chunks.aclose()
+            return chunk
+
+        try:
+            chunk = asyncio.run(scenario())
+        finally:
+            stream._feed = None
+        self.assertIn('event: sentiment', chunk)
+        self.assertEqual(json.loads(chunk.split('data: ')[1]), {'score': 40, 'level': 'fear'})
+
+
+class LatestIndicatorTests(TestCase):
+    def test_snapshot_follows_writes(self):
+        older = MarketIndicator.objects.create(indicator_type='btc', value=100, change_percent=1)
+        newest = MarketIndicator.objects.create(indicator_type='btc', value=105, change_percent=2)
+        MarketIndicator.objects.create(indicator_type='eth', value=10, change_percent=-1)
+        # Re-saving an older reading does not replace the newer snapshot.
+        older.timestamp = newest.timestamp - timedelta(minutes=1)
+        older.value = 90
+        older.save()
+
+        with self.assertNumQueries(1):
+            snapshot = LatestIndicator.snapshot()
+        self.assertEqual(sorted(snapshot), ['btc', 'eth'])
+        self.assertEqual((snapshot['btc'].value, snapshot['btc'].source_id), (105, newest.pk))
+
+    def test_market_overview_etag(self):
+        MarketIndicator.objects.create(indicator_type='btc', value=100, change_percent=1)
+        with self.assertNumQueries(1):
+            first = self.client.get('/api/dashboard/market-overview/')
+        self.assertEqual(first.json()['btc']['value'], 100.0)
+
+        etag = first['ETag']
+        self.assertEqual(self.client.get('/api/dashboard/market-overview/', HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+        MarketIndicator.objects.create(indicator_type='btc', value=101, change_percent=1)
+        changed = self.client.get('/api/dashboard/market-overview/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(changed.status_code, 200)
+        self.assertNotEqual(changed['ETag'], etag)
+
+
+@override_settings(DATA_RETENTION={'RAW_DAYS': 7, 'MINUTE_DAYS': 30, 'FIVE_MINUTE_DAYS': 90, 'HOUR_DAYS': 365,
+                                   'DAY_DAYS': None})
+class RetentionTests(TestCase):
+    now = datetime(2026, 3, 20, 12, 0, tzinfo=dt_timezone.utc)
+
+    def setUp(self):
+        self.asset = Asset.objects.create(symbol='BTC/USD', name='Bitcoin', asset_type='crypto')
+
+    def add_indicator(self, moment, value):
+        row = MarketIndicator.objects.create(indicator_type='btc', value=value, change_percent=value / 100)
+        MarketIndicator.objects.filter(pk=row.pk).update(timestamp=moment)
+
+    def test_compact_rolls_up_and_deletes_old_rows(self):
+        old = datetime(2026, 3, 1, 10, 0, tzinfo=dt_timezone.utc)
+        for i, value in enumerate([100, 104, 98, 101]):
+            self.add_indicator(old + timedelta(seconds=20 * i), value)
+        self.add_indicator(self.now - timedelta(hours=1), 110)
+        retention.record_prices([
+            PriceData.objects.create(asset=self.asset, price=price, volume=7 + i, timestamp=old + timedelta(hours=i))
+            for i, price in enumerate([50, 55])])
+        sentiment = MarketSentiment.objects.create(score=40, level='fear')
+        MarketSentiment.objects.filter(pk=sentiment.pk).update(timestamp=old)
+
+        report = retention.compact(now=self.now, batch_size=3)
+
+        self.assertEqual({name: r['compacted'] for name, r in report.items()},
+                         {'indicator': 4, 'sentiment': 1, 'price': 2})
+        self.assertEqual(list(MarketIndicator.objects.values_list('value', flat=True)), [Decimal('110.00')])
+        self.assertFalse(PriceData.objects.exists())
+        # The two minute buckets were written across batches and merged.
+        minutes = IndicatorRollup.objects.filter(resolution='1m').order_by('bucket')
+        self.assertEqual([(r.open, r.high, r.low, r.close, r.count) for r in minutes],
+                         [(100, 104, 98, 98, 3), (101, 101, 101, 101, 1)])
+        hour = IndicatorRollup.objects.get(resolution='1h')
+        self.assertEqual((hour.open, hour.high, hour.low, hour.close, hour.count, hour.change_percent),
+                         (100, 104, 98, 101, 4, Decimal('1.01')))
+        self.assertEqual(PriceRollup.objects.filter(resolution='1h').count(), 2)
+        self.assertEqual(SentimentRollup.objects.get(resolution='1d').level, 'fear')
+
+        # Running again finds nothing left to do.
+        self.assertEqual(retention.compact(now=self.now)['indicator']['compacted'], 0)
+
+    def test_merge_keeps_open_and_close_in_time_order(self):
+        start = datetime(2026, 3, 1, 10, 0, tzinfo=dt_timezone.utc)
+        rows = [(start + timedelta(minutes=i), Decimal(value), Decimal(i)) for i, value in enumerate([100, 90, 120, 110])]
+        source = retention.SOURCES['indicator']
+        # The later half of the hour is merged first.
+        for batch in (rows[2:], rows[:2]):
+            retention._merge_rollups(source, 'btc', '1h', retention._aggregate(batch, '1h'), batch_size=10)
+
+        hour = IndicatorRollup.objects.get(resolution='1h')
+        self.assertEqual((hour.open, hour.high, hour.low, hour.close, hour.count, hour.change_percent),
+                         (100, 120, 90, 110, 4, 3))
+        self.assertEqual((hour.first_at, hour.last_at), (start, start + timedelta(minutes=3)))
+
+    def test_prune_expired_tiers(self):
+        for resolution in ('1m', '1h', '1d'):
+            PriceRollup.objects.create(asset=self.asset, resolution=resolution, bucket=self.now - timedelta(days=60),
+                                       open=1, high=1, low=1, close=1, count=1)
+        report = retention.compact(now=self.now, sources=['price'])
+        self.assertEqual(report['price']['pruned'], {'1m': 1, '5m': 0, '1h': 0})
+        self.assertEqual(sorted(PriceRollup.objects.values_list('resolution', flat=True)), ['1d', '1h'])
+
+    def test_history_stitches_raw_and_rollups(self):
+        old = self.now - timedelta(days=10)
+        retention.record_prices([
+            PriceData.objects.create(asset=self.asset, price=50, volume=1, timestamp=old),
+            PriceData.objects.create(asset=self.asset, price=60, volume=2, timestamp=old + timedelta(minutes=90)),
+        ])
+        retention.compact(now=self.now)
+        PriceData.objects.create(asset=self.asset, price=70, volume=3, timestamp=self.now - timedelta(hours=2))
+
+        points = retention.history('price', self.now - timedelta(days=11), until=self.now, series=self.asset.id)
+        self.assertEqual([(p['resolution'], p['close']) for p in points], [('1m', 50.0), ('1m', 60.0), ('raw', 70.0)])
+
+        # Once minute rollups expire, the next tier covers that span.
+        PriceRollup.objects.filter(resolution__in=['1m', '5m']).delete()
+        points = retention.history('price', self.now - timedelta(days=11), until=self.now, series=self.asset.id)
+        self.assertEqual([(p['resolution'], p['close']) for p in points], [('1h', 50.0), ('1h', 60.0), ('raw', 70.0)])
+
+    def test_command(self):
+        self.add_indicator(timezone_now() - timedelta(days=20), 100)
+        out = StringIO()
+        call_command('compact_market_data', '--source', 'indicator', stdout=out)
+        self.assertIn('indicator: compacted 1 raw rows', out.getvalue())
+        self.assertEqual(IndicatorRollup.objects.count(), 4)
+
+
+class PriceResolutionTests(TestCase):
+    def setUp(self):
+        self.asset = Asset.objects.create(symbol='BTC', name='Bitcoin', asset_type='crypto')
+        self.start = retention.bucket_start(timezone_now() - timedelta(hours=3), '1h')
+        # One price a minute for two hours, rolled up as one sync batch.
+        self.prices = PriceData.objects.bulk_create([
+            PriceData(asset=self.asset, price=100 + i % 7, volume=i, timestamp=self.start + timedelta(minutes=i))
+            for i in range(120)])
+        retention.record_prices(reversed(self.prices))
+
+    def test_record_prices_rolls_up_a_batch(self):
+        self.assertEqual(PriceRollup.objects.filter(resolution='1m').count(), 120)
+        self.assertEqual(PriceRollup.objects.filter(resolution='5m').count(), 24)
+        first_hour = PriceRollup.objects.get(resolution='1h', bucket=self.start)
+        self.assertEqual((first_hour.open, first_hour.high, first_hour.low, first_hour.close, first_hour.count),
+                         (100, 106, 100, 100 + 59 % 7, 60))
+        self.assertEqual(first_hour.volume, 59)
+
+    def test_choose_resolution(self):
+        since = self.start - timedelta(minutes=1)
+        self.assertEqual(retention.choose_resolution('price', since, series=self.asset.id, max_points=500), 'raw')
+        self.assertEqual(retention.choose_resolution('price', since, series=self.asset.id, max_points=60), '5m')
+        self.assertEqual(retention.choose_resolution('price', since, series=self.asset.id, max_points=2), '1d')
+
+    def test_price_data_api(self):
+        url = f'/api/dashboard/price-data/{self.asset.symbol}/?hours=4'
+        self.assertEqual(len(self.client.get(url).json()), 120)
+
+        points = self.client.get(url + '&max_points=60').json()
+        self.assertEqual({p['resolution'] for p in points}, {'5m'})
+        self.assertEqual(len(points), 24)
+
+        points = self.client.get(url + '&resolution=1h').json()
+        self.assertEqual([(p['resolution'], p['high']) for p in points], [('1h', 106.0), ('1h', 106.0)])
+        self.assertEqual(self.client.get(url + '&resolution=2h').status_code, 400)
+        for bad in ('&max_points=abc', '&max_points=1.5', '&hours=abc', '&hours=-1', '&hours=inf'):
+            response = self.client.get(url + bad)
+            self.assertEqual(response.status_code, 400)
+            self.assertIn('max_points', response.json()['error'])
+
+        # A tier still over budget is thinned with LTTB.
+        points = self.client.get(url + '&resolution=1m&max_points=50').json()
+        self.assertEqual(len(points), 50)
+        self.assertEqual(points[0]['timestamp'], self.start.isoformat())
@@ -2,26 +2,18 @@ from django.shortcuts import render, get_object_or_404
 from django.contrib.auth.decorators import login_required
 from django.utils import timezone
 from datetime import timedelta
-from .models import MarketIndicator, Signal, MarketSentiment, Asset, PriceData
-from core.data_fetchers import DataSyncService
+from . import retention
+from .models import LatestIndicator, Signal, MarketSentiment, Asset
+
+# Price points drawn on the asset detail chart
+CHART_MAX_POINTS = 300
 
 
 @login_required
 def overview(request):
     """Main market overview dashboard"""
-    # Sync latest data
-    try:
-        DataSyncService.sync_market_indicators()
-        DataSyncService.sync_sentiment()
-    except Exception as e:
-        print(f"Error syncing data: {e}")
-    
-    # Get latest indicators
-    indicators = {}
-    for indicator_type in ['sp500', 'btc', 'eth', 'ai_accuracy']:
-        latest = MarketIndicator.objects.filter(indicator_type=indicator_type).first()
-        if latest:
-            indicators[indicator_type] = latest
+    # Get latest indicators (kept fresh by the `ingest_market_data` command)
+    indicators = LatestIndicator.snapshot()
     
     # Get latest signals (last 10)
     signals = Signal.objects.all()[:10]
@@ -46,12 +38,12 @@ def asset_detail(request, symbol):
     """Asset detail view with chart"""
     asset = get_object_or_404(Asset, symbol=symbol)
     
-    # Get price data for chart (last 24 hours)
+    # Get price data for chart (last 24 hours, at the finest resolution that fits the chart)
     since = timezone.now() - timedelta(hours=24)
-    price_data = PriceData.objects.filter(
-        asset=asset,
-        timestamp__gte=since
-    ).order_by('timestamp')[:100]
+    resolution = retention.choose_resolution('price', since, series=asset.id, max_points=CHART_MAX_POINTS)
+    points = retention.downsample(retention.history('price', since, series=asset.id, resolution=resolution),
+                                  CHART_MAX_POINTS)
+    price_data = [{'timestamp': p['timestamp'], 'price': p['close']} for p in points]
     
     # Get latest forecast if exists
     from forecast.models import Forecast
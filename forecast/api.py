@@ -2,15 +2,18 @@ from rest_framework.decorators import api_view, permission_classes
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 from rest_framework import status
-from django.utils import timezone
 from dashboard.models import Asset
-from core.data_fetchers import CryptoDataFetcher
-from core.ml_baseline import MLForecastBaseline
-from .models import Forecast, ForecastPoint, Pattern
+from .models import Forecast
 from django.contrib.auth.models import User
 from core.backtester import run_backtest
-from .models import BacktestRun, TradeLog, EquityPoint
+from core.sweep import run_sweep
+from core.cache import cache_stats
+from .models import BacktestRun
+from .persistence import forecast_payload, persistence_config, save_backtest_results, save_forecast
+from .services import BacktestQueue, downsample_backtest, forecast_prediction, load_backtest_candles
 from django.conf import settings
+from django.db import transaction
+from django.urls import reverse
 from decimal import Decimal
 
 
@@ -32,75 +35,13 @@ def run_forecast_api(request):
     except Asset.DoesNotExist:
         return Response({'error': 'Asset not found'}, status=status.HTTP_404_NOT_FOUND)
 
-    symbol_map = {
-        'BTC/USD': 'bitcoin',
-        'ETH/USD': 'ethereum',
-    }
-    crypto_symbol = symbol_map.get(asset_symbol, 'bitcoin')
-
-    historical = CryptoDataFetcher.get_historical_data(crypto_symbol, days=30)
-    if not historical:
-        prices = [float(asset.current_price)]
-        timestamps = [timezone.now()]
-    else:
-        prices = [float(p['price']) for p in historical]
-        timestamps = [p['timestamp'] for p in historical]
-
-    baseline = MLForecastBaseline(prices, timestamps)
-    prediction = baseline.predict(horizon_days=horizon_days)
-
-    forecast = Forecast.objects.create(
-        user=request.user,
-        asset=asset,
-        prediction_horizon_days=horizon_days,
-        risk_tolerance=risk_tolerance,
-        current_price=prediction['current_price'],
-        predicted_high=prediction['predicted_high'],
-        predicted_low=prediction['predicted_low'],
-        confidence_score=prediction['confidence'],
-        rsi_divergence=rsi_divergence,
-        macd_crossover=macd_crossover,
-        sentiment_analysis=sentiment_analysis,
-    )
-
-    for point in prediction['forecast_points']:
-        ForecastPoint.objects.create(
-            forecast=forecast,
-            date=point['date'],
-            predicted_price=point['price'],
-            confidence_upper=point['confidence_upper'],
-            confidence_lower=point['confidence_lower'],
-        )
-
-    for pattern_data in prediction['patterns']:
-        Pattern.objects.create(
-            forecast=forecast,
-            asset=asset,
-            pattern_type=pattern_data['type'],
-            timeframe='1D',
-            match_percentage=pattern_data['confidence'],
-        )
+    prediction = forecast_prediction(asset, horizon_days, 'baseline')
 
-    response_data = {
-        'id': forecast.id,
-        'asset': forecast.asset.symbol,
-        'current_price': float(forecast.current_price),
-        'predicted_high': float(forecast.predicted_high),
-        'predicted_low': float(forecast.predicted_low),
-        'confidence': forecast.confidence_score,
-        'horizon_days': forecast.prediction_horizon_days,
-        'points': [
-            {
-                'date': p.date.isoformat(),
-                'price': float(p.predicted_price),
-                'upper': float(p.confidence_upper) if p.confidence_upper else None,
-                'lower': float(p.confidence_lower) if p.confidence_lower else None,
-            }
-            for p in forecast.points.all().order_by('date')
-        ],
-    }
-
-    return Response(response_data, status=status.HTTP_201_CREATED)
+    forecast, points, _ = save_forecast(
+        request.user, asset, prediction, horizon_days, risk_tolerance,
+        rsi_divergence=rsi_divergence, macd_crossover=macd_crossover, sentiment_analysis=sentiment_analysis,
+    )
+    return Response(forecast_payload(forecast, points), status=status.HTTP_201_CREATED)
 
 
 @api_view(['GET'])
@@ -109,28 +50,18 @@ def forecast_detail(request, forecast_id):
     """Get forecast details"""
     try:
         forecast = Forecast.objects.get(id=forecast_id, user=request.user)
-        points = forecast.points.all().order_by('date')
-        
-        data = {
-            'id': forecast.id,
-            'asset': forecast.asset.symbol,
-            'current_price': float(forecast.current_price),
-            'predicted_high': float(forecast.predicted_high),
-            'predicted_low': float(forecast.predicted_low),
-            'confidence': forecast.confidence_score,
-            'horizon_days': forecast.prediction_horizon_days,
-            'points': [{
-                'date': p.date.isoformat(),
-                'price': float(p.predicted_price),
-                'upper': float(p.confidence_upper) if p.confidence_upper else None,
-                'lower': float(p.confidence_lower) if p.confidence_lower else None,
-            } for p in points],
-        }
-        return Response(data)
+        return Response(forecast_payload(forecast, forecast.points.all().order_by('date')))
     except Forecast.DoesNotExist:
         return Response({'error': 'Forecast not found'}, status=status.HTTP_404_NOT_FOUND)
 
 
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def cache_stats_api(request):
+    """Hit/miss counters of the forecast and price-history caches"""
+    return Response(cache_stats())
+
+
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 def forecast_history(request):
@@ -147,10 +78,45 @@ def forecast_history(request):
     return Response(data)
 
 
+def _parse_grid(value, cast, max_count):
+    """Parse a sweep grid: a list of values or {"start", "stop", "step"} (inclusive).
+
+    Grids with more than ``max_count`` values are rejected before any list
+    is built.
+    """
+    if isinstance(value, dict):
+        start, stop, step = cast(value['start']), cast(value['stop']), cast(value.get('step', 1))
+        if step <= 0:
+            raise ValueError('step must be positive')
+        count = max(0, int(round((stop - start) / step)) + 1)
+        if count > max_count:
+            raise ValueError(f'a grid axis has {count} values; the limit is {max_count}')
+        return [cast(start + i * step) for i in range(count)]
+    values = value if isinstance(value, (list, tuple)) else [value]
+    if len(values) > max_count:
+        raise ValueError(f'a grid axis has {len(values)} values; the limit is {max_count}')
+    return [cast(v) for v in values]
+
+
+def _max_points(value):
+    """Chart point budget from a request value; None (no thinning) when absent."""
+    return max(3, int(value)) if value else None
+
+
+def _backtest_asset(symbol):
+    asset = Asset.objects.filter(symbol__icontains=symbol.replace('USDT', '/USD')).first()
+    return asset or Asset.objects.first()
+
+
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
 def run_backtest_api(request):
-    """Run an SMA backtest + LR prediction; optionally save results."""
+    """Queue an SMA backtest + LR prediction (202 with the run id).
+
+    With ``sync`` true the backtest runs inside the request and the
+    results are returned directly (saved only when ``save`` is true);
+    ``max_points`` thins the returned candles and equity for charting.
+    """
     data = request.data
     symbol = data.get('symbol', 'BTCUSDT')
     interval = data.get('interval', '1d')
@@ -161,51 +127,15 @@ def run_backtest_api(request):
     slippage = float(data.get('slippage', 0.0005))
     forecast_days = int(data.get('forecast_days', 5))
     save = bool(data.get('save', False))
+    compact_equity = bool(data.get('compact_equity', persistence_config()['COMPACT_EQUITY']))
 
-    # Fetch candles from Binance
-    candles = CryptoDataFetcher.get_binance_klines(symbol, interval=interval, limit=500)
-
-    # Fallback: if Binance returned no candles, try CoinGecko historical data for common symbols
-    if not candles:
-        # Map common symbols to coingecko ids
-        symbol_map = {
-            'BTCUSDT': 'bitcoin',
-            'BTC/USD': 'bitcoin',
-            'ETHUSDT': 'ethereum',
-            'ETH/USD': 'ethereum',
-        }
-        cg_id = symbol_map.get(symbol.upper())
-        if cg_id:
-            historical = CryptoDataFetcher.get_historical_data(cg_id, days=90)
-            if historical:
-                # convert CoinGecko price points into candle-like dicts
-                candles = []
-                for p in historical:
-                    candles.append({
-                        'timestamp': p['timestamp'],
-                        'open': float(p['price']),
-                        'high': float(p['price']),
-                        'low': float(p['price']),
-                        'close': float(p['price']),
-                        'volume': 0.0,
-                    })
-
-    result = run_backtest(candles, short_window=short_window, long_window=long_window,
-                          initial_capital=initial_capital, commission_pct=commission,
-                          slippage=slippage, forecast_days=forecast_days, interval=interval)
-
-    response_payload = result
-
-    if save:
-        # Persist BacktestRun and associated trades/equity points
-        try:
-            asset = Asset.objects.filter(symbol__icontains=symbol.replace('USDT', '/USD')).first()
-        except Exception:
-            asset = None
-
+    if not data.get('sync'):
+        asset = _backtest_asset(symbol)
+        if asset is None:
+            return Response({'error': 'No assets configured'}, status=status.HTTP_400_BAD_REQUEST)
         backtest = BacktestRun.objects.create(
             user=request.user,
-            asset=asset if asset else Asset.objects.first(),
+            asset=asset,
             symbol=symbol,
             interval=interval,
             short_window=short_window,
@@ -213,29 +143,109 @@ def run_backtest_api(request):
             initial_capital=Decimal(str(initial_capital)),
             commission_pct=Decimal(str(commission)),
             slippage=Decimal(str(slippage)),
-            metrics=result.get('metrics', {}),
+            forecast_days=forecast_days,
+            compact_equity=compact_equity,
         )
+        return Response({
+            'backtest_id': backtest.id,
+            'status': backtest.status,
+            'status_url': request.build_absolute_uri(reverse('forecast_api:backtest_detail', args=[backtest.id])),
+        }, status=status.HTTP_202_ACCEPTED)
 
-        for t in result.get('trades', []):
-            TradeLog.objects.create(
-                backtest=backtest,
-                timestamp=t.get('timestamp'),
-                side=(t.get('type') or '').lower(),
-                price=Decimal(str(t.get('price'))),
-                size=Decimal(str(t.get('size', 0))),
-                pnl=Decimal(str(t.get('pnl', 0))) if t.get('pnl') is not None else None,
-                note='saved'
-            )
+    candles = load_backtest_candles(symbol, interval)
+
+    result = run_backtest(candles, short_window=short_window, long_window=long_window,
+                          initial_capital=initial_capital, commission_pct=commission,
+                          slippage=slippage, forecast_days=forecast_days, interval=interval)
+
+    response_payload = result
 
-        for e in result.get('equity', []):
-            EquityPoint.objects.create(
-                backtest=backtest,
-                timestamp=e.get('timestamp'),
-                equity=Decimal(str(e.get('equity'))),
+    if save:
+        # Persist BacktestRun and associated trades/equity points
+        with transaction.atomic():
+            backtest = BacktestRun.objects.create(
+                user=request.user,
+                asset=_backtest_asset(symbol),
+                symbol=symbol,
+                interval=interval,
+                short_window=short_window,
+                long_window=long_window,
+                initial_capital=Decimal(str(initial_capital)),
+                commission_pct=Decimal(str(commission)),
+                slippage=Decimal(str(slippage)),
+                forecast_days=forecast_days,
+                compact_equity=compact_equity,
+                status='completed',
+                metrics=result.get('metrics', {}),
+                forecast_points=result.get('forecast_points', []),
             )
 
+            save_backtest_results(backtest, result, compact=compact_equity)
+
         response_payload['backtest_id'] = backtest.id
 
+    response_payload = downsample_backtest(response_payload, _max_points(data.get('max_points')),
+                                           short_window, long_window)
     return Response(response_payload, status=status.HTTP_200_OK)
 
 
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def backtest_detail(request, backtest_id):
+    """Status of a queued backtest; results once it has completed (``?max_points=`` thins the charts)"""
+    try:
+        backtest = BacktestRun.objects.get(id=backtest_id, user=request.user)
+    except BacktestRun.DoesNotExist:
+        return Response({'error': 'Backtest not found'}, status=status.HTTP_404_NOT_FOUND)
+    return Response(downsample_backtest(BacktestQueue.payload(backtest), _max_points(request.GET.get('max_points')),
+                                        backtest.short_window, backtest.long_window))
+
+
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def cancel_backtest_api(request, backtest_id):
+    """Cancel a queued or running backtest"""
+    try:
+        backtest = BacktestRun.objects.get(id=backtest_id, user=request.user)
+    except BacktestRun.DoesNotExist:
+        return Response({'error': 'Backtest not found'}, status=status.HTTP_404_NOT_FOUND)
+    return Response({'backtest_id': backtest.id, 'status': BacktestQueue.cancel(backtest)})
+
+
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def run_backtest_sweep_api(request):
+    """Backtest a grid of SMA windows and costs over one set of candles."""
+    data = request.data
+    symbol = data.get('symbol', 'BTCUSDT')
+    interval = data.get('interval', '1d')
+    max_combinations = getattr(settings, 'SWEEP_MAX_COMBINATIONS', 20000)
+    try:
+        # The sweep runs inside the request, so the history it may fetch is kept small.
+        limit = max(1, min(int(data.get('limit', 500)), getattr(settings, 'SWEEP_MAX_CANDLES', 5000)))
+        short_windows = _parse_grid(data.get('short_windows', [5, 10, 20]), int, max_combinations)
+        long_windows = _parse_grid(data.get('long_windows', [50, 100, 200]), int, max_combinations)
+        commissions = _parse_grid(data.get('commission_pcts', [0.001]), float, max_combinations)
+        slippages = _parse_grid(data.get('slippages', [0.0005]), float, max_combinations)
+        initial_capital = float(data.get('initial_capital', 10000))
+        top = int(data.get('top', 50))
+    except (TypeError, ValueError, KeyError, OverflowError) as e:
+        return Response({'error': f'Invalid sweep parameters: {e}'}, status=status.HTTP_400_BAD_REQUEST)
+    rank_by = data.get('rank_by', 'total_return_pct')
+
+    combinations = len(short_windows) * len(long_windows) * len(commissions) * len(slippages)
+    if combinations > max_combinations:
+        return Response({'error': f'Grid has {combinations} combinations; the limit is {max_combinations}'},
+                        status=status.HTTP_400_BAD_REQUEST)
+
+    candles = load_backtest_candles(symbol, interval, limit=limit)
+    try:
+        result = run_sweep(candles, short_windows, long_windows, commissions, slippages,
+                           initial_capital=initial_capital, workers=getattr(settings, 'SWEEP_WORKERS', None),
+                           rank_by=rank_by, top=top)
+    except ValueError as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+    result['symbol'] = symbol
+    result['interval'] = interval
+    return Response(result, status=status.HTTP_200_OK)
@@ -6,8 +6,12 @@ app_name = 'forecast_api'
 urlpatterns = [
     path('run/', api.run_forecast_api, name='run'),
     path('backtest/run/', api.run_backtest_api, name='backtest_run'),
+    path('backtest/<int:backtest_id>/', api.backtest_detail, name='backtest_detail'),
+    path('backtest/<int:backtest_id>/cancel/', api.cancel_backtest_api, name='backtest_cancel'),
+    path('backtest/sweep/', api.run_backtest_sweep_api, name='backtest_sweep'),
     path('<int:forecast_id>/', api.forecast_detail, name='detail'),
     path('history/', api.forecast_history, name='history'),
+    path('cache/stats/', api.cache_stats_api, name='cache_stats'),
 ]
 
 
@@ -0,0 +1,33 @@
+from django.core.management.base import BaseCommand
+
+from forecast.services import BacktestQueue, queue_config
+
+
+class Command(BaseCommand):
+    help = (
+        "Execute queued BacktestRun rows. Runs are claimed atomically, so several workers can share "
+        "the queue; each run executes in its own process and is stopped on timeout or cancellation."
+    )
+
+    def add_arguments(self, parser):
+        config = queue_config()
+        parser.add_argument('--workers', type=int, default=config['WORKERS'],
+                            help='Maximum runs executing at once (default: BACKTEST_QUEUE WORKERS).')
+        parser.add_argument('--timeout', type=float, default=config['TIMEOUT_SECONDS'],
+                            help='Seconds before a run is terminated and marked failed.')
+        parser.add_argument('--poll', type=float, default=config['POLL_SECONDS'],
+                            help='Seconds between queue polls.')
+        parser.add_argument('--once', action='store_true',
+                            help='Exit once the queue is empty instead of waiting for new runs.')
+
+    def handle(self, *args, **options):
+        self.stdout.write(f"Backtest worker started ({options['workers']} workers, "
+                          f"{options['timeout']:g}s timeout)")
+        try:
+            processed = BacktestQueue.run_worker(workers=options['workers'], timeout=options['timeout'],
+                                                 poll_seconds=options['poll'], once=options['once'],
+                                                 log=self.stdout.write)
+        except KeyboardInterrupt:
+            self.stdout.write("Backtest worker stopped")
+            return
+        self.stdout.write(f"Processed {processed} runs")
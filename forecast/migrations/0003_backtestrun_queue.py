@@ -0,0 +1,50 @@
+# Generated by Django 5.2.18 on 2026-10-17 03:00
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dashboard', '0001_initial'),
+        ('forecast', '0002_backtestrun_equitypoint_tradelog'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='backtestrun',
+            name='cancel_requested',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.AddField(
+            model_name='backtestrun',
+            name='error',
+            field=models.TextField(blank=True),
+        ),
+        migrations.AddField(
+            model_name='backtestrun',
+            name='forecast_days',
+            field=models.IntegerField(default=5),
+        ),
+        migrations.AddField(
+            model_name='backtestrun',
+            name='forecast_points',
+            field=models.JSONField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='backtestrun',
+            name='timings',
+            field=models.JSONField(blank=True, help_text='Seconds spent loading, simulating and saving', null=True),
+        ),
+        migrations.AlterField(
+            model_name='backtestrun',
+            name='status',
+            field=models.CharField(choices=[('queued', 'Queued'), ('running', 'Running'), ('completed', 'Completed'), ('failed', 'Failed'), ('cancelled', 'Cancelled')], default='queued', max_length=16),
+        ),
+        migrations.AddIndex(
+            model_name='backtestrun',
+            index=models.Index(fields=['status', 'created_at'], name='forecast_ba_status_604c72_idx'),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-17 03:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('forecast', '0003_backtestrun_queue'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='backtestrun',
+            name='compact_equity',
+            field=models.BooleanField(default=False, help_text='Store the equity curve as a compressed blob'),
+        ),
+        migrations.AddField(
+            model_name='backtestrun',
+            name='equity_blob',
+            field=models.BinaryField(blank=True, null=True),
+        ),
+    ]
@@ -1,3 +1,4 @@
+import numpy as np
 from django.db import models
 from django.contrib.auth.models import User
 from dashboard.models import Asset
@@ -87,6 +88,7 @@ class BacktestRun(models.Model):
         ('running', 'Running'),
         ('completed', 'Completed'),
         ('failed', 'Failed'),
+        ('cancelled', 'Cancelled'),
     ]
 
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='backtests')
@@ -98,19 +100,44 @@ class BacktestRun(models.Model):
     initial_capital = models.DecimalField(max_digits=20, decimal_places=2, default=10000)
     commission_pct = models.DecimalField(max_digits=6, decimal_places=4, default=0.001)
     slippage = models.DecimalField(max_digits=6, decimal_places=4, default=0.0005)
+    forecast_days = models.IntegerField(default=5)
     start_time = models.DateTimeField(null=True, blank=True)
     end_time = models.DateTimeField(null=True, blank=True)
     status = models.CharField(max_length=16, choices=STATUS_CHOICES, default='queued')
     metrics = models.JSONField(null=True, blank=True)
+    forecast_points = models.JSONField(null=True, blank=True)
+    timings = models.JSONField(null=True, blank=True, help_text="Seconds spent loading, simulating and saving")
+    error = models.TextField(blank=True)
+    cancel_requested = models.BooleanField(default=False)
+    compact_equity = models.BooleanField(default=False, help_text="Store the equity curve as a compressed blob")
+    equity_blob = models.BinaryField(null=True, blank=True, editable=False)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
     class Meta:
         ordering = ['-created_at']
+        indexes = [models.Index(fields=['status', 'created_at'])]
 
     def __str__(self):
         return f"Backtest {self.symbol} ({self.short_window}/{self.long_window}) by {self.user.username}"
 
+    def equity_curve(self):
+        """``(timestamps_ms, equity)`` arrays from the compact blob or the EquityPoint rows.
+
+        The blob is decoded on first access and cached on the instance.
+        """
+        cached = getattr(self, '_equity_curve', None)
+        if cached is None:
+            from .persistence import decode_equity
+            if self.equity_blob:
+                cached = decode_equity(self.equity_blob)
+            else:
+                rows = list(self.equity_points.order_by('timestamp').values_list('timestamp', 'equity'))
+                cached = (np.array([int(ts.timestamp() * 1000) for ts, _ in rows], dtype='<i8'),
+                          np.array([float(e) for _, e in rows], dtype='<f8'))
+            self._equity_curve = cached
+        return cached
+
 
 class TradeLog(models.Model):
     backtest = models.ForeignKey(BacktestRun, on_delete=models.CASCADE, related_name='trades')
@@ -0,0 +1,176 @@
+"""
+Persistence for forecasts and backtest results.
+
+``save_forecast`` creates a forecast with its points and patterns in one
+transaction (one INSERT per table) and returns the saved objects, so
+callers build responses from memory instead of reading the rows back.
+
+``save_backtest_results`` writes a run's trades and equity curve with
+batched ``bulk_create`` calls inside one transaction, instead of one
+INSERT (and one commit) per row. In compact mode the equity curve is not
+stored as ``EquityPoint`` rows but as a single compressed blob on the
+``BacktestRun`` (``encode_equity``), decoded only when a chart needs it.
+
+Blob layout: the ``EQ1`` magic, then zlib-compressed bytes of the
+delta-encoded int64 epoch-ms timestamps followed by the float64 equity
+values, each byte-shuffled (all first bytes, then all second bytes, ...)
+so the slowly changing high bytes compress well.
+"""
+import zlib
+from decimal import Decimal
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+from django.conf import settings
+from django.db import transaction
+
+from .models import BacktestRun, EquityPoint, Forecast, ForecastPoint, Pattern, TradeLog
+
+EQUITY_MAGIC = b'EQ1'
+
+
+def _money(value) -> Optional[Decimal]:
+    """Round like a ``decimal_places=2`` column, so in-memory objects match the saved rows."""
+    if value is None:
+        return None
+    return Decimal(str(value)).quantize(Decimal('0.01'))
+
+
+def save_forecast(user, asset, prediction: Dict, horizon_days: int, risk_tolerance: str = 'medium',
+                  rsi_divergence: bool = False, macd_crossover: bool = False, sentiment_analysis: bool = False,
+                  pattern_timeframe: str = '1D') -> Tuple[Forecast, List[ForecastPoint], List[Pattern]]:
+    """Save a model prediction as a Forecast with its points and patterns.
+
+    Everything is written in one transaction with one ``bulk_create`` per
+    child table. Returns ``(forecast, points, patterns)`` as saved.
+    """
+    with transaction.atomic():
+        forecast = Forecast.objects.create(
+            user=user,
+            asset=asset,
+            prediction_horizon_days=horizon_days,
+            risk_tolerance=risk_tolerance,
+            current_price=_money(prediction['current_price']),
+            predicted_high=_money(prediction['predicted_high']),
+            predicted_low=_money(prediction['predicted_low']),
+            confidence_score=prediction['confidence'],
+            rsi_divergence=rsi_divergence,
+            macd_crossover=macd_crossover,
+            sentiment_analysis=sentiment_analysis,
+        )
+        points = ForecastPoint.objects.bulk_create(sorted((
+            ForecastPoint(
+                forecast=forecast,
+                date=point['date'],
+                predicted_price=_money(point['price']),
+                confidence_upper=_money(point['confidence_upper']),
+                confidence_lower=_money(point['confidence_lower']),
+            )
+            for point in prediction['forecast_points']
+        ), key=lambda p: p.date))
+        patterns = Pattern.objects.bulk_create([
+            Pattern(
+                forecast=forecast,
+                asset=asset,
+                pattern_type=pattern_data['type'],
+                timeframe=pattern_timeframe,
+                match_percentage=pattern_data['confidence'],
+            )
+            for pattern_data in prediction['patterns']
+        ])
+    return forecast, points, patterns
+
+
+def forecast_payload(forecast: Forecast, points: Sequence[ForecastPoint]) -> Dict:
+    """API representation of a forecast and its points, built from the given objects."""
+    return {
+        'id': forecast.id,
+        'asset': forecast.asset.symbol,
+        'current_price': float(forecast.current_price),
+        'predicted_high': float(forecast.predicted_high),
+        'predicted_low': float(forecast.predicted_low),
+        'confidence': forecast.confidence_score,
+        'horizon_days': forecast.prediction_horizon_days,
+        'points': [{
+            'date': p.date.isoformat(),
+            'price': float(p.predicted_price),
+            'upper': float(p.confidence_upper) if p.confidence_upper else None,
+            'lower': float(p.confidence_lower) if p.confidence_lower else None,
+        } for p in points],
+    }
+
+
+def persistence_config() -> Dict:
+    config = {'BATCH_SIZE': 2000, 'COMPACT_EQUITY': False}
+    config.update(getattr(settings, 'BACKTEST_PERSISTENCE', {}))
+    return config
+
+
+def _shuffle(values: np.ndarray) -> bytes:
+    return values.view(np.uint8).reshape(-1, values.itemsize).T.tobytes()
+
+
+def _unshuffle(raw: bytes, dtype, count: int) -> np.ndarray:
+    itemsize = np.dtype(dtype).itemsize
+    return np.frombuffer(raw, dtype=np.uint8).reshape(itemsize, count).T.copy().view(dtype).ravel()
+
+
+def iso_to_ms(stamps: Sequence[str]) -> np.ndarray:
+    """Epoch ms for the UTC ISO timestamps the backtester emits."""
+    naive = [s[:-6] if s.endswith('+00:00') else s for s in stamps]
+    return np.array(naive, dtype='datetime64[ms]').astype('<i8')
+
+
+def encode_equity(timestamps_ms, equity) -> bytes:
+    ts = np.asarray(timestamps_ms, dtype='<i8')
+    values = np.asarray(equity, dtype='<f8')
+    deltas = np.diff(ts, prepend=0).astype('<i8') if len(ts) else ts
+    return EQUITY_MAGIC + zlib.compress(_shuffle(deltas) + _shuffle(values), 6)
+
+
+def decode_equity(blob: bytes) -> Tuple[np.ndarray, np.ndarray]:
+    """Inverse of ``encode_equity``: ``(timestamps_ms, equity)`` arrays."""
+    blob = bytes(blob)
+    if not blob.startswith(EQUITY_MAGIC):
+        raise ValueError('Not an encoded equity curve')
+    raw = zlib.decompress(blob[len(EQUITY_MAGIC):])
+    count = len(raw) // 16
+    timestamps = np.cumsum(_unshuffle(raw[:count * 8], '<i8', count))
+    return timestamps, _unshuffle(raw[count * 8:], '<f8', count)
+
+
+def save_backtest_results(run: BacktestRun, result: Dict, compact: Optional[bool] = None,
+                          batch_size: Optional[int] = None):
+    """Store trades and the equity curve of ``result`` for ``run`` in one transaction.
+
+    ``compact`` (default ``BACKTEST_PERSISTENCE['COMPACT_EQUITY']``) stores
+    the equity curve as a blob on the run instead of ``EquityPoint`` rows.
+    """
+    config = persistence_config()
+    compact = config['COMPACT_EQUITY'] if compact is None else compact
+    batch_size = batch_size or config['BATCH_SIZE']
+    equity = result.get('equity', [])
+
+    with transaction.atomic():
+        TradeLog.objects.bulk_create([
+            TradeLog(
+                backtest=run,
+                timestamp=t.get('timestamp'),
+                side=(t.get('type') or '').lower(),
+                price=Decimal(str(t.get('price'))),
+                size=Decimal(str(t.get('size', 0))),
+                pnl=Decimal(str(t.get('pnl', 0))) if t.get('pnl') is not None else None,
+                note='saved',
+            )
+            for t in result.get('trades', [])
+        ], batch_size=batch_size)
+
+        if compact:
+            run.equity_blob = encode_equity(iso_to_ms([e['timestamp'] for e in equity]),
+                                            [e['equity'] for e in equity])
+            BacktestRun.objects.filter(pk=run.pk).update(equity_blob=run.equity_blob)
+        else:
+            EquityPoint.objects.bulk_create([
+                EquityPoint(backtest=run, timestamp=e.get('timestamp'), equity=Decimal(str(e.get('equity'))))
+                for e in equity
+            ], batch_size=batch_size)
@@ -0,0 +1,349 @@
+import multiprocessing
+import time
+from datetime import timedelta
+from typing import Dict, List, Optional
+
+from django.conf import settings
+from django.db import close_old_connections, connections, transaction
+from django.utils import timezone
+
+from core.backtester import run_backtest
+from core.cache import get_forecast_cache, get_history_cache
+from core.candle_store import get_candle_store
+from core.candles import CandleSeries, closed_length, isoformat_ms
+from core.data_fetchers import CryptoDataFetcher
+from core.downsample import downsample_records, lttb_indices
+from core.indicators import sma
+from core.ml_baseline import MLForecastBaseline
+try:
+    from core.better_ml import BetterMLForecast
+except Exception:
+    BetterMLForecast = None
+from .models import BacktestRun
+from .persistence import save_backtest_results
+
+
+def load_backtest_candles(symbol, interval, limit=500):
+    """Load candles from the Binance-backed store, falling back to CoinGecko closes."""
+    candles = CryptoDataFetcher.get_binance_klines(symbol, interval=interval, limit=limit)
+
+    # Fallback: if Binance returned no candles, try CoinGecko historical data for common symbols
+    if not len(candles):
+        # Map common symbols to coingecko ids
+        symbol_map = {
+            'BTCUSDT': 'bitcoin',
+            'BTC/USD': 'bitcoin',
+            'ETHUSDT': 'ethereum',
+            'ETH/USD': 'ethereum',
+        }
+        cg_id = symbol_map.get(symbol.upper())
+        if cg_id:
+            # Close-only candles (open = high = low = close)
+            candles = CryptoDataFetcher.get_historical_data(cg_id, days=90)
+    return candles
+
+
+COINGECKO_IDS = {
+    'BTC/USD': 'bitcoin',
+    'ETH/USD': 'ethereum',
+}
+
+
+class _EmptyHistory(Exception):
+    pass
+
+
+def forecast_history(asset_symbol: str, days: int = 30) -> CandleSeries:
+    """Daily history for an asset, shared between requests for a short TTL.
+
+    Failed (empty) fetches are not cached, so the next request retries.
+    """
+    coin = COINGECKO_IDS.get(asset_symbol, 'bitcoin')
+
+    def fetch():
+        series = CryptoDataFetcher.get_historical_data(coin, days=days)
+        if not len(series):
+            raise _EmptyHistory()
+        return series
+
+    try:
+        return get_history_cache().get_or_compute(('coingecko', coin, days), fetch)
+    except _EmptyHistory:
+        return CandleSeries.empty()
+
+
+def forecast_prediction(asset, horizon_days: int, model: str = 'baseline') -> Dict:
+    """Model prediction for ``asset``, cached per (asset, horizon, model, last closed candle).
+
+    ``model`` is ``'baseline'`` (MLForecastBaseline) or ``'better'``
+    (BetterMLForecast, falling back to the baseline if it fails). CoinGecko's
+    live last point is left out, so the prediction (and its cache entry)
+    only changes when a daily candle closes; the indicator toggles do not
+    affect the models and are not part of the key. Cached predictions are
+    shared between requests and must not be modified.
+    """
+    historical = forecast_history(asset.symbol)
+    if not len(historical):
+        prices = [float(asset.current_price)]
+        timestamps = [timezone.now()]
+        version = ('current', str(asset.current_price))
+    else:
+        historical = historical[:closed_length(historical.timestamp)]
+        prices = historical.close.tolist()
+        timestamps = historical.datetimes()
+        version = ('candle', int(historical.timestamp[-1]))
+
+    def compute():
+        if model == 'better' and BetterMLForecast:
+            try:
+                return BetterMLForecast(prices, timestamps, asset=asset.symbol).predict(horizon_days=horizon_days)
+            except Exception:
+                pass
+        return MLForecastBaseline(prices, timestamps).predict(horizon_days=horizon_days)
+
+    key = (asset.symbol, horizon_days, model, version)
+    return get_forecast_cache().get_or_compute(key, compute)
+
+
+def downsample_backtest(data: Dict, max_points: Optional[int], short_window: int, long_window: int) -> Dict:
+    """Backtest payload with candles and equity thinned to ``max_points`` each (LTTB).
+
+    Candles are chosen on their close. Kept candles carry ``sma_short`` and
+    ``sma_long`` computed over every candle, since the chart cannot compute
+    them from a thinned series. Trades are kept in full. ``original_points``
+    records the counts before thinning. Payloads within budget are returned
+    unchanged.
+    """
+    candles, equity = data.get('candles') or [], data.get('equity') or []
+    if not max_points or max(len(candles), len(equity)) <= max_points:
+        return data
+    data = dict(data, original_points={'candles': len(candles), 'equity': len(equity)})
+    if len(candles) > max_points:
+        closes = [c['close'] for c in candles]
+        sma_short = sma(closes, short_window, min_periods=1).tolist()
+        sma_long = sma(closes, long_window, min_periods=1).tolist()
+        data['candles'] = [{**candles[i], 'sma_short': sma_short[i], 'sma_long': sma_long[i]}
+                           for i in lttb_indices(closes, max_points).tolist()]
+    data['equity'] = downsample_records(equity, 'equity', max_points)
+    return data
+
+
+def queue_config() -> Dict:
+    config = {'WORKERS': 2, 'TIMEOUT_SECONDS': 600, 'POLL_SECONDS': 1.0}
+    config.update(getattr(settings, 'BACKTEST_QUEUE', {}))
+    return config
+
+
+def _run_in_child(run_id: int):
+    """Process entry point: execute one claimed run with a fresh DB connection."""
+    try:
+        BacktestQueue.execute(run_id)
+    finally:
+        connections.close_all()
+
+
+class BacktestQueue:
+    """``BacktestRun`` rows used as a job queue.
+
+    Runs are created ``queued``; a worker claims them with a conditional
+    UPDATE (so two workers never take the same run), executes each in its
+    own process and writes the results, timings and final status back.
+    """
+
+    @staticmethod
+    def claim(limit: int = 1) -> List[int]:
+        """Atomically move up to ``limit`` of the oldest queued runs to ``running``."""
+        claimed = []
+        candidates = (BacktestRun.objects.filter(status='queued', cancel_requested=False)
+                      .order_by('created_at').values_list('pk', flat=True)[:limit * 2])
+        for pk in candidates:
+            if len(claimed) >= limit:
+                break
+            # Only one worker's UPDATE can still see the row as queued.
+            if BacktestRun.objects.filter(pk=pk, status='queued').update(
+                    status='running', start_time=timezone.now(), error=''):
+                claimed.append(pk)
+        return claimed
+
+    @staticmethod
+    def execute(run_id: int) -> str:
+        """Run a claimed backtest and persist its results. Returns the final status.
+
+        Results are only written while the run is still ``running`` and not
+        cancelled. A run cancelled meanwhile ends ``cancelled``; one the
+        worker already failed (timed out) is left as it was marked.
+        """
+        run = BacktestRun.objects.get(pk=run_id)
+        timings = {}
+        try:
+            started = time.perf_counter()
+            candles = load_backtest_candles(run.symbol, run.interval)
+            timings['load_seconds'] = round(time.perf_counter() - started, 3)
+
+            started = time.perf_counter()
+            result = run_backtest(candles, short_window=run.short_window, long_window=run.long_window,
+                                  initial_capital=float(run.initial_capital),
+                                  commission_pct=float(run.commission_pct), slippage=float(run.slippage),
+                                  forecast_days=run.forecast_days, interval=run.interval)
+            timings['backtest_seconds'] = round(time.perf_counter() - started, 3)
+            timings['candles'] = len(candles)
+
+            started = time.perf_counter()
+            with transaction.atomic():
+                finished = BacktestRun.objects.filter(pk=run_id, status='running', cancel_requested=False).update(
+                    status='completed', end_time=timezone.now(), metrics=result['metrics'],
+                    forecast_points=result['forecast_points'], timings=timings)
+                if not finished:
+                    # Cancelled while running: settle it here, the worker only sees a clean exit.
+                    BacktestRun.objects.filter(pk=run_id, status='running', cancel_requested=True).update(
+                        status='cancelled', end_time=timezone.now())
+                    return BacktestRun.objects.values_list('status', flat=True).get(pk=run_id)
+                save_backtest_results(run, result, compact=run.compact_equity)
+            timings['save_seconds'] = round(time.perf_counter() - started, 3)
+            BacktestRun.objects.filter(pk=run_id).update(timings=timings)
+            return 'completed'
+        except Exception as e:
+            print(f"Backtest run {run_id} failed: {e}")
+            BacktestRun.objects.filter(pk=run_id, status='running').update(
+                status='failed', error=str(e), end_time=timezone.now(), timings=timings)
+            return 'failed'
+
+    @staticmethod
+    def cancel(run: BacktestRun) -> str:
+        """Cancel a queued run at once, or ask the worker to stop a running one."""
+        if BacktestRun.objects.filter(pk=run.pk, status='queued').update(
+                status='cancelled', end_time=timezone.now()):
+            return 'cancelled'
+        BacktestRun.objects.filter(pk=run.pk, status='running').update(cancel_requested=True)
+        return BacktestRun.objects.values_list('status', flat=True).get(pk=run.pk)
+
+    @staticmethod
+    def fail_abandoned(timeout: float) -> int:
+        """Fail runs left ``running`` by a worker that died (older than ``timeout``)."""
+        cutoff = timezone.now() - timedelta(seconds=timeout)
+        return BacktestRun.objects.filter(status='running', start_time__lt=cutoff).update(
+            status='failed', error='Abandoned by a stopped worker', end_time=timezone.now())
+
+    @staticmethod
+    def run_worker(workers: Optional[int] = None, timeout: Optional[float] = None,
+                   poll_seconds: Optional[float] = None, once: bool = False, log=print) -> int:
+        """Claim and execute queued runs, each in its own process, until interrupted.
+
+        At most ``workers`` runs execute at once. A run still going after
+        ``timeout`` seconds, or whose cancellation was requested, has its
+        process terminated. An iteration that fails (e.g. the database is
+        briefly locked) is logged and retried after ``poll_seconds``, leaving
+        the running children alone. With ``once`` the worker exits when the
+        queue is empty. Returns the number of runs processed.
+        """
+        config = queue_config()
+        workers = workers or config['WORKERS']
+        timeout = timeout or config['TIMEOUT_SECONDS']
+        poll_seconds = poll_seconds if poll_seconds is not None else config['POLL_SECONDS']
+        # Fork shares the already configured Django process.
+        context = multiprocessing.get_context('fork')
+
+        active = {}  # run id -> (process, deadline)
+        processed = 0
+        first = True
+        while True:
+            close_old_connections()
+            claimed, failed = [], False
+            try:
+                if first:
+                    abandoned = BacktestQueue.fail_abandoned(timeout * 2)
+                    if abandoned:
+                        log(f"Marked {abandoned} abandoned runs as failed")
+                    first = False
+                cancelled = set(BacktestRun.objects.filter(pk__in=list(active), cancel_requested=True)
+                                .values_list('pk', flat=True))
+                for run_id, (process, deadline) in list(active.items()):
+                    if not process.is_alive():
+                        process.join()
+                        if process.exitcode != 0:
+                            BacktestRun.objects.filter(pk=run_id, status='running').update(
+                                status='failed', error=f'Worker exited with code {process.exitcode}',
+                                end_time=timezone.now())
+                        else:
+                            # A clean exit never leaves a run running; settle one that slipped through.
+                            still_running = BacktestRun.objects.filter(pk=run_id, status='running')
+                            if run_id in cancelled:
+                                still_running.update(status='cancelled', end_time=timezone.now())
+                            else:
+                                still_running.update(status='failed', error='Worker exited without a result',
+                                                     end_time=timezone.now())
+                    elif run_id in cancelled or time.monotonic() > deadline:
+                        process.terminate()
+                        process.join()
+                        if run_id in cancelled:
+                            BacktestRun.objects.filter(pk=run_id, status='running').update(
+                                status='cancelled', end_time=timezone.now())
+                        else:
+                            BacktestRun.objects.filter(pk=run_id, status='running').update(
+                                status='failed', error=f'Timed out after {timeout:g}s', end_time=timezone.now())
+                    else:
+                        continue
+                    del active[run_id]
+                    processed += 1
+                    log(f"Run {run_id}: {BacktestRun.objects.values_list('status', flat=True).get(pk=run_id)}")
+
+                claimed = BacktestQueue.claim(workers - len(active)) if len(active) < workers else []
+                if claimed:
+                    # Children must not inherit the parent's open DB connections.
+                    connections.close_all()
+                for run_id in claimed:
+                    process = context.Process(target=_run_in_child, args=(run_id,), daemon=True)
+                    process.start()
+                    active[run_id] = (process, time.monotonic() + timeout)
+            except Exception as e:
+                # A transient DB error (locked, dropped connection) must not orphan the running children.
+                log(f"Backtest worker iteration failed: {e}")
+                failed = True
+
+            if once and not failed and not active and not claimed:
+                return processed
+            time.sleep(poll_seconds)
+
+    @staticmethod
+    def payload(run: BacktestRun) -> Dict:
+        """API view of a run; completed runs include candles, trades and equity."""
+        data = {
+            'backtest_id': run.id,
+            'status': run.status,
+            'symbol': run.symbol,
+            'interval': run.interval,
+            'short_window': run.short_window,
+            'long_window': run.long_window,
+            'error': run.error or None,
+            'timings': run.timings,
+            'created_at': run.created_at.isoformat(),
+            'start_time': run.start_time.isoformat() if run.start_time else None,
+            'end_time': run.end_time.isoformat() if run.end_time else None,
+        }
+        if run.status != 'completed':
+            return data
+
+        equity_ms, equity = run.equity_curve()
+        candles = CandleSeries.empty()
+        if len(equity_ms):
+            # Equity has one point per simulated candle, so it gives the candle range.
+            candles = CandleSeries.from_columns(get_candle_store().read(
+                CryptoDataFetcher.binance_symbol(run.symbol), run.interval,
+                start=int(equity_ms[0]), end=int(equity_ms[-1])))
+        data.update({
+            'metrics': run.metrics or {},
+            'forecast_points': run.forecast_points or [],
+            'trades': [{
+                'type': t.side.upper(),
+                'timestamp': t.timestamp.isoformat(),
+                'price': float(t.price),
+                'size': float(t.size),
+                **({'pnl': float(t.pnl)} if t.pnl is not None else {}),
+            } for t in run.trades.order_by('timestamp')],
+            'equity': [{'timestamp': ts, 'equity': e} for ts, e in zip(isoformat_ms(equity_ms), equity.tolist())],
+            'candles': [{
+                'timestamp': ts.isoformat(), 'open': o, 'high': h, 'low': lo, 'close': c, 'volume': v,
+            } for ts, o, h, lo, c, v in zip(candles.datetimes(), candles.open.tolist(), candles.high.tolist(),
+                                           candles.low.tolist(), candles.close.tolist(), candles.volume.tolist())],
+        })
+        return data
@@ -1,5 +1,5 @@
 // forecast/static/forecast/js/forecast.js
-// Calls /api/forecast/backtest/run/ and renders Plotly charts
+// Queues /api/forecast/backtest/run/, polls the run until it finishes and renders Plotly charts
 
 function getCookie(name) {
     const cookies = document.cookie.split(';').map(c => c.trim());
@@ -58,8 +58,10 @@ async function runBacktest() {
         return;
     }
 
-    const data = await resp.json();
-    if (!data || !data.candles || data.candles.length === 0) {
+    const queued = await resp.json();
+    const data = await pollBacktest(queued.status_url + '?max_points=' + BACKTEST_MAX_POINTS);
+    if (!data) return;
+    if (!data.candles || data.candles.length === 0) {
         alert('No candle data returned from server. Please check symbol or try again.');
         console.warn('Backtest result missing candles:', data);
         return;
@@ -67,6 +69,37 @@ async function runBacktest() {
     renderPlots(data, short_window, long_window);
 }
 
+const BACKTEST_POLL_MS = 1000;
+// Candles / equity points per chart; the server thins larger results with LTTB
+const BACKTEST_MAX_POINTS = 2000;
+
+async function pollBacktest(statusUrl) {
+    const runBtn = document.getElementById('bt_run');
+    if (runBtn) runBtn.disabled = true;
+    try {
+        while (true) {
+            const resp = await fetch(statusUrl, { credentials: 'same-origin' });
+            if (!resp.ok) {
+                alert('Could not fetch backtest status: ' + resp.status);
+                return null;
+            }
+            const run = await resp.json();
+            if (runBtn) runBtn.textContent = run.status === 'running' ? 'Running...' : 'Queued...';
+            if (run.status === 'completed') return run;
+            if (run.status === 'failed' || run.status === 'cancelled') {
+                alert('Backtest ' + run.status + (run.error ? ': ' + run.error : ''));
+                return null;
+            }
+            await new Promise(resolve => setTimeout(resolve, BACKTEST_POLL_MS));
+        }
+    } finally {
+        if (runBtn) {
+            runBtn.disabled = false;
+            runBtn.textContent = runBtn.dataset.label || 'Run Backtest';
+        }
+    }
+}
+
 function renderPlots(result, short_window, long_window) {
     // Candles
     const candles = result.candles || [];
@@ -89,9 +122,10 @@ function renderPlots(result, short_window, long_window) {
         decreasing: { line: { color: '#ef4444' } }
     });
 
-    // SMAs
-    const smaShort = movingAverage(closes.map(Number), short_window);
-    const smaLong = movingAverage(closes.map(Number), long_window);
+    // SMAs (sent by the server when candles were thinned; computed here otherwise)
+    const thinned = candles.length > 0 && candles[0].sma_short !== undefined;
+    const smaShort = thinned ? candles.map(c => c.sma_short) : movingAverage(closes.map(Number), short_window);
+    const smaLong = thinned ? candles.map(c => c.sma_long) : movingAverage(closes.map(Number), long_window);
     priceTraces.push({ x: times, y: smaShort, type: 'scatter', mode: 'lines', name: `SMA ${short_window}`, line: {color: 'orange', width:1} });
     priceTraces.push({ x: times, y: smaLong, type: 'scatter', mode: 'lines', name: `SMA ${long_window}`, line: {color: 'blue', width:1} });
 
@@ -152,5 +186,6 @@ function renderPlots(result, short_window, long_window) {
 
 document.addEventListener('DOMContentLoaded', function() {
     const runBtn = document.getElementById('bt_run');
+    if (runBtn) runBtn.dataset.label = runBtn.textContent;
     if (runBtn) runBtn.addEventListener('click', function() { runBacktest(); });
 });
@@ -1,6 +1,18 @@
+from unittest import mock
+
+import numpy as np
+from django.contrib.auth.models import User
+from django.db import OperationalError
 from django.test import TestCase
 
+from core import cache as cache_module
+from core.candles import CandleSeries
 from core.ml_baseline import MLForecastBaseline
+from dashboard.models import Asset
+from core.backtester import run_backtest
+from .models import BacktestRun, Forecast, ForecastPoint
+from .persistence import decode_equity, encode_equity, forecast_payload, save_backtest_results, save_forecast
+from .services import BacktestQueue, forecast_prediction
 
 
 class MLForecastBaselineTests(TestCase):
@@ -15,3 +27,272 @@ class MLForecastBaselineTests(TestCase):
         self.assertIn('predicted_low', result)
         self.assertIn('confidence', result)
         self.assertEqual(len(result['forecast_points']), 5)
+
+
+def rising_candles(n=120):
+    close = 100 + np.sin(np.arange(n) / 6.0) * 10 + np.arange(n) * 0.2
+    return CandleSeries(1_600_000_000_000 + np.arange(n) * 86_400_000, close, close + 1, close - 1, close,
+                        np.ones(n))
+
+
+class BacktestQueueTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('trader', password='pw')
+        self.asset = Asset.objects.create(symbol='BTC/USD', name='Bitcoin', asset_type='crypto')
+        self.client.force_login(self.user)
+
+    def queue(self, **data):
+        response = self.client.post('/api/forecast/backtest/run/', {'symbol': 'BTCUSDT', **data},
+                                    content_type='application/json')
+        self.assertEqual(response.status_code, 202)
+        return response.json()['backtest_id']
+
+    def test_claim_is_exclusive_and_oldest_first(self):
+        first, second = self.queue(), self.queue()
+        self.assertEqual(BacktestQueue.claim(1), [first])
+        self.assertEqual(BacktestQueue.claim(5), [second])
+        self.assertEqual(BacktestQueue.claim(5), [])
+        self.assertEqual(BacktestRun.objects.get(pk=first).status, 'running')
+
+    def test_execute_persists_results_and_timings(self):
+        run_id = self.queue(short_window=5, long_window=20)
+        BacktestQueue.claim(1)
+        with mock.patch('forecast.services.load_backtest_candles', return_value=rising_candles()):
+            self.assertEqual(BacktestQueue.execute(run_id), 'completed')
+
+        run = BacktestRun.objects.get(pk=run_id)
+        self.assertEqual(run.equity_points.count(), 120)
+        self.assertGreater(run.trades.count(), 0)
+        self.assertEqual(len(run.forecast_points), 5)
+        self.assertIn('backtest_seconds', run.timings)
+
+        data = self.client.get(f'/api/forecast/backtest/{run_id}/').json()
+        self.assertEqual(data['status'], 'completed')
+        self.assertEqual(len(data['equity']), 120)
+        self.assertEqual(data['metrics'], run.metrics)
+
+    def test_cancel_queued_and_running(self):
+        queued, running = self.queue(), self.queue()
+        BacktestRun.objects.filter(pk=running).update(status='running')
+
+        self.assertEqual(self.client.post(f'/api/forecast/backtest/{queued}/cancel/').json()['status'], 'cancelled')
+        self.assertEqual(BacktestQueue.claim(5), [])
+        self.client.post(f'/api/forecast/backtest/{running}/cancel/')
+        # A cancelled running run is not overwritten with results.
+        with mock.patch('forecast.services.load_backtest_candles', return_value=rising_candles()):
+            self.assertEqual(BacktestQueue.execute(running), 'cancelled')
+        run = BacktestRun.objects.get(pk=running)
+        self.assertEqual(run.status, 'cancelled')
+        self.assertIsNotNone(run.end_time)
+        self.assertFalse(run.equity_points.exists())
+
+    def test_worker_settles_runs_whose_process_exits_cleanly(self):
+        cancelled, lost = self.queue(), self.queue()
+
+        def process(target, args, daemon):
+            # The child exits 0 without writing a final status; one run was cancelled meanwhile.
+            BacktestRun.objects.filter(pk=cancelled).update(cancel_requested=True)
+            return mock.Mock(exitcode=0, **{'is_alive.return_value': False})
+
+        context = mock.Mock(Process=process)
+        with mock.patch('forecast.services.multiprocessing.get_context', return_value=context), \
+                mock.patch('forecast.services.connections'):
+            self.assertEqual(BacktestQueue.run_worker(workers=2, poll_seconds=0, once=True, log=lambda _: None), 2)
+
+        runs = BacktestRun.objects.in_bulk([cancelled, lost])
+        self.assertEqual(runs[cancelled].status, 'cancelled')
+        self.assertEqual((runs[lost].status, runs[lost].error), ('failed', 'Worker exited without a result'))
+
+    def test_worker_survives_a_database_error(self):
+        run_id = self.queue()
+        claim = BacktestQueue.claim
+        locked = iter([OperationalError('database is locked')])
+
+        def flaky_claim(limit):
+            # The first claim hits a locked database; later ones go through.
+            error = next(locked, None)
+            if error:
+                raise error
+            return claim(limit)
+
+        log = mock.Mock()
+        context = mock.Mock(Process=lambda target, args, daemon: mock.Mock(
+            exitcode=1, **{'is_alive.return_value': False}))
+        with mock.patch.object(BacktestQueue, 'claim', side_effect=flaky_claim), \
+                mock.patch('forecast.services.multiprocessing.get_context', return_value=context), \
+                mock.patch('forecast.services.connections'), \
+                mock.patch('forecast.services.close_old_connections') as close_old:
+            self.assertEqual(BacktestQueue.run_worker(workers=1, poll_seconds=0, once=True, log=log), 1)
+
+        log.assert_any_call('Backtest worker iteration failed: database is locked')
+        self.assertGreaterEqual(close_old.call_count, 3)
+        run = BacktestRun.objects.get(pk=run_id)
+        self.assertEqual((run.status, run.error), ('failed', 'Worker exited with code 1'))
+
+    def test_failures_are_recorded(self):
+        run_id = self.queue()
+        BacktestQueue.claim(1)
+        with mock.patch('forecast.services.load_backtest_candles', side_effect=RuntimeError('no data')):
+            self.assertEqual(BacktestQueue.execute(run_id), 'failed')
+        self.assertEqual(BacktestRun.objects.get(pk=run_id).error, 'no data')
+
+    def test_sync_mode_returns_results(self):
+        with mock.patch('forecast.api.load_backtest_candles', return_value=rising_candles()):
+            response = self.client.post('/api/forecast/backtest/run/', {'sync': True},
+                                        content_type='application/json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.json()['candles']), 120)
+
+    def test_max_points_thins_chart_series(self):
+        with mock.patch('forecast.api.load_backtest_candles', return_value=rising_candles()):
+            full = self.client.post('/api/forecast/backtest/run/', {'sync': True, 'short_window': 5},
+                                    content_type='application/json').json()
+            data = self.client.post('/api/forecast/backtest/run/', {'sync': True, 'short_window': 5, 'max_points': 30},
+                                    content_type='application/json').json()
+        self.assertEqual((len(data['candles']), len(data['equity'])), (30, 30))
+        self.assertEqual(data['original_points'], {'candles': 120, 'equity': 120})
+        self.assertEqual(data['trades'], full['trades'])
+        # SMAs are computed over every candle, not the kept ones.
+        closes = [c['close'] for c in full['candles']]
+        position = [c['timestamp'] for c in full['candles']].index(data['candles'][10]['timestamp'])
+        self.assertAlmostEqual(data['candles'][10]['sma_short'], sum(closes[position - 4:position + 1]) / 5)
+
+
+class BacktestSweepApiTests(TestCase):
+    def setUp(self):
+        self.client.force_login(User.objects.create_user('trader', password='pw'))
+
+    def sweep(self, **data):
+        return self.client.post('/api/forecast/backtest/sweep/', data, content_type='application/json')
+
+    def test_oversized_range_is_rejected_before_building_it(self):
+        with mock.patch('forecast.api.load_backtest_candles') as load:
+            response = self.sweep(short_windows={'start': 0, 'stop': 1e9, 'step': 1})
+            self.assertEqual(self.sweep(long_windows={'start': 0, 'stop': 'inf'}).status_code, 400)
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('limit', response.json()['error'])
+        load.assert_not_called()
+
+    def test_candle_limit_is_capped(self):
+        with mock.patch('forecast.api.load_backtest_candles', return_value=rising_candles()) as load:
+            response = self.sweep(limit=100000, short_windows=[5], long_windows=[20])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(load.call_args.kwargs['limit'], 5000)
+
+
+class BacktestPersistenceTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('trader', password='pw')
+        self.asset = Asset.objects.create(symbol='BTC/USD', name='Bitcoin', asset_type='crypto')
+        self.result = run_backtest(rising_candles(), short_window=5, long_window=20)
+
+    def new_run(self, **fields):
+        return BacktestRun.objects.create(user=self.user, asset=self.asset, symbol='BTCUSDT', **fields)
+
+    def test_equity_blob_round_trip(self):
+        ts = 1_600_000_000_000 + np.arange(1000) * 60_000
+        equity = 10000 + np.cumsum(np.random.default_rng(0).normal(size=1000))
+        blob = encode_equity(ts, equity)
+        self.assertLess(len(blob), ts.nbytes + equity.nbytes)
+        decoded_ts, decoded = decode_equity(blob)
+        np.testing.assert_array_equal(decoded_ts, ts)
+        np.testing.assert_array_equal(decoded, equity)
+
+    def test_rows_and_compact_modes_give_the_same_curve(self):
+        rows, compact = self.new_run(), self.new_run(compact_equity=True)
+        with self.assertNumQueries(4):  # savepoint, trades, equity rows, release
+            save_backtest_results(rows, self.result, batch_size=1000)
+        save_backtest_results(compact, self.result, compact=True)
+
+        self.assertEqual(rows.equity_points.count(), 120)
+        self.assertFalse(compact.equity_points.exists())
+        self.assertEqual(compact.trades.count(), rows.trades.count())
+
+        expected = [e['equity'] for e in self.result['equity']]
+        compact = BacktestRun.objects.get(pk=compact.pk)
+        np.testing.assert_allclose(compact.equity_curve()[1], expected)
+        np.testing.assert_allclose(rows.equity_curve()[1], expected, atol=0.005)
+        np.testing.assert_array_equal(compact.equity_curve()[0], rows.equity_curve()[0])
+
+
+class ForecastPersistenceTests(TestCase):
+    def setUp(self):
+        cache_module._caches.clear()
+        self.user = User.objects.create_user('trader', password='pw')
+        self.asset = Asset.objects.create(symbol='BTC/USD', name='Bitcoin', asset_type='crypto',
+                                          current_price=100)
+        self.client.force_login(self.user)
+
+    def test_saved_in_one_transaction_and_response_matches_stored_rows(self):
+        prediction = MLForecastBaseline([100 + i for i in range(20)]).predict(horizon_days=30)
+        prediction['patterns'] = [{'type': 'doji', 'confidence': 70}]
+        with self.assertNumQueries(5):  # savepoint, forecast, points, patterns, release
+            forecast, points, patterns = save_forecast(self.user, self.asset, prediction, 30)
+        self.assertEqual((len(points), len(patterns)), (30, 1))
+
+        stored = forecast_payload(Forecast.objects.get(pk=forecast.pk),
+                                  ForecastPoint.objects.filter(forecast=forecast).order_by('date'))
+        self.assertEqual(forecast_payload(forecast, points), stored)
+
+    def test_api_response_equals_detail(self):
+        with mock.patch('forecast.services.CryptoDataFetcher.get_historical_data',
+                        return_value=CandleSeries.from_prices(np.arange(30) * 86_400_000, 100 + np.arange(30.0))):
+            created = self.client.post('/api/forecast/run/', {'asset': 'BTC/USD', 'horizon': 10},
+                                       content_type='application/json').json()
+        self.assertEqual(len(created['points']), 10)
+        self.assertEqual(self.client.get(f"/api/forecast/{created['id']}/").json(), created)
+
+
+class ForecastCacheTests(TestCase):
+    def setUp(self):
+        cache_module._caches.clear()
+        self.user = User.objects.create_user('trader', password='pw')
+        self.asset = Asset.objects.create(symbol='BTC/USD', name='Bitcoin', asset_type='crypto',
+                                          current_price=100)
+        self.client.force_login(self.user)
+
+    def history(self, days=30):
+        return CandleSeries.from_prices(np.arange(days) * 86_400_000, 100 + np.arange(float(days)))
+
+    def test_identical_requests_share_one_fetch_and_fit(self):
+        with mock.patch('forecast.services.CryptoDataFetcher.get_historical_data',
+                        return_value=self.history()) as fetch, \
+                mock.patch('forecast.services.MLForecastBaseline.predict',
+                           side_effect=MLForecastBaseline.predict, autospec=True) as fit:
+            for _ in range(3):
+                self.client.post('/api/forecast/run/', {'asset': 'BTC/USD', 'horizon': 7},
+                                 content_type='application/json')
+            self.client.post('/api/forecast/run/', {'asset': 'BTC/USD', 'horizon': 14},
+                             content_type='application/json')
+        self.assertEqual(fetch.call_count, 1)
+        self.assertEqual(fit.call_count, 2)
+        self.assertEqual(Forecast.objects.count(), 4)
+
+        stats = self.client.get('/api/forecast/cache/stats/').json()
+        self.assertEqual((stats['forecasts']['hits'], stats['forecasts']['misses']), (2, 2))
+        self.assertEqual(stats['history']['misses'], 1)
+
+    def test_live_tick_and_toggles_do_not_change_the_key(self):
+        closed = self.history()
+        responses = []
+        with mock.patch('forecast.services.MLForecastBaseline.predict',
+                        side_effect=MLForecastBaseline.predict, autospec=True) as fit:
+            for offset_ms, price, toggle in ((3_600_000, 150.0, False), (7_200_000, 90.0, True)):
+                live = CandleSeries.from_prices(np.append(closed.timestamp, closed.timestamp[-1] + offset_ms),
+                                                np.append(closed.close, price))
+                cache_module.get_history_cache().clear()
+                with mock.patch('forecast.services.CryptoDataFetcher.get_historical_data', return_value=live):
+                    responses.append(self.client.post('/api/forecast/run/', {
+                        'asset': 'BTC/USD', 'horizon': 7, 'rsi_divergence': toggle,
+                    }, content_type='application/json').json())
+        self.assertEqual(fit.call_count, 1)
+        self.assertEqual(responses[0]['current_price'], responses[1]['current_price'])
+
+    def test_new_candle_changes_the_key(self):
+        with mock.patch('forecast.services.CryptoDataFetcher.get_historical_data', return_value=self.history()):
+            first = forecast_prediction(self.asset, 7)
+        cache_module.get_history_cache().clear()
+        with mock.patch('forecast.services.CryptoDataFetcher.get_historical_data', return_value=self.history(31)):
+            second = forecast_prediction(self.asset, 7)
+        self.assertIsNot(first, second)
+        self.assertEqual(cache_module.get_forecast_cache().stats()['misses'], 2)
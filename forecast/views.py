@@ -2,14 +2,10 @@ from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
 from django.utils import timezone
-from .models import Forecast, ForecastPoint, Pattern
+from .models import Forecast
+from .persistence import save_forecast
+from .services import forecast_prediction
 from dashboard.models import Asset
-from core.data_fetchers import CryptoDataFetcher
-from core.ml_baseline import MLForecastBaseline
-try:
-    from core.better_ml import BetterMLForecast
-except Exception:
-    BetterMLForecast = None
 from datetime import datetime, timedelta
 
 
@@ -48,72 +44,16 @@ def run_forecast(request):
             messages.error(request, 'Asset not found')
             return redirect('forecast:index')
         
-        # Get historical price data
-        symbol_map = {
-            'BTC/USD': 'bitcoin',
-            'ETH/USD': 'ethereum',
-        }
-        crypto_symbol = symbol_map.get(asset_symbol, 'bitcoin')
+        # Prefer improved ML model if available; fallback to baseline.
+        # Identical requests within the cache TTL share one prediction.
+        prediction = forecast_prediction(asset, horizon_days, 'better')
         
-        # Fetch historical data
-        historical = CryptoDataFetcher.get_historical_data(crypto_symbol, days=30)
-        
-        if not historical:
-            # Use current price as fallback
-            prices = [float(asset.current_price)]
-            timestamps = [timezone.now()]
-        else:
-            prices = [float(p['price']) for p in historical]
-            timestamps = [p['timestamp'] for p in historical]
-        
-        # Prefer improved ML model if available; fallback to baseline
-        prediction = None
-        if BetterMLForecast:
-            try:
-                better = BetterMLForecast(prices, timestamps)
-                prediction = better.predict(horizon_days=horizon_days)
-            except Exception:
-                prediction = None
-
-        if prediction is None:
-            baseline = MLForecastBaseline(prices, timestamps)
-            prediction = baseline.predict(horizon_days=horizon_days)
-        
-        # Create forecast
-        forecast = Forecast.objects.create(
-            user=request.user,
-            asset=asset,
-            prediction_horizon_days=horizon_days,
-            risk_tolerance=risk_tolerance,
-            current_price=prediction['current_price'],
-            predicted_high=prediction['predicted_high'],
-            predicted_low=prediction['predicted_low'],
-            confidence_score=prediction['confidence'],
-            rsi_divergence=rsi_divergence,
-            macd_crossover=macd_crossover,
-            sentiment_analysis=sentiment_analysis,
+        # Save the forecast with its points and patterns in one transaction
+        forecast, _, _ = save_forecast(
+            request.user, asset, prediction, horizon_days, risk_tolerance,
+            rsi_divergence=rsi_divergence, macd_crossover=macd_crossover, sentiment_analysis=sentiment_analysis,
         )
         
-        # Create forecast points
-        for point in prediction['forecast_points']:
-            ForecastPoint.objects.create(
-                forecast=forecast,
-                date=point['date'],
-                predicted_price=point['price'],
-                confidence_upper=point['confidence_upper'],
-                confidence_lower=point['confidence_lower'],
-            )
-        
-        # Create detected patterns
-        for pattern_data in prediction['patterns']:
-            Pattern.objects.create(
-                forecast=forecast,
-                asset=asset,
-                pattern_type=pattern_data['type'],
-                timeframe='1D',
-                match_percentage=pattern_data['confidence'],
-            )
-        
         messages.success(request, f'Forecast generated successfully!')
         return redirect('forecast:results', forecast_id=forecast.id)
     
@@ -138,3 +138,83 @@ LOGOUT_REDIRECT_URL = '/accounts/login/'
 # https://docs.djangoproject.com/en/5.0/ref/settings/#default-auto-field
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
+
+# Local market data storage
+# Closed Binance candles are cached on disk so repeated backtests do not refetch them.
+CANDLE_STORE_DIR = BASE_DIR / 'var' / 'candles'
+
+# Background ingestion (`python manage.py ingest_market_data`): seconds between refreshes.
+INGESTION_INTERVALS = {
+    'indicators': 30,
+    'sentiment': 300,
+    'patterns': 60,
+}
+
+# Binance intervals scanned for live pattern alerts by ingest_market_data
+LIVE_PATTERN_INTERVALS = ['1h']
+
+# `python manage.py scan_patterns`: default intervals and process pool size (None = CPU count)
+PATTERN_SCAN_INTERVALS = ['1h', '4h', '1d']
+PATTERN_SCAN_WORKERS = None
+
+# Server-Sent Events dashboard stream (dashboard/stream.py); needs an ASGI server
+LIVE_STREAM = {
+    'POLL_SECONDS': 2.0,       # DB feed interval while clients are connected
+    'HEARTBEAT_SECONDS': 15.0,
+    'RETRY_MS': 5000,          # client reconnect delay
+}
+
+# Retention for indicator, sentiment and price history (python manage.py compact_market_data).
+# Raw rows older than RAW_DAYS become 1m/5m/1h/1d rollups; each tier is kept its own number of days (None = forever).
+DATA_RETENTION = {
+    'RAW_DAYS': 7,
+    'MINUTE_DAYS': 30,
+    'FIVE_MINUTE_DAYS': 90,
+    'HOUR_DAYS': 365,
+    'DAY_DAYS': None,
+    'BATCH_SIZE': 5000,  # raw rows aggregated and deleted per transaction
+}
+
+# Pattern detection jobs (/api/patterns/detect/), stored as DetectionJob rows and
+# executed by `python manage.py run_detection_worker`. TIMEOUT_SECONDS is also
+# the upper bound for a client-supplied timeout; finished jobs are deleted
+# RETENTION_SECONDS after they end.
+PATTERN_JOBS = {
+    'MAX_PENDING': 32,
+    'TIMEOUT_SECONDS': 300,
+    'POLL_SECONDS': 1.0,
+    'RETENTION_SECONDS': 3600,
+}
+
+# Fitted forecast models, reused until new candles arrive or TTL_SECONDS pass
+MODEL_REGISTRY = {
+    'DIR': BASE_DIR / 'var' / 'models',
+    'MAX_MEMORY_MB': 256,
+    'TTL_SECONDS': 24 * 3600,
+}
+
+# Backtest parameter sweeps (/api/forecast/backtest/sweep/)
+# Backtest queue worker (python manage.py run_backtest_worker)
+BACKTEST_QUEUE = {
+    'WORKERS': 2,
+    'TIMEOUT_SECONDS': 600,
+    'POLL_SECONDS': 1.0,
+}
+
+# Forecast result cache and the price-history cache in front of it (core/cache.py)
+FORECAST_CACHE = {
+    'MAX_ENTRIES': 256,
+    'TTL_SECONDS': 300,
+    'HISTORY_MAX_ENTRIES': 64,
+    'HISTORY_TTL_SECONDS': 60,
+}
+
+# Saved backtest results (forecast/persistence.py)
+BACKTEST_PERSISTENCE = {
+    'BATCH_SIZE': 2000,
+    'COMPACT_EQUITY': False,  # store equity curves as one compressed blob per run
+}
+
+SWEEP_WORKERS = None  # process pool size; None uses every CPU
+SWEEP_MAX_COMBINATIONS = 20000
+SWEEP_MAX_CANDLES = 5000  # sweeps run inside the request; this bounds the Binance backfill to ~5 pages
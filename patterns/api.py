@@ -2,16 +2,104 @@ from rest_framework.decorators import api_view, permission_classes
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 from rest_framework import status
-from .models import DetectedPattern, PatternAlert
+from django.conf import settings
+from django.urls import reverse
+from .models import DetectedPattern, DetectionJob, PatternAlert
+from .services import DetectionQueue, detection_config
+from dashboard.models import Asset
 from django.utils import timezone
 from datetime import timedelta
+import uuid
+
+BINANCE_INTERVALS = {'15m', '30m', '1h', '2h', '4h', '6h', '12h', '1d', '1w'}
+
+
+def _job_urls(request, job):
+    return {
+        'status_url': request.build_absolute_uri(reverse('patterns_api:job_status', args=[job.pk])),
+        'results_url': request.build_absolute_uri(reverse('patterns_api:job_results', args=[job.pk])),
+    }
+
+
+def _owned_job(request, job_id):
+    try:
+        job_id = uuid.UUID(job_id)
+    except ValueError:
+        return None
+    return DetectionJob.objects.filter(pk=job_id, user=request.user).first()
 
 
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
 def detect_patterns_api(request):
-    """API endpoint to run pattern detection"""
-    return Response({'message': 'Pattern detection API endpoint'}, status=status.HTTP_200_OK)
+    """Queue pattern detection for ``run_detection_worker``.
+
+    Body: ``assets`` (symbols, default all), ``timeframes`` (e.g. ``["1h", "4H"]``,
+    default ``PATTERN_SCAN_INTERVALS``), ``save`` (default true), ``timeout``
+    (seconds, capped at ``PATTERN_JOBS['TIMEOUT_SECONDS']``). Returns 202
+    with the job id; poll the status/results URLs.
+    """
+    symbols = request.data.get('assets') or []
+    timeframes = request.data.get('timeframes') or getattr(settings, 'PATTERN_SCAN_INTERVALS', ['1h'])
+    if isinstance(symbols, str):
+        symbols = [symbols]
+    if isinstance(timeframes, str):
+        timeframes = [timeframes]
+
+    intervals = [t if t.endswith('m') else t.lower() for t in timeframes]
+    unknown = sorted(set(intervals) - BINANCE_INTERVALS)
+    if unknown:
+        return Response({'error': f"Unsupported timeframes: {', '.join(unknown)}"},
+                        status=status.HTTP_400_BAD_REQUEST)
+
+    assets = Asset.objects.filter(symbol__in=symbols) if symbols else Asset.objects.all()
+    asset_ids = list(assets.values_list('pk', flat=True))
+    if not asset_ids:
+        return Response({'error': 'No matching assets'}, status=status.HTTP_400_BAD_REQUEST)
+
+    max_timeout = detection_config()['TIMEOUT_SECONDS']
+    timeout = None
+    if request.data.get('timeout') not in (None, ''):
+        try:
+            timeout = float(request.data['timeout'])
+        except (TypeError, ValueError):
+            timeout = None
+        if timeout is None or not timeout > 0:
+            return Response({'error': 'timeout must be a positive number of seconds'},
+                            status=status.HTTP_400_BAD_REQUEST)
+        # Clients may shorten the PATTERN_JOBS deadline, never lift it.
+        timeout = min(timeout, max_timeout)
+
+    job = DetectionQueue.submit(request.user, asset_ids, intervals, timeout=timeout,
+                                save=str(request.data.get('save', True)).lower() not in ('false', '0'))
+    if job is None:
+        return Response({'error': 'Too many detection jobs are already queued or running'},
+                        status=status.HTTP_503_SERVICE_UNAVAILABLE)
+
+    return Response({'job_id': str(job.pk), 'status': job.status, **_job_urls(request, job)},
+                    status=status.HTTP_202_ACCEPTED)
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def job_status_api(request, job_id):
+    """Status and progress of a pattern detection job"""
+    job = _owned_job(request, job_id)
+    if job is None:
+        return Response({'error': 'Job not found'}, status=status.HTTP_404_NOT_FOUND)
+    return Response({**DetectionQueue.payload(job), **_job_urls(request, job)})
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def job_results_api(request, job_id):
+    """Results of a finished job; 202 with the status while it is still queued or running"""
+    job = _owned_job(request, job_id)
+    if job is None:
+        return Response({'error': 'Job not found'}, status=status.HTTP_404_NOT_FOUND)
+    if not job.finished:
+        return Response(DetectionQueue.payload(job), status=status.HTTP_202_ACCEPTED)
+    return Response(DetectionQueue.payload(job, include_result=True))
 
 
 @api_view(['GET'])
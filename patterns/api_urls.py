@@ -5,6 +5,8 @@ app_name = 'patterns_api'
 
 urlpatterns = [
     path('detect/', api.detect_patterns_api, name='detect'),
+    path('jobs/<str:job_id>/', api.job_status_api, name='job_status'),
+    path('jobs/<str:job_id>/results/', api.job_results_api, name='job_results'),
     path('live/', api.live_alerts, name='live'),
     path('history/', api.pattern_history_api, name='history'),
 ]
@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand
+
+from patterns.services import DetectionQueue, detection_config
+
+
+class Command(BaseCommand):
+    help = (
+        "Execute pattern detection jobs queued through /api/patterns/detect/. Jobs are claimed atomically, "
+        "so several workers can share the queue; each runs one job at a time."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--poll', type=float, default=detection_config()['POLL_SECONDS'],
+                            help='Seconds between queue polls (default: PATTERN_JOBS POLL_SECONDS).')
+        parser.add_argument('--once', action='store_true',
+                            help='Exit once the queue is empty instead of waiting for new jobs.')
+
+    def handle(self, *args, **options):
+        self.stdout.write("Detection worker started")
+        try:
+            processed = DetectionQueue.run_worker(poll_seconds=options['poll'], once=options['once'],
+                                                  log=self.stdout.write)
+        except KeyboardInterrupt:
+            self.stdout.write("Detection worker stopped")
+            return
+        self.stdout.write(f"Processed {processed} jobs")
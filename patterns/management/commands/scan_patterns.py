@@ -0,0 +1,34 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from dashboard.models import Asset
+from patterns.services import PatternScanService
+
+
+class Command(BaseCommand):
+    help = (
+        "Scan every asset x timeframe for chart patterns using candles already in the local "
+        "candle store (filled by ingest_market_data and the klines endpoints) and save new detections."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--timeframes', nargs='+', default=getattr(settings, 'PATTERN_SCAN_INTERVALS', ['1h']),
+                            help='Binance intervals to scan, e.g. 15m 1h 4h 1d.')
+        parser.add_argument('--assets', nargs='+', help='Asset symbols to scan (default: all assets).')
+        parser.add_argument('--workers', type=int, default=None,
+                            help='Process pool size (default: PATTERN_SCAN_WORKERS or the CPU count).')
+        parser.add_argument('--limit', type=int, default=PatternScanService.DEFAULT_LIMIT,
+                            help='Most recent candles scanned per asset/timeframe.')
+
+    def handle(self, *args, **options):
+        assets = Asset.objects.all()
+        if options['assets']:
+            assets = assets.filter(symbol__in=options['assets'])
+
+        report = PatternScanService.run(assets, options['timeframes'], workers=options['workers'],
+                                        limit=options['limit'])
+        self.stdout.write(
+            f"Scanned {report['tasks']} asset-timeframes ({report['with_data']} with data, "
+            f"{report['candles']} candles) on {report['workers']} workers in {report['elapsed_seconds']:.2f}s "
+            f"({report['throughput']:.1f} asset-timeframes/s); {report['patterns']} new patterns"
+        )
@@ -1,3 +1,5 @@
+import uuid
+
 from django.db import models
 from django.contrib.auth.models import User
 from dashboard.models import Asset
@@ -61,3 +63,42 @@ class PatternHistory(models.Model):
     
     def __str__(self):
         return f"{self.pattern} - Accuracy: {self.accuracy}%"
+
+
+class DetectionJob(models.Model):
+    """A queued pattern detection request, executed by ``run_detection_worker``."""
+
+    STATUS_CHOICES = [
+        ('queued', 'Queued'),
+        ('running', 'Running'),
+        ('completed', 'Completed'),
+        ('failed', 'Failed'),
+        ('timeout', 'Timed out'),
+    ]
+    FINISHED = ('completed', 'failed', 'timeout')
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='detection_jobs')
+    asset_ids = models.JSONField(default=list)
+    intervals = models.JSONField(default=list)
+    save_results = models.BooleanField(default=True)
+    timeout = models.FloatField(help_text="Seconds of run time before the job is stopped")
+    status = models.CharField(max_length=16, choices=STATUS_CHOICES, default='queued')
+    done = models.IntegerField(default=0)
+    total = models.IntegerField(default=0)
+    result = models.JSONField(null=True, blank=True)
+    error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    start_time = models.DateTimeField(null=True, blank=True)
+    end_time = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['-created_at']
+        indexes = [models.Index(fields=['status', 'created_at'])]
+
+    def __str__(self):
+        return f"Detection job {self.id} ({self.status})"
+
+    @property
+    def finished(self) -> bool:
+        return self.status in self.FINISHED
@@ -0,0 +1,446 @@
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta, timezone as dt_timezone
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.utils import timezone
+
+from core.candle_store import CandleStore, get_candle_store
+from core.candles import CandleSeries
+from core.data_fetchers import CryptoDataFetcher
+from core.pattern_engine import IncrementalPatternEngine
+from core.pattern_scanner import events_to_dicts, scan_patterns
+from dashboard.models import Asset
+from .models import DetectedPattern, DetectionJob, PatternAlert
+
+
+# Expected price direction once a pattern plays out; used to settle
+# invalidated patterns as success or failure.
+BULLISH_PATTERNS = {'bull_flag', 'double_bottom', 'ascending_triangle', 'golden_cross'}
+BEARISH_PATTERNS = {'bear_flag', 'head_shoulders', 'double_top', 'descending_triangle', 'death_cross'}
+
+
+def timeframe_label(interval: str) -> str:
+    """Display timeframe for a Binance interval: '15m' stays, '1h' -> '1H', '1d' -> '1D'."""
+    return interval if interval.endswith('m') else interval.upper()
+
+
+def pattern_message(pattern_type: str, confidence: int) -> str:
+    return f"{pattern_type.replace('_', ' ').title()} pattern detected with {confidence}% confidence"
+
+
+class LivePatternService:
+    """Feeds closed candles through per-asset incremental engines and persists the deltas.
+
+    Engine state is snapshotted under the candle store directory after every
+    update, so a restarted worker resumes where it stopped instead of warming
+    up again (which would silently skip the candles closed while it was down).
+    """
+
+    # Candles replayed to warm up a new engine (covers the 200-period SMA).
+    WARMUP_CANDLES = 260
+
+    _engines: Dict[Tuple[int, str], IncrementalPatternEngine] = {}
+    _lock = threading.RLock()
+
+    @staticmethod
+    def _state_path(asset: Asset, timeframe: str) -> Path:
+        safe_symbol = ''.join(ch for ch in asset.symbol.upper() if ch.isalnum())
+        return get_candle_store().root / 'pattern_engines' / f'{safe_symbol}_{timeframe}.json'
+
+    @staticmethod
+    def _save_state(asset: Asset, timeframe: str, engine: IncrementalPatternEngine):
+        path = LivePatternService._state_path(asset, timeframe)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_name(f'{path.name}.{uuid.uuid4().hex}.tmp')
+        tmp.write_bytes(engine.to_bytes())
+        os.replace(tmp, path)
+
+    @staticmethod
+    def _load_state(asset: Asset, timeframe: str) -> Optional[IncrementalPatternEngine]:
+        try:
+            return IncrementalPatternEngine.from_bytes(LivePatternService._state_path(asset, timeframe).read_bytes())
+        except FileNotFoundError:
+            return None
+        except (ValueError, KeyError, TypeError) as e:
+            print(f"Discarding unreadable pattern engine state for {asset.symbol} {timeframe}: {e}")
+            return None
+
+    @staticmethod
+    def engine_for(asset: Asset, timeframe: str, history: CandleSeries = None) -> IncrementalPatternEngine:
+        """Return the engine for this asset/timeframe.
+
+        A missing engine is restored from its snapshot, or else created and
+        warmed on ``history`` silently.
+        """
+        key = (asset.pk, timeframe)
+        with LivePatternService._lock:
+            engine = LivePatternService._engines.get(key)
+            if engine is None:
+                engine = LivePatternService._load_state(asset, timeframe)
+                if engine is None:
+                    engine = IncrementalPatternEngine()
+                    if history is not None and len(history):
+                        # Patterns already matching at startup are not re-announced.
+                        engine.extend(history, emit=False)
+                        LivePatternService._save_state(asset, timeframe, engine)
+                LivePatternService._engines[key] = engine
+            return engine
+
+    @staticmethod
+    def process(asset: Asset, timeframe: str, candles: CandleSeries) -> List[Dict]:
+        """Apply the candles not yet seen for ``asset``/``timeframe`` and save the resulting deltas.
+
+        A new engine is warmed on ``candles``, so the first call returns no deltas.
+        """
+        with LivePatternService._lock:
+            engine = LivePatternService.engine_for(asset, timeframe, candles)
+            seen = engine.count
+            deltas = engine.extend(candles)
+            if engine.count != seen:
+                LivePatternService._save_state(asset, timeframe, engine)
+        if deltas:
+            LivePatternService.save_deltas(asset, timeframe, deltas)
+        return deltas
+
+    @staticmethod
+    def _settle(delta: Dict) -> str:
+        move = delta['exit_price'] - delta['entry_price']
+        if delta['type'] in BULLISH_PATTERNS:
+            return 'success' if move > 0 else 'failed'
+        if delta['type'] in BEARISH_PATTERNS:
+            return 'success' if move < 0 else 'failed'
+        return 'success'
+
+    @staticmethod
+    def save_deltas(asset: Asset, timeframe: str, deltas: List[Dict]):
+        """Create DetectedPattern/PatternAlert rows for completed patterns and close invalidated ones."""
+        now = timezone.now()
+        pending = {}  # type -> DetectedPattern completed earlier in this batch, not saved yet
+        created = []
+        with transaction.atomic():
+            for delta in deltas:
+                if delta['event'] == 'completed':
+                    pattern = DetectedPattern(pattern_type=delta['type'], asset=asset, timeframe=timeframe,
+                                              confidence=delta['confidence'], status='active')
+                    pending[delta['type']] = pattern
+                    created.append((delta, pattern))
+                    continue
+                pattern = pending.pop(delta['type'], None)
+                if pattern is None:
+                    pattern = (DetectedPattern.objects
+                               .filter(asset=asset, timeframe=timeframe, pattern_type=delta['type'], status='active')
+                               .order_by('-detected_at').first())
+                    if pattern is None:
+                        continue
+                    DetectedPattern.objects.filter(pk=pattern.pk).update(
+                        status=LivePatternService._settle(delta), completed_at=now)
+                else:
+                    pattern.status = LivePatternService._settle(delta)
+                    pattern.completed_at = now
+
+            patterns = DetectedPattern.objects.bulk_create([pattern for _, pattern in created])
+            PatternAlert.objects.bulk_create([
+                PatternAlert(alert_type='pattern', asset=asset, pattern=pattern,
+                             message=pattern_message(delta['type'], delta['confidence']),
+                             confidence=delta['confidence'])
+                for (delta, _), pattern in zip(created, patterns)
+            ])
+
+    @staticmethod
+    def sync_live(intervals: List[str] = None) -> Dict[str, str]:
+        """Pull the latest closed candles for every crypto asset and process them.
+
+        Returns a per asset/timeframe report of how many deltas were saved.
+        """
+        intervals = intervals or getattr(settings, 'LIVE_PATTERN_INTERVALS', ['1h'])
+        report = {}
+        for asset in Asset.objects.filter(asset_type='crypto'):
+            symbol = CryptoDataFetcher.binance_symbol(asset.symbol)
+            for interval in intervals:
+                candles = CryptoDataFetcher.get_binance_klines(
+                    symbol, interval=interval, limit=LivePatternService.WARMUP_CANDLES)
+                if not len(candles):
+                    report[f'{asset.symbol} {interval}'] = 'empty'
+                    continue
+                try:
+                    deltas = LivePatternService.process(asset, timeframe_label(interval), candles)
+                    report[f'{asset.symbol} {interval}'] = f'{len(deltas)} deltas'
+                except Exception as e:
+                    report[f'{asset.symbol} {interval}'] = f'error: {e}'
+        return report
+
+
+def _scan_stored(task: Tuple[str, str, str, int]) -> Tuple[int, List[Dict]]:
+    """Worker: scan one (symbol, interval) from the candle store.
+
+    Returns the candle count and the patterns matching at the latest candle.
+    Runs in a pool process, so it only touches files, never the database.
+    """
+    root, symbol, interval, limit = task
+    series = CandleSeries.from_columns(CandleStore(root).read(symbol, interval, limit=limit))
+    if not len(series):
+        return 0, []
+    events = scan_patterns(series)
+    latest = events[events['end'] == len(series) - 1]
+    return len(series), events_to_dicts(latest, series.timestamp)
+
+
+class PatternScanService:
+    """Scan many assets x timeframes from the local candle store on a process pool."""
+
+    DEFAULT_LIMIT = 500
+
+    @staticmethod
+    def save_new(tasks: Sequence[Tuple[Asset, str]], detections: Sequence[List[Dict]]) -> List[DetectedPattern]:
+        """Save detections (one list per (asset, timeframe) task) not already recorded.
+
+        A detection is skipped when an active pattern of the same type was
+        recorded after its run started, i.e. an earlier scan saw this run.
+        """
+        batch = [(asset, timeframe, detection, datetime.fromtimestamp(detection['start_time'] / 1000, tz=dt_timezone.utc))
+                 for (asset, timeframe), task_detections in zip(tasks, detections)
+                 for detection in task_detections]
+        if not batch:
+            return []
+
+        # Latest active detection per (asset, timeframe, type) in the batch, in one query.
+        latest = {}
+        recorded = DetectedPattern.objects.filter(
+            asset__in={asset.pk for asset, _, _, _ in batch},
+            timeframe__in={timeframe for _, timeframe, _, _ in batch},
+            pattern_type__in={detection['type'] for _, _, detection, _ in batch},
+            status='active', detected_at__gte=min(started for _, _, _, started in batch),
+        ).values_list('asset_id', 'timeframe', 'pattern_type', 'detected_at')
+        for asset_id, timeframe, pattern_type, detected_at in recorded:
+            key = (asset_id, timeframe, pattern_type)
+            latest[key] = max(latest.get(key, detected_at), detected_at)
+
+        found = []
+        for asset, timeframe, detection, run_started in batch:
+            seen = latest.get((asset.pk, timeframe, detection['type']))
+            if seen is None or seen < run_started:
+                found.append((asset, timeframe, detection))
+
+        with transaction.atomic():
+            patterns = DetectedPattern.objects.bulk_create([
+                DetectedPattern(pattern_type=d['type'], asset=asset, timeframe=timeframe,
+                                confidence=d['confidence'], status='active')
+                for asset, timeframe, d in found
+            ])
+            PatternAlert.objects.bulk_create([
+                PatternAlert(alert_type='pattern', asset=asset, pattern=pattern,
+                             message=pattern_message(d['type'], d['confidence']), confidence=d['confidence'])
+                for (asset, _, d), pattern in zip(found, patterns)
+            ])
+        return patterns
+
+    @staticmethod
+    def run(assets: Optional[Sequence[Asset]] = None, intervals: Sequence[str] = ('1h',),
+            workers: Optional[int] = None, limit: Optional[int] = None) -> Dict:
+        """Scan every asset x interval and save the new detections.
+
+        ``workers`` defaults to ``settings.PATTERN_SCAN_WORKERS`` (CPU count
+        when unset); with one worker everything runs in-process. Returns
+        counts and throughput in asset-timeframes per second.
+        """
+        started = time.perf_counter()
+        assets = list(Asset.objects.all() if assets is None else assets)
+        limit = limit or PatternScanService.DEFAULT_LIMIT
+        root = str(get_candle_store().root)
+
+        pairs = [(asset, interval) for asset in assets for interval in intervals]
+        jobs = [(root, CryptoDataFetcher.binance_symbol(asset.symbol), interval, limit) for asset, interval in pairs]
+        workers = workers or getattr(settings, 'PATTERN_SCAN_WORKERS', None) or os.cpu_count() or 1
+        workers = max(1, min(workers, len(jobs)))
+
+        if workers == 1:
+            results = [_scan_stored(job) for job in jobs]
+        else:
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                results = list(pool.map(_scan_stored, jobs, chunksize=max(1, len(jobs) // (workers * 4))))
+        scanned = time.perf_counter()
+
+        tasks = [(asset, timeframe_label(interval)) for asset, interval in pairs]
+        patterns = PatternScanService.save_new(tasks, [detections for _, detections in results])
+
+        elapsed = time.perf_counter() - started
+        return {
+            'tasks': len(jobs),
+            'with_data': sum(1 for count, _ in results if count),
+            'candles': sum(count for count, _ in results),
+            'patterns': len(patterns),
+            'workers': workers if jobs else 0,
+            'scan_seconds': round(scanned - started, 3),
+            'elapsed_seconds': round(elapsed, 3),
+            'throughput': round(len(jobs) / elapsed, 1) if elapsed > 0 else 0.0,
+        }
+
+    @staticmethod
+    def detect_job(job, asset_ids: Sequence[int], intervals: Sequence[str], save: bool = True,
+                   limit: Optional[int] = None) -> Dict:
+        """Background job body: scan and (optionally) save each asset x interval.
+
+        Candles are read from the local candle store (kept current by the
+        ingestion worker), so a request never waits on Binance. Progress is
+        reported after every pair, which is also where the job's timeout is
+        enforced.
+        """
+        limit = limit or PatternScanService.DEFAULT_LIMIT
+        store = get_candle_store()
+        assets = list(Asset.objects.filter(pk__in=asset_ids).order_by('symbol'))
+        pairs = [(asset, interval) for asset in assets for interval in intervals]
+        job.progress(0, len(pairs))
+
+        results = []
+        for done, (asset, interval) in enumerate(pairs, start=1):
+            candles = CandleSeries.from_columns(
+                store.read(CryptoDataFetcher.binance_symbol(asset.symbol), interval, limit=limit))
+            detections = []
+            if len(candles):
+                events = scan_patterns(candles)
+                detections = events_to_dicts(events[events['end'] == len(candles) - 1], candles.timestamp)
+            timeframe = timeframe_label(interval)
+            saved = len(PatternScanService.save_new([(asset, timeframe)], [detections])) if save else 0
+            results.append({
+                'asset': asset.symbol,
+                'timeframe': timeframe,
+                'candles': len(candles),
+                'saved': saved,
+                'patterns': [{'type': d['type'], 'confidence': d['confidence'],
+                              'start_time': d['start_time'], 'end_time': d['end_time']} for d in detections],
+            })
+            job.progress(done)
+        return {'items': results, 'patterns': sum(len(r['patterns']) for r in results),
+                'saved': sum(r['saved'] for r in results)}
+
+
+def detection_config() -> Dict:
+    config = {'MAX_PENDING': 32, 'TIMEOUT_SECONDS': 300, 'POLL_SECONDS': 1.0, 'RETENTION_SECONDS': 3600}
+    config.update(getattr(settings, 'PATTERN_JOBS', {}))
+    return config
+
+
+class JobTimeout(Exception):
+    """Raised inside a detection job that ran past its timeout."""
+
+
+class _JobProgress:
+    """The ``job`` handle ``detect_job`` reports to: saves progress and enforces the timeout."""
+
+    def __init__(self, job: DetectionJob):
+        self.job_id = job.pk
+        self.timeout = job.timeout
+        self.deadline = time.monotonic() + job.timeout
+
+    def progress(self, done: int, total: Optional[int] = None):
+        fields = {'done': done} if total is None else {'done': done, 'total': total}
+        DetectionJob.objects.filter(pk=self.job_id).update(**fields)
+        if time.monotonic() > self.deadline:
+            raise JobTimeout(f"Job exceeded its {self.timeout:g}s timeout")
+
+
+class DetectionQueue:
+    """``DetectionJob`` rows used as a job queue, like ``forecast.services.BacktestQueue``.
+
+    The API only inserts rows, so any web process can answer a status poll
+    and scanning never runs in a web worker. ``run_worker`` claims jobs with
+    a conditional UPDATE (several workers can share the queue) and runs
+    them one at a time.
+    """
+
+    @staticmethod
+    def submit(user, asset_ids: Sequence[int], intervals: Sequence[str], save: bool = True,
+               timeout: Optional[float] = None) -> Optional[DetectionJob]:
+        """Queue a job; None when ``MAX_PENDING`` jobs are already queued or running."""
+        config = detection_config()
+        if DetectionJob.objects.filter(status__in=('queued', 'running')).count() >= config['MAX_PENDING']:
+            return None
+        return DetectionJob.objects.create(user=user, asset_ids=list(asset_ids), intervals=list(intervals),
+                                           save_results=save, timeout=timeout or config['TIMEOUT_SECONDS'])
+
+    @staticmethod
+    def claim() -> Optional[DetectionJob]:
+        """Atomically move the oldest queued job to ``running``."""
+        for pk in DetectionJob.objects.filter(status='queued').order_by('created_at').values_list('pk', flat=True)[:2]:
+            if DetectionJob.objects.filter(pk=pk, status='queued').update(status='running', start_time=timezone.now()):
+                return DetectionJob.objects.get(pk=pk)
+        return None
+
+    @staticmethod
+    def execute(job: DetectionJob) -> str:
+        """Run a claimed job and store its result. Returns the final status."""
+        try:
+            result = PatternScanService.detect_job(_JobProgress(job), job.asset_ids, job.intervals,
+                                                   save=job.save_results)
+            DetectionJob.objects.filter(pk=job.pk).update(status='completed', result=result, end_time=timezone.now())
+            return 'completed'
+        except JobTimeout as e:
+            DetectionJob.objects.filter(pk=job.pk).update(status='timeout', error=str(e), end_time=timezone.now())
+            return 'timeout'
+        except Exception as e:
+            print(f"Detection job {job.pk} failed: {e}")
+            DetectionJob.objects.filter(pk=job.pk).update(status='failed', error=str(e), end_time=timezone.now())
+            return 'failed'
+
+    @staticmethod
+    def cleanup(config: Dict) -> int:
+        """Fail jobs left ``running`` by a stopped worker and delete expired finished ones."""
+        now = timezone.now()
+        abandoned = DetectionJob.objects.filter(
+            status='running', start_time__lt=now - timedelta(seconds=2 * config['TIMEOUT_SECONDS']),
+        ).update(status='failed', error='Abandoned by a stopped worker', end_time=now)
+        DetectionJob.objects.filter(status__in=DetectionJob.FINISHED,
+                                    end_time__lt=now - timedelta(seconds=config['RETENTION_SECONDS'])).delete()
+        return abandoned
+
+    @staticmethod
+    def run_worker(poll_seconds: Optional[float] = None, once: bool = False, log=print) -> int:
+        """Claim and execute queued jobs until interrupted; returns the number processed.
+
+        A failing iteration (e.g. the database is briefly locked) is logged
+        and retried after ``poll_seconds``. With ``once`` the worker exits
+        when the queue is empty.
+        """
+        config = detection_config()
+        poll_seconds = poll_seconds if poll_seconds is not None else config['POLL_SECONDS']
+        processed = 0
+        while True:
+            close_old_connections()
+            try:
+                abandoned = DetectionQueue.cleanup(config)
+                if abandoned:
+                    log(f"Marked {abandoned} abandoned jobs as failed")
+                job = DetectionQueue.claim()
+                if job is not None:
+                    log(f"Job {job.pk}: {DetectionQueue.execute(job)}")
+                    processed += 1
+                    continue
+            except Exception as e:
+                log(f"Detection worker iteration failed: {e}")
+            if once:
+                return processed
+            time.sleep(poll_seconds)
+
+    @staticmethod
+    def payload(job: DetectionJob, include_result: bool = False) -> Dict:
+        data = {
+            'job_id': str(job.pk),
+            'name': 'detect_patterns',
+            'status': job.status,
+            'progress': {'done': job.done, 'total': job.total,
+                         'percent': round(100.0 * job.done / job.total, 1) if job.total else 0.0},
+            'error': job.error or None,
+            'created_at': job.created_at.isoformat(),
+            'started_at': job.start_time.isoformat() if job.start_time else None,
+            'finished_at': job.end_time.isoformat() if job.end_time else None,
+        }
+        if include_result:
+            data['result'] = job.result
+        return data
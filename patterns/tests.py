@@ -1,3 +1,218 @@
-from django.test import TestCase
+import tempfile
+import time
+from io import StringIO
+from unittest import mock
 
-# Create your tests here.
+import numpy as np
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.db import OperationalError
+from django.test import TestCase, override_settings
+
+from core.candle_store import CandleStore
+from core.candles import CandleSeries
+from core.pattern_scanner import scan_patterns
+from dashboard.models import Asset
+from .models import DetectedPattern, DetectionJob, PatternAlert
+from .services import DetectionQueue, LivePatternService, PatternScanService, detection_config
+
+
+def doji_series(n, doji_at):
+    close = 100 + np.arange(n, dtype=float)
+    open_ = close - 0.5
+    open_[doji_at] = close[doji_at]
+    return CandleSeries(np.arange(n) * 3_600_000, open_, close + 1, open_ - 1, close)
+
+
+class LivePatternServiceTests(TestCase):
+    def setUp(self):
+        LivePatternService._engines.clear()
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        patcher = mock.patch('patterns.services.get_candle_store', return_value=CandleStore(tmp.name))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.asset = Asset.objects.create(symbol='BTC/USD', name='Bitcoin', asset_type='crypto')
+
+    def test_warm_up_is_silent_then_new_candles_create_alerts(self):
+        series = doji_series(40, doji_at=[10, 35])
+        self.assertEqual(scan_patterns(series, types=['doji'])['end'].tolist(), [10, 35])
+
+        self.assertEqual(LivePatternService.process(self.asset, '1H', series[:30]), [])
+        self.assertFalse(DetectedPattern.objects.exists())
+
+        deltas = LivePatternService.process(self.asset, '1H', series)
+        self.assertEqual([(d['event'], d['type']) for d in deltas],
+                         [('completed', 'doji'), ('invalidated', 'doji')])
+        pattern = DetectedPattern.objects.get()
+        self.assertEqual((pattern.pattern_type, pattern.timeframe, pattern.status), ('doji', '1H', 'success'))
+        self.assertIsNotNone(pattern.completed_at)
+        self.assertEqual(PatternAlert.objects.get().pattern, pattern)
+
+        # Re-sending the same candles changes nothing.
+        self.assertEqual(LivePatternService.process(self.asset, '1H', series), [])
+        self.assertEqual(DetectedPattern.objects.count(), 1)
+
+    def test_engine_state_survives_a_restart(self):
+        series = doji_series(40, doji_at=[35])
+        self.assertEqual(LivePatternService.process(self.asset, '1H', series[:30]), [])
+
+        # A new worker process starts with no engines in memory.
+        LivePatternService._engines.clear()
+        deltas = LivePatternService.process(self.asset, '1H', series)
+        self.assertEqual([(d['event'], d['type']) for d in deltas],
+                         [('completed', 'doji'), ('invalidated', 'doji')])
+        self.assertEqual(LivePatternService._engines[(self.asset.pk, '1H')].count, 40)
+
+    def test_invalidated_patterns_settle_by_price_move(self):
+        LivePatternService.save_deltas(self.asset, '4H', [
+            {'event': 'completed', 'type': 'double_top', 'confidence': 80},
+            {'event': 'completed', 'type': 'bull_flag', 'confidence': 70},
+        ])
+        LivePatternService.save_deltas(self.asset, '4H', [
+            {'event': 'invalidated', 'type': 'double_top', 'entry_price': 100.0, 'exit_price': 95.0},
+            {'event': 'invalidated', 'type': 'bull_flag', 'entry_price': 100.0, 'exit_price': 95.0},
+        ])
+
+        statuses = dict(DetectedPattern.objects.values_list('pattern_type', 'status'))
+        self.assertEqual(statuses, {'double_top': 'success', 'bull_flag': 'failed'})
+        self.assertEqual(PatternAlert.objects.count(), 2)
+
+
+class PatternScanServiceTests(TestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.store = CandleStore(tmp.name)
+        patcher = mock.patch('patterns.services.get_candle_store', return_value=self.store)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        self.btc = Asset.objects.create(symbol='BTC/USD', name='Bitcoin', asset_type='crypto')
+        self.eth = Asset.objects.create(symbol='ETH/USD', name='Ethereum', asset_type='crypto')
+        Asset.objects.create(symbol='AAPL', name='Apple', asset_type='stock')
+        series = doji_series(60, doji_at=[59])
+        for symbol in ('BTCUSDT', 'ETHUSDT'):
+            self.store.append(symbol, '1h', {name: getattr(series, name) for name in
+                                             ('timestamp', 'open', 'high', 'low', 'close', 'volume')})
+
+    def test_scan_saves_latest_patterns_once(self):
+        report = PatternScanService.run(intervals=['1h', '4h'], workers=2)
+
+        self.assertEqual((report['tasks'], report['with_data'], report['patterns']), (6, 2, 2))
+        self.assertEqual(set(DetectedPattern.objects.values_list('asset__symbol', 'pattern_type', 'timeframe')),
+                         {('BTC/USD', 'doji', '1H'), ('ETH/USD', 'doji', '1H')})
+        self.assertEqual(PatternAlert.objects.filter(pattern__isnull=False).count(), 2)
+
+        # The same run is not recorded again on the next scan.
+        out = StringIO()
+        call_command('scan_patterns', '--timeframes', '1h', '--workers', '1', stdout=out)
+        self.assertIn('0 new patterns', out.getvalue())
+        self.assertEqual(DetectedPattern.objects.count(), 2)
+
+    def test_save_new_checks_existing_patterns_in_one_query(self):
+        def detection(pattern_type, start_time):
+            return {'type': pattern_type, 'confidence': 70, 'start_time': start_time, 'end_time': start_time}
+
+        now_ms = int(time.time() * 1000)
+        PatternScanService.save_new([(self.btc, '1H')], [[detection('doji', now_ms - 60_000)]])
+        tasks = [(self.btc, '1H'), (self.btc, '4H'), (self.eth, '1H')]
+        detections = [
+            [detection('doji', now_ms - 60_000), detection('bull_flag', now_ms - 60_000)],  # doji already saved
+            [detection('doji', now_ms - 60_000)],
+            [detection('doji', now_ms - 60_000), detection('double_top', now_ms - 60_000)],
+        ]
+        # One lookup, two bulk inserts, plus the savepoint around them.
+        with self.assertNumQueries(5):
+            saved = PatternScanService.save_new(tasks, detections)
+
+        self.assertEqual(sorted((p.asset.symbol, p.timeframe, p.pattern_type) for p in saved), [
+            ('BTC/USD', '1H', 'bull_flag'), ('BTC/USD', '4H', 'doji'),
+            ('ETH/USD', '1H', 'doji'), ('ETH/USD', '1H', 'double_top')])
+
+
+class DetectJobApiTests(TestCase):
+    def setUp(self):
+        self.asset = Asset.objects.create(symbol='BTC/USD', name='Bitcoin', asset_type='crypto')
+        self.user = User.objects.create_user('trader', password='pw')
+        self.client.force_login(self.user)
+
+    def detect(self, **data):
+        return self.client.post('/api/patterns/detect/', data, content_type='application/json')
+
+    def test_detect_queues_a_job_the_worker_runs(self):
+        def fake_job(job, asset_ids, intervals, save=True):
+            job.progress(1, 1)
+            return {'asset_ids': asset_ids, 'intervals': intervals, 'save': save}
+
+        response = self.detect(timeframes=['1H', '4h'], save=False)
+        self.assertEqual(response.status_code, 202)
+        job_id = response.json()['job_id']
+        # Nothing runs in the web process: the job waits for a worker.
+        self.assertEqual(self.client.get(f'/api/patterns/jobs/{job_id}/results/').status_code, 202)
+
+        with mock.patch.object(PatternScanService, 'detect_job', fake_job):
+            self.assertEqual(DetectionQueue.run_worker(poll_seconds=0, once=True, log=lambda _: None), 1)
+
+        status = self.client.get(f'/api/patterns/jobs/{job_id}/').json()
+        self.assertEqual((status['status'], status['progress']['percent']), ('completed', 100.0))
+        result = self.client.get(f'/api/patterns/jobs/{job_id}/results/').json()['result']
+        self.assertEqual(result, {'asset_ids': [self.asset.pk], 'intervals': ['1h', '4h'], 'save': False})
+
+        other = User.objects.create_user('other', password='pw')
+        self.client.force_login(other)
+        self.assertEqual(self.client.get(f'/api/patterns/jobs/{job_id}/').status_code, 404)
+        self.assertEqual(self.client.get('/api/patterns/jobs/not-a-job/').status_code, 404)
+
+    def test_job_stops_at_its_timeout(self):
+        def slow_job(job, asset_ids, intervals, save=True):
+            for done in range(1, 4):
+                time.sleep(0.02)
+                job.progress(done, 3)
+
+        job_id = self.detect(timeout=0.01).json()['job_id']
+        with mock.patch.object(PatternScanService, 'detect_job', slow_job):
+            DetectionQueue.run_worker(poll_seconds=0, once=True, log=lambda _: None)
+        job = DetectionJob.objects.get(pk=job_id)
+        self.assertEqual((job.status, job.done), ('timeout', 1))
+
+    def test_timeout_is_positive_and_capped(self):
+        for timeout in (0, -5, 'soon'):
+            self.assertEqual(self.detect(timeout=timeout).status_code, 400)
+
+        for timeout, expected in ((1e9, detection_config()['TIMEOUT_SECONDS']), (30, 30.0)):
+            response = self.detect(timeout=timeout)
+            self.assertEqual(response.status_code, 202)
+            self.assertEqual(DetectionJob.objects.get(pk=response.json()['job_id']).timeout, expected)
+
+    @override_settings(PATTERN_JOBS={'MAX_PENDING': 1})
+    def test_pending_limit(self):
+        self.assertEqual(self.detect().status_code, 202)
+        self.assertEqual(self.detect().status_code, 503)
+
+    def test_worker_survives_a_failing_iteration(self):
+        log = mock.Mock()
+        with mock.patch.object(DetectionQueue, 'claim', side_effect=OperationalError('database is locked')):
+            self.assertEqual(DetectionQueue.run_worker(poll_seconds=0, once=True, log=log), 0)
+        log.assert_called_once_with('Detection worker iteration failed: database is locked')
+
+    def test_rejects_unknown_timeframe(self):
+        response = self.client.post('/api/patterns/detect/', {'timeframes': ['7x']}, content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+
+    def test_detect_job_scans_and_saves(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        store = CandleStore(tmp.name)
+        series = doji_series(40, doji_at=[39])
+        store.append('BTCUSDT', '1h', {name: getattr(series, name) for name in
+                                       ('timestamp', 'open', 'high', 'low', 'close', 'volume')})
+        job = mock.Mock()
+        with mock.patch('patterns.services.get_candle_store', return_value=store), \
+                mock.patch('patterns.services.CryptoDataFetcher.get_binance_klines') as fetch:
+            result = PatternScanService.detect_job(job, [self.asset.pk], ['1h'])
+        fetch.assert_not_called()
+        self.assertEqual(result['saved'], 1)
+        self.assertEqual(result['items'][0]['patterns'][0]['type'], 'doji')
+        job.progress.assert_called_with(1)
+        self.assertEqual(DetectedPattern.objects.get().timeframe, '1H')
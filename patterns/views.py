@@ -69,9 +69,9 @@ def detect_patterns(request):
         crypto_symbol = symbol_map.get(asset_symbol, 'bitcoin')
         historical = CryptoDataFetcher.get_historical_data(crypto_symbol, days=30)
         
-        if historical:
-            prices = [float(p['price']) for p in historical]
-            timestamps = [p['timestamp'] for p in historical]
+        if len(historical):
+            prices = historical.close.tolist()
+            timestamps = historical.datetimes()
             
             detector = PatternDetector(prices, timestamps)
             detected = detector.detect_all_patterns()
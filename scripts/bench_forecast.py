@@ -0,0 +1,50 @@
+"""Forecast latency against horizon length for BetterMLForecast.
+
+Compares the original per-step inference (forest.predict plus one predict
+call per tree) with the batched recursive path and the direct
+multi-horizon model. Training time is excluded.
+
+Usage: python scripts/bench_forecast.py [points]   (default: 30 days of hourly closes)
+"""
+import sys, os, time
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'market_microstructure.settings')
+import numpy as np
+from core.better_ml import BetterMLForecast
+
+n = int(sys.argv[1]) if len(sys.argv) > 1 else 720
+rng = np.random.default_rng(11)
+prices = (30000 * np.exp(np.cumsum(rng.normal(0, 0.005, n)))).tolist()
+
+
+def per_tree_loop(forecaster, horizon):
+    """The original inference loop, kept here as the baseline."""
+    model = forecaster.model
+    last_window = np.array(forecaster.prices[-forecaster.window:], dtype=float)
+    for _ in range(horizon):
+        next_pred = float(model.predict(last_window.reshape(1, -1))[0])
+        np.std([est.predict(last_window.reshape(1, -1))[0] for est in model.estimators_])
+        last_window = np.roll(last_window, -1)
+        last_window[-1] = next_pred
+
+
+def timed(fn, repeat=3):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best * 1000
+
+
+recursive = BetterMLForecast(prices)
+direct = BetterMLForecast(prices, mode='direct', max_horizon=30)
+recursive.predict(1)  # build leaf tables outside the timings
+direct.predict(1)
+
+print(f"{'horizon':>7} {'per-tree loop':>14} {'batched':>10} {'direct':>10}   (ms)")
+for horizon in (1, 7, 14, 30):
+    loop_ms = timed(lambda: per_tree_loop(recursive, horizon), repeat=1)
+    batched_ms = timed(lambda: recursive.predict(horizon))
+    direct_ms = timed(lambda: direct.predict(horizon))
+    print(f"{horizon:>7} {loop_ms:>14.1f} {batched_ms:>10.1f} {direct_ms:>10.1f}")
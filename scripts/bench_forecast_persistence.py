@@ -0,0 +1,83 @@
+"""Forecasts saved per second against horizon length, with concurrent users.
+
+Compares the original write path (one INSERT per ForecastPoint/Pattern,
+then the points re-read for the response) with ``save_forecast`` (one
+transaction, bulk inserts, response built in memory). Each user is a
+thread saving forecasts for its own account; the model is run once per
+horizon outside the timings. Runs against a throwaway SQLite file.
+
+Usage: python scripts/bench_forecast_persistence.py [forecasts_per_user]   (default: 20)
+"""
+import sys, os, time, tempfile, shutil
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'market_microstructure.settings')
+from concurrent.futures import ThreadPoolExecutor
+import django
+from django.conf import settings
+
+tmpdir = tempfile.mkdtemp()
+settings.DATABASES['default']['NAME'] = os.path.join(tmpdir, 'bench.sqlite3')
+settings.DATABASES['default'].setdefault('OPTIONS', {})['timeout'] = 60
+django.setup()
+
+import numpy as np
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.db import connection
+from core.ml_baseline import MLForecastBaseline
+from dashboard.models import Asset
+from forecast.models import Forecast, ForecastPoint, Pattern
+from forecast.persistence import forecast_payload, save_forecast
+
+per_user = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+call_command('migrate', verbosity=0)
+asset = Asset.objects.create(symbol='BTC/USD', name='Bitcoin', asset_type='crypto', current_price=30000)
+users = [User.objects.create_user(f'user{i}') for i in range(8)]
+prices = (30000 * np.exp(np.cumsum(np.random.default_rng(3).normal(0, 0.01, 30)))).tolist()
+
+
+def per_row(user, prediction, horizon):
+    """The original write path, kept here as the baseline."""
+    forecast = Forecast.objects.create(
+        user=user, asset=asset, prediction_horizon_days=horizon,
+        current_price=prediction['current_price'], predicted_high=prediction['predicted_high'],
+        predicted_low=prediction['predicted_low'], confidence_score=prediction['confidence'])
+    for point in prediction['forecast_points']:
+        ForecastPoint.objects.create(forecast=forecast, date=point['date'], predicted_price=point['price'],
+                                     confidence_upper=point['confidence_upper'],
+                                     confidence_lower=point['confidence_lower'])
+    for pattern_data in prediction['patterns']:
+        Pattern.objects.create(forecast=forecast, asset=asset, pattern_type=pattern_data['type'],
+                               timeframe='1D', match_percentage=pattern_data['confidence'])
+    return forecast_payload(forecast, forecast.points.all().order_by('date'))
+
+
+def bulk(user, prediction, horizon):
+    forecast, points, _ = save_forecast(user, asset, prediction, horizon)
+    return forecast_payload(forecast, points)
+
+
+def throughput(fn, prediction, horizon, n_users):
+    def work(user):
+        try:
+            for _ in range(per_user):
+                fn(user, prediction, horizon)
+        finally:
+            connection.close()
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=n_users) as pool:
+        list(pool.map(work, users[:n_users]))
+    return n_users * per_user / (time.perf_counter() - start)
+
+
+print(f"{'horizon':>7} {'users':>5} {'per-row/s':>10} {'bulk/s':>10} {'speedup':>8}")
+for horizon in (7, 30, 90, 365):
+    prediction = MLForecastBaseline(prices).predict(horizon_days=horizon)
+    for n_users in (1, 4, 8):
+        slow = throughput(per_row, prediction, horizon, n_users)
+        fast = throughput(bulk, prediction, horizon, n_users)
+        print(f"{horizon:>7} {n_users:>5} {slow:>10.1f} {fast:>10.1f} {fast / slow:>7.1f}x")
+
+connection.close()
+shutil.rmtree(tmpdir, ignore_errors=True)
@@ -0,0 +1,51 @@
+"""Throughput of the vectorized indicators on a 1M-point series.
+
+Usage: python scripts/bench_indicators.py [points]
+"""
+import sys, os, time
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import numpy as np
+from core import indicators
+
+n = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+rng = np.random.default_rng(42)
+close = 100 + np.cumsum(rng.normal(0, 1, n))
+high = close + rng.random(n)
+low = close - rng.random(n)
+volume = rng.random(n) * 1000
+
+cases = [
+    ('ema(12)', lambda: indicators.ema(close, 12)),
+    ('ema(200)', lambda: indicators.ema(close, 200)),
+    ('sma(50)', lambda: indicators.sma(close, 50)),
+    ('rsi(14) wilder', lambda: indicators.rsi(close, 14)),
+    ('macd(12,26,9)', lambda: indicators.macd(close)),
+    ('bollinger(20)', lambda: indicators.bollinger_bands(close, 20)),
+    ('atr(14)', lambda: indicators.atr(high, low, close, 14)),
+    ('obv', lambda: indicators.obv(close, volume)),
+    ('vwap', lambda: indicators.vwap(high, low, close, volume)),
+]
+
+print(f"{n:,} points")
+for name, fn in cases:
+    fn()  # warm-up
+    start = time.perf_counter()
+    fn()
+    elapsed = time.perf_counter() - start
+    print(f"{name:<16} {elapsed * 1000:9.1f} ms  {n / elapsed / 1e6:8.1f} M points/s")
+
+
+def ema_loop(data, period):
+    # The original pure-Python TechnicalIndicators._ema loop, for comparison.
+    alpha = 2 / (period + 1)
+    out = np.zeros_like(data)
+    out[0] = data[0]
+    for i in range(1, len(data)):
+        out[i] = alpha * data[i] + (1 - alpha) * out[i - 1]
+    return out
+
+
+start = time.perf_counter()
+ema_loop(close, 12)
+elapsed = time.perf_counter() - start
+print(f"{'ema(12) loop':<16} {elapsed * 1000:9.1f} ms  {n / elapsed / 1e6:8.1f} M points/s")
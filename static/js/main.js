@@ -14,8 +14,45 @@ document.addEventListener('DOMContentLoaded', function() {
     applyUsageWidths();
 });
 
-// Real-time data updates
+// Real-time data updates: one Server-Sent Events stream per page,
+// falling back to polling when the stream is unavailable.
+const STREAM_MAX_ERRORS = 3;
+
 function initRealTimeUpdates() {
+    const channels = [];
+    if (document.querySelector('.market-cards')) channels.push('indicator');
+    if (document.querySelector('.signal-list')) channels.push('signal');
+    if (document.querySelector('.sentiment-gauge')) channels.push('sentiment');
+    if (document.querySelector('.patterns-alerts')) channels.push('alert');
+    if (!channels.length) return;
+
+    if (!window.EventSource) {
+        startPolling();
+        return;
+    }
+
+    const source = new EventSource('/api/dashboard/stream/?channels=' + channels.join(','));
+    let errors = 0;
+    source.onopen = () => { errors = 0; };
+    source.onerror = () => {
+        // EventSource reconnects by itself; give up after repeated failures
+        // or when the server refuses to stream (e.g. 204 under WSGI).
+        errors += 1;
+        if (source.readyState === EventSource.CLOSED || errors >= STREAM_MAX_ERRORS) {
+            source.close();
+            startPolling();
+        }
+    };
+    source.addEventListener('indicator', e => {
+        const data = JSON.parse(e.data);
+        updateIndicatorCard(data.type, data);
+    });
+    source.addEventListener('signal', e => prependSignal(JSON.parse(e.data)));
+    source.addEventListener('sentiment', e => renderSentiment(JSON.parse(e.data)));
+    source.addEventListener('alert', e => prependAlert(JSON.parse(e.data)));
+}
+
+function startPolling() {
     // Update market overview every 5 seconds
     if (document.querySelector('.market-cards')) {
         setInterval(updateMarketOverview, 5000);
@@ -81,17 +118,10 @@ function formatPrice(value, type) {
     }
 }
 
-// Update signals
-async function updateSignals() {
-    try {
-        const response = await fetch('/api/dashboard/signals/?limit=5');
-        const signals = await response.json();
-        
-        const signalList = document.querySelector('.signal-list');
-        if (!signalList) return;
-        
-        // Update signal list (simplified - in production, use a template engine)
-        signalList.innerHTML = signals.map(signal => `
+const SIGNAL_LIST_SIZE = 5;
+
+function renderSignal(signal) {
+    return `
             <div class="signal-item">
                 <div class="signal-header">
                     <span class="signal-asset">${signal.asset}</span>
@@ -108,31 +138,81 @@ async function updateSignals() {
                     <div class="signal-notes">${signal.notes}</div>
                 `}
             </div>
-        `).join('');
+        `;
+}
+
+// Add a streamed signal to the top of the list
+function prependSignal(signal) {
+    const signalList = document.querySelector('.signal-list');
+    if (!signalList) return;
+    signalList.insertAdjacentHTML('afterbegin', renderSignal(signal));
+    while (signalList.children.length > SIGNAL_LIST_SIZE) {
+        signalList.lastElementChild.remove();
+    }
+}
+
+// Add a streamed pattern alert to the top of the first alerts section
+function prependAlert(alert) {
+    const section = document.querySelector('.patterns-alerts .alerts-section');
+    if (!section) return;
+    const time = new Date(alert.created_at).toLocaleTimeString([], { hour: 'numeric', minute: '2-digit' });
+    const item = document.createElement('div');
+    item.className = 'alert-item';
+    item.innerHTML = `
+        <div class="alert-icon pattern">📊</div>
+        <div class="alert-content">
+            <div class="alert-title"></div>
+            <div class="alert-message"></div>
+            <div class="alert-meta"></div>
+        </div>
+        ${alert.confidence ? `<div class="alert-confidence">${alert.confidence}% Match</div>` : ''}
+    `;
+    item.querySelector('.alert-title').textContent = alert.alert_type.charAt(0).toUpperCase() + alert.alert_type.slice(1).replace('_', ' ');
+    item.querySelector('.alert-message').textContent = alert.message;
+    item.querySelector('.alert-meta').textContent = `${alert.asset || 'N/A'} • ${time}`;
+    const label = section.querySelector('.section-label');
+    if (label) label.after(item); else section.prepend(item);
+}
+
+// Update signals
+async function updateSignals() {
+    try {
+        const response = await fetch('/api/dashboard/signals/?limit=5');
+        const signals = await response.json();
+        
+        const signalList = document.querySelector('.signal-list');
+        if (!signalList) return;
+        
+        // Update signal list (simplified - in production, use a template engine)
+        signalList.innerHTML = signals.map(renderSignal).join('');
     } catch (error) {
         console.error('Error updating signals:', error);
     }
 }
 
+function renderSentiment(data) {
+    const gaugeScore = document.querySelector('.gauge-score');
+    const gaugeLabel = document.querySelector('.gauge-label');
+    
+    if (gaugeScore) {
+        gaugeScore.textContent = data.score;
+    }
+    
+    if (gaugeLabel) {
+        gaugeLabel.textContent = data.level.toUpperCase().replace('_', ' ');
+    }
+    
+    // Update gauge visualization if Chart.js is available
+    updateSentimentGauge(data.score);
+}
+
 // Update sentiment
 async function updateSentiment() {
     try {
         const response = await fetch('/api/dashboard/sentiment/');
         const data = await response.json();
         
-        const gaugeScore = document.querySelector('.gauge-score');
-        const gaugeLabel = document.querySelector('.gauge-label');
-        
-        if (gaugeScore) {
-            gaugeScore.textContent = data.score;
-        }
-        
-        if (gaugeLabel) {
-            gaugeLabel.textContent = data.level.toUpperCase().replace('_', ' ');
-        }
-        
-        // Update gauge visualization if Chart.js is available
-        updateSentimentGauge(data.score);
+        renderSentiment(data);
     } catch (error) {
         console.error('Error updating sentiment:', error);
     }
@@ -247,7 +327,7 @@ async function updatePriceChart(canvas) {
     const symbol = canvas.dataset.symbol || 'BTC/USD';
     
     try {
-        const response = await fetch(`/api/dashboard/price-data/${symbol}/?hours=24`);
+        const response = await fetch(`/api/dashboard/price-data/${symbol}/?hours=24&max_points=300`);
         const data = await response.json();
         
         if (data.length > 0) {